@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2012 Rackspace
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import sqlite3
+import threading
+import time
+
+import pyrax.utils as utils
+
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.pyrax/checksums.db")
+
+
+class ChecksumCache(object):
+    """
+    A persistent cache of the MD5 checksums of local files, stored in a SQLite
+    database. Each checksum is stored along with the size, modification time
+    and inode of the file when it was computed; if any of these differ when
+    the file is next looked up, the checksum is computed again.
+
+    Files that were modified within the last 'min_age' seconds are not added
+    to the cache, since a further change within the resolution of the file
+    system's timestamps would not be detected.
+
+    New checksums are committed to the database in batches of
+    'commit_interval', rather than one transaction per file; call flush() to
+    commit the ones stored so far. close() commits them as well.
+    """
+    # The number of stored checksums that are committed together.
+    commit_interval = 1000
+
+    def __init__(self, path=None, min_age=2):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.min_age = min_age
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        self._lock = threading.Lock()
+        # The number of stored checksums not yet committed.
+        self._pending = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock:
+            self._db.execute("CREATE TABLE IF NOT EXISTS checksums "
+                    "(path BLOB PRIMARY KEY, size INTEGER, mtime REAL, "
+                    "inode INTEGER, checksum TEXT)")
+            self._db.commit()
+
+
+    def _key(self, pth):
+        pth = os.path.abspath(pth)
+        if isinstance(pth, unicode):
+            pth = pth.encode("utf-8")
+        return sqlite3.Binary(pth)
+
+
+    def _signature(self, st):
+        return (st.st_size, st.st_mtime, st.st_ino)
+
+
+    def lookup(self, pth, st=None):
+        """
+        Returns the cached checksum for the file if it is still valid, or None
+        if the file is not in the cache or has changed. The result of
+        os.stat() for the file can be passed as 'st' if already available.
+        """
+        if st is None:
+            st = os.stat(pth)
+        with self._lock:
+            row = self._db.execute("SELECT size, mtime, inode, checksum "
+                    "FROM checksums WHERE path = ?", (self._key(pth),)
+                    ).fetchone()
+        if row and tuple(row[:3]) == self._signature(st):
+            return row[3]
+        return None
+
+
+    def store(self, pth, checksum, st):
+        """
+        Records the checksum of the file, where 'st' is the result of
+        os.stat() for the file taken before the checksum was computed.
+        """
+        if time.time() - st.st_mtime < self.min_age:
+            return
+        try:
+            current = os.stat(pth)
+        except OSError:
+            return
+        if self._signature(current) != self._signature(st):
+            # The file changed while it was being read.
+            return
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO checksums "
+                    "(path, size, mtime, inode, checksum) "
+                    "VALUES (?, ?, ?, ?, ?)", (self._key(pth), st.st_size,
+                    st.st_mtime, st.st_ino, checksum))
+            self._pending += 1
+            if self._pending >= self.commit_interval:
+                self._commit()
+
+
+    def _commit(self):
+        """Commits the pending changes; the lock must be held."""
+        self._db.commit()
+        self._pending = 0
+
+
+    def flush(self):
+        """Commits the checksums that have been stored but not committed."""
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+
+    def get_checksum(self, pth):
+        """
+        Returns the MD5 checksum of the file, computing and storing it only
+        if the cached value is missing or out of date.
+        """
+        st = os.stat(pth)
+        checksum = self.lookup(pth, st)
+        if checksum is None:
+            checksum = utils.get_file_checksum(pth)
+            self.store(pth, checksum, st)
+        return checksum
+
+
+    def remove(self, pth):
+        """Removes the entry for the specified file, if any."""
+        with self._lock:
+            self._db.execute("DELETE FROM checksums WHERE path = ?",
+                    (self._key(pth),))
+            self._commit()
+
+
+    def clear(self):
+        """Removes all the entries from the cache."""
+        with self._lock:
+            self._db.execute("DELETE FROM checksums")
+            self._commit()
+
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
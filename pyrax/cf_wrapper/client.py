@@ -1,25 +1,40 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import calendar
+import contextlib
 import datetime
 from functools import wraps
+import hashlib
 # Use eventlet if available
 try:
     import eventlet.green.httplib as httplib
 except ImportError:
     import httplib
+import json
 import math
+import multiprocessing
 import os
+import Queue
 import re
 import socket
+import sys
+import tarfile
+import tempfile
 import threading
+import time
 import urllib
 import urlparse
 import uuid
+import weakref
 
 from swiftclient import client as _swift_client
 import pyrax
+from pyrax.cf_wrapper.checksum_cache import ChecksumCache
+from pyrax.cf_wrapper.content_cache import ContentCache
+import pyrax.cf_wrapper.folder_watcher as folder_watcher
 from pyrax.cf_wrapper.container import Container
+from pyrax.cf_wrapper.remote_file import RemoteFile
 from pyrax.cf_wrapper.storage_object import StorageObject
 import pyrax.utils as utils
 import pyrax.exceptions as exc
@@ -28,11 +43,71 @@ import pyrax.exceptions as exc
 EARLY_DATE_STR = "1900-01-01T00:00:00"
 CONNECTION_TIMEOUT = 20
 CONNECTION_RETRIES = 5
+# Number of concurrent requests used by the bulk and parallel operations.
+DEFAULT_CONCURRENCY = 10
 
 no_such_container_pattern = re.compile(r"Container GET|HEAD failed: .+/(.+) 404")
 etag_fail_pat = r"Object PUT failed: .+/([^/]+)/(\S+) 422 Unprocessable Entity"
 etag_failed_pattern = re.compile(etag_fail_pat)
 
+def _quote(val):
+    if isinstance(val, unicode):
+        val = val.encode("utf-8")
+    return urllib.quote(val)
+
+
+# Characters used to probe the name space of a container when choosing the
+# ranges for a parallel listing.
+_PROBE_CHARS = [unichr(code) for code in xrange(0x21, 0x7f)] + [u"\u0100",
+        u"\u1000", u"\uffff"]
+
+
+class _ChunkBuffer(object):
+    """File-like object that collects the data written to it."""
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(data)
+
+    def drain(self):
+        """Returns the data written since the last call, and discards it."""
+        data = "".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _iter_tar(items, archive_format="tar"):
+    """
+    Generates the contents of a tar archive of the files described by
+    'items', a list of (full_path, obj_name, size) 3-tuples, one file at a
+    time. A file that can't be read raises UploadFailed, rather than an
+    IOError that could be mistaken for a network error.
+    """
+    buf = _ChunkBuffer()
+    mode = "w|gz" if archive_format == "tar.gz" else "w|"
+    tar = tarfile.open(mode=mode, fileobj=buf)
+    for full_path, obj_name, size in items:
+        try:
+            # Symlinks are followed, so that the files they point to are
+            # uploaded, as they would be by upload_file().
+            st = os.stat(full_path)
+            info = tarfile.TarInfo(obj_name.replace(os.sep, "/"))
+            info.size = st.st_size
+            info.mtime = st.st_mtime
+            info.mode = 0644
+            with file(full_path, "rb") as ff:
+                tar.addfile(info, ff)
+        except (IOError, OSError) as e:
+            raise exc.UploadFailed("Could not add '%s' to the archive: %s" %
+                    (full_path, e))
+        data = buf.drain()
+        if data:
+            yield data
+    tar.close()
+    yield buf.drain()
+
+
 def handle_swiftclient_exception(fnc):
     @wraps(fnc)
     def _wrapped(*args, **kwargs):
@@ -71,18 +146,74 @@ class CFClient(object):
     # Defaults for CDN
     cdn_enabled = False
     default_cdn_ttl = 86400
-    _container_cache = {}
+    # The number of seconds that a Container's CDN attributes remain valid
+    # once they have been fetched; None means that they never expire.
+    cdn_cache_ttl = 300
+    # The maximum number of CDN purge requests sent per second by a
+    # CDNPurgeQueue.
+    cdn_purge_rate = 5
+    # Each client caches up to this many Container objects, for this many
+    # seconds.
+    container_cache_size = 1000
+    container_cache_ttl = 60
     # Upload size limit
     max_file_size = 5368709119  # 5GB - 1
+    # Location of the journals used to resume interrupted segmented uploads.
+    upload_journal_dir = os.path.expanduser("~/.pyrax/upload_journals")
     # Folder upload status dict. Each upload will generate its own UUID key.
     # The app can use that key query the status of the upload. This dict
     # will also be used to hold the flag to interrupt uploads in progress.
     folder_upload_status = {}
+    _progress_lock = threading.Lock()
+    # Optional persistent cache of local file checksums; see
+    # enable_checksum_cache().
+    checksum_cache = None
+    # Optional persistent cache of the contents of fetched objects; see
+    # enable_content_cache().
+    content_cache = None
+
+
+    # Maximum number of names sent in each bulk-delete request, and whether
+    # the bulk-delete middleware is known to be available (None = unknown).
+    bulk_delete_batch_size = 10000
+    _bulk_delete_supported = None
+    # When upload_folder() uses archives, files smaller than this are sent
+    # in archives of at most this many files or bytes.
+    archive_max_file_size = 10485760  # 10MB
+    archive_batch_files = 1000
+    archive_batch_bytes = 104857600  # 100MB
+    _extract_archive_supported = None
+    # Number of objects requested in each page by iter_container_objects().
+    listing_page_size = 10000
+    # Limits on the sampling done by iter_container_objects_parallel(): the
+    # number of probes made for each character position, and in total.
+    listing_probe_fanout = 4
+    listing_max_probes = 200
+    # Size of each of the ranges requested by download_object().
+    download_part_size = 67108864  # 64MB
+    # The maximum number of idle connections kept for re-use by other threads.
+    connection_pool_size = 20
+    # The number of seconds that a file must be left alone before it is
+    # uploaded by watch_folder(), and how often the folder is walked when
+    # inotify can't be used.
+    folder_sync_debounce = 2
+    folder_sync_poll_interval = 10
 
 
     def __init__(self, auth_endpoint, username, api_key, tenant_name,
             preauthurl=None, preauthtoken=None, auth_version="2",
             os_options=None, http_log_debug=False):
+        self._local = threading.local()
+        self._shared_auth = _SharedAuth()
+        # The User-Agent set on the client, which every connection sends;
+        # None until it is set.
+        self._user_agent = None
+        self._connection_pool = ConnectionPool(
+                lambda: self._make_thread_connection(),
+                max_idle=self.connection_pool_size)
+        self._container_cache = utils.LRUCache(
+                max_size=self.container_cache_size,
+                ttl=self.container_cache_ttl)
         self.connection = None
         self.http_log_debug = http_log_debug
         self._http_log = _swift_client.http_log
@@ -97,13 +228,130 @@ class CFClient(object):
             preauthurl=None, preauthtoken=None, auth_version="2", os_options=None,
             http_log_debug=None):
         cdn_url = os_options.pop("object_cdn_url", None)
+        # Keep the parameters so that additional connections can be made for
+        # use by other threads.
+        self._connection_args = ((auth_endpoint, username, api_key,
+                tenant_name), {"auth_version": auth_version,
+                "os_options": os_options, "http_log_debug": http_log_debug})
         self.connection = Connection(auth_endpoint, username, api_key, tenant_name,
                 preauthurl=preauthurl, preauthtoken=preauthtoken,
                 auth_version=auth_version, os_options=os_options,
-                http_log_debug=http_log_debug)
+                http_log_debug=http_log_debug, shared_auth=self._shared_auth)
         self.connection._make_cdn_connection(cdn_url)
 
 
+    def _make_thread_connection(self):
+        """
+        Creates a new connection that re-uses the URL and token of the main
+        connection, for use by a thread other than the one that created this
+        client.
+        """
+        main = self._connection
+        if main is None:
+            return None
+        args, kwargs = self._connection_args
+        conn = Connection(*args, preauthurl=self._shared_auth.url or main.url,
+                preauthtoken=self._shared_auth.token or main.token,
+                shared_auth=self._shared_auth, **kwargs)
+        conn.user_agent = self._user_agent or main.user_agent
+        conn._make_cdn_connection(main.cdn_url)
+        return conn
+
+
+    def _get_connection(self):
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = self._connection_pool.get()
+            # The thread's local data is discarded when the thread ends, which
+            # returns the connection to the pool for other threads to use.
+            self._local.lease = self._connection_pool.lease(conn)
+            self._local.connection = conn
+        return conn
+
+    def _set_connection(self, val):
+        self._connection = val
+        self._local.connection = val
+
+    connection = property(_get_connection, _set_connection, None,
+            "The connection used by the current thread. Neither the swift "
+            "nor the CDN connections can be shared between threads, so each "
+            "thread gets its own connection.")
+
+
+    @contextlib.contextmanager
+    def checkout_connection(self):
+        """
+        Checks a connection out of the pool for the current thread. Within
+        this context, all the requests made by this client in the thread use
+        it; afterwards it is returned to the pool. Threads normally keep their
+        connection until they end; this is useful for long-lived threads that
+        only use the client now and then.
+        """
+        previous = getattr(self._local, "connection", None)
+        previous_lease = getattr(self._local, "lease", None)
+        conn = self._connection_pool.get()
+        self._local.connection, self._local.lease = conn, None
+        try:
+            yield conn
+        finally:
+            self._local.connection = previous
+            self._local.lease = previous_lease
+            self._connection_pool.put(conn)
+
+
+    def enable_checksum_cache(self, path=None):
+        """
+        Stores the checksums of local files in a persistent cache, so that
+        unchanged files are not read again when they are synced or uploaded.
+        The cache is a SQLite database, located at '~/.pyrax/checksums.db'
+        unless a different 'path' is specified.
+        """
+        self.checksum_cache = ChecksumCache(path)
+
+
+    def disable_checksum_cache(self):
+        """Stops using the persistent cache of local file checksums."""
+        if self.checksum_cache:
+            self.checksum_cache.close()
+        self.checksum_cache = None
+
+
+    def enable_content_cache(self, path=None, max_size=None):
+        """
+        Keeps a copy of each object returned by fetch_object() on local disk.
+        When the object is fetched again, the server is asked to send it only
+        if its etag has changed, so an unchanged object costs a single short
+        response instead of a full download. The cache is kept in the
+        directory '~/.pyrax/content_cache' unless a different 'path' is
+        specified, and holds at most 'max_size' bytes (default = 100MB); the
+        least recently used objects are discarded to make room.
+        """
+        self.content_cache = ContentCache(path, max_size=max_size)
+
+
+    def disable_content_cache(self):
+        """Stops using the persistent cache of object contents."""
+        if self.content_cache:
+            self.content_cache.close()
+        self.content_cache = None
+
+
+    def _get_local_checksum(self, pth):
+        """
+        Returns the MD5 checksum of a local file, using the checksum cache if
+        it is enabled.
+        """
+        if self.checksum_cache:
+            return self.checksum_cache.get_checksum(pth)
+        return utils.get_file_checksum(pth)
+
+
+    def _flush_checksum_cache(self):
+        """Commits any checksums that the checksum cache is holding back."""
+        if self.checksum_cache:
+            self.checksum_cache.flush()
+
+
     def _massage_metakeys(self, dct, prfx):
         """
         Returns a copy of the supplied dictionary, prefixing any keys that do not
@@ -160,6 +408,8 @@ class CFClient(object):
         # Add the metadata prefix, if needed.
         massaged = self._massage_metakeys(metadata, self.container_meta_prefix)
         cname = self._resolve_name(container)
+        if self._batch_metadata(("container", cname), massaged, clear):
+            return
         new_meta = {}
         if clear:
             curr_meta = self.get_container_metadata(cname)
@@ -179,6 +429,8 @@ class CFClient(object):
         # Add the metadata prefix, if needed.
         massaged = self._massage_metakeys(meta_dict, self.container_meta_prefix)
         cname = self._resolve_name(container)
+        if self._batch_metadata(("container", cname), massaged):
+            return
         self.connection.post_container(cname, massaged)
 
 
@@ -249,6 +501,8 @@ class CFClient(object):
         massaged = self._massage_metakeys(metadata, self.object_meta_prefix)
         cname = self._resolve_name(container)
         oname = self._resolve_name(obj)
+        if self._batch_metadata(("object", cname, oname), massaged, clear):
+            return
         new_meta = {}
         # Note that the API for object POST is the opposite of that for
         # container POST: for objects, all current metadata is deleted,
@@ -278,11 +532,198 @@ class CFClient(object):
         self.set_object_metadata(container, obj, {key: ""})
 
 
+    @contextlib.contextmanager
+    def metadata_batch(self, workers=None):
+        """
+        Within this context, changes made in the current thread by
+        set_container_metadata(), set_object_metadata() and the methods for
+        removing metadata keys are not sent immediately. Instead they are
+        merged in memory, and when the context exits, each container and
+        object that was changed is updated with a single POST. The updates
+        are made concurrently by up to 'workers' threads (default =
+        DEFAULT_CONCURRENCY).
+
+            with client.metadata_batch():
+                obj.set_metadata({"color": "red"})
+                obj.set_metadata({"size": "large"})
+                obj.remove_metadata_key("shape")
+
+        Metadata read within the context does not include the pending changes.
+        If the block raises an exception, the pending changes are discarded.
+        If any update fails, the others are still made, and the first error
+        is raised afterwards. Nested batches are sent when the outermost one
+        exits.
+        """
+        outer = getattr(self._local, "metadata_batch", None)
+        if outer is not None:
+            yield
+            return
+        batch = self._local.metadata_batch = {}
+        try:
+            yield
+        finally:
+            # The batch must end however the block exits, including on
+            # KeyboardInterrupt, or later changes would never be sent.
+            self._local.metadata_batch = None
+        self._flush_metadata(batch, workers=workers)
+
+
+    def _batch_metadata(self, target, massaged, clear=False):
+        """
+        If a metadata batch is active in this thread, merges the change to the
+        target's metadata into it and returns True. Otherwise returns False,
+        and the change should be sent immediately. 'target' is either
+        ("container", cname) or ("object", cname, oname).
+        """
+        batch = getattr(self._local, "metadata_batch", None)
+        if batch is None:
+            return False
+        pending = batch.get(target)
+        if clear or pending is None:
+            pending = batch[target] = {"clear": clear, "metadata": {}}
+        pending["metadata"].update(massaged)
+        return True
+
+
+    def _flush_metadata(self, batch, workers=None):
+        """
+        Sends the merged metadata changes for each target in the batch. An
+        empty value removes the key.
+        """
+        def flush(target):
+            pending = batch[target]
+            clear, changes = pending["clear"], pending["metadata"]
+            if target[0] == "container":
+                cname = target[1]
+                new_meta = {}
+                if clear:
+                    for ckey in self.get_container_metadata(cname):
+                        new_meta[ckey] = ""
+                new_meta.update(changes)
+                self.connection.post_container(cname, new_meta)
+                return
+            cname, oname = target[1:]
+            new_meta = {}
+            # An object POST replaces all of its metadata, so unless it is
+            # being cleared, the current metadata must be kept.
+            if not clear:
+                new_meta = self._massage_metakeys(
+                        self.get_object_metadata(cname, oname),
+                        self.object_meta_prefix)
+            new_meta.update(changes)
+            new_meta = dict((key, val)
+                    for key, val in new_meta.iteritems() if val)
+            self.connection.post_object(cname, oname, new_meta)
+
+        if not batch:
+            return
+        pool = utils.WorkerPool(flush, workers=min(len(batch),
+                workers or DEFAULT_CONCURRENCY))
+        for target, ret, err in pool.map(batch.keys()):
+            if err:
+                raise err
+
+
+    def get_objects_metadata(self, container, object_names=None, prefix=None,
+            workers=None, callback=None):
+        """
+        Retrieves the metadata for many objects at once. Either pass an
+        iterable of 'object_names', or a 'prefix' to get the metadata of every
+        object whose name begins with it (if neither is given, every object in
+        the container is included).
+
+        The HEAD requests are made by a pool of 'workers' threads (default =
+        DEFAULT_CONCURRENCY). If 'callback' is given, it is called with the
+        result dict after each page of objects, so that progress can be
+        reported. Failures don't stop the run. A dict is returned with the
+        'metadata' dict for each object keyed by name, the number of objects
+        'not_found', and a list of 'errors', each of which is an (object name,
+        reason) 2-tuple.
+        """
+        cont = self.get_container(container)
+        prfx = self.object_meta_prefix.lower()
+        metadata = {}
+
+        def get_meta(item):
+            nm = item[0]
+            try:
+                headers = self.connection.head_object(cont.name, nm)
+            except _swift_client.ClientException as e:
+                if e.http_status == 404:
+                    return "not_found"
+                raise
+            metadata[nm] = dict((hkey, hval)
+                    for hkey, hval in headers.iteritems()
+                    if hkey.lower().startswith(prfx))
+            return "found"
+
+        result = {"found": 0, "not_found": 0, "errors": [],
+                "metadata": metadata}
+        self._map_objects(cont, get_meta, result, object_names=object_names,
+                prefix=prefix, workers=workers, callback=callback)
+        del result["found"]
+        return result
+
+
+    def set_objects_metadata(self, container, metadata, object_names=None,
+            prefix=None, clear=False, workers=None, callback=None):
+        """
+        Updates the metadata of many objects at once. The objects are chosen
+        as for get_objects_metadata(). 'metadata' is applied to every object;
+        if 'object_names' is a dict, it maps each name to a dict of metadata
+        for that object alone, which is added to 'metadata'.
+
+        As with set_object_metadata(), 'clear' replaces all of each object's
+        existing metadata. In that case the objects are updated with a single
+        POST each; otherwise their current metadata must first be read with a
+        HEAD, so pass clear=True whenever you are supplying the full metadata.
+
+        The requests are made by a pool of 'workers' threads (default =
+        DEFAULT_CONCURRENCY), and 'callback' is called as for
+        get_objects_metadata(). A dict is returned with the number of objects
+        'updated', the number 'not_found', and a list of 'errors'.
+        """
+        cont = self.get_container(container)
+        common = self._massage_metakeys(metadata or {},
+                self.object_meta_prefix)
+        per_object = object_names if isinstance(object_names, dict) else {}
+
+        def set_meta(item):
+            nm = item[0]
+            new_meta = {}
+            try:
+                if not clear:
+                    headers = self.connection.head_object(cont.name, nm)
+                    prfx = self.object_meta_prefix.lower()
+                    new_meta = dict((hkey.lower(), hval)
+                            for hkey, hval in headers.iteritems()
+                            if hkey.lower().startswith(prfx))
+                new_meta.update(common)
+                if nm in per_object:
+                    new_meta.update(self._massage_metakeys(per_object[nm],
+                            self.object_meta_prefix))
+                # Empty values are removed, as in set_object_metadata().
+                new_meta = dict((key, val)
+                        for key, val in new_meta.iteritems() if val)
+                self.connection.post_object(cont.name, nm, new_meta)
+            except _swift_client.ClientException as e:
+                if e.http_status == 404:
+                    return "not_found"
+                raise
+            return "updated"
+
+        result = {"updated": 0, "not_found": 0, "errors": []}
+        return self._map_objects(cont, set_meta, result,
+                object_names=object_names, prefix=prefix, workers=workers,
+                callback=callback)
+
+
     @handle_swiftclient_exception
     def create_container(self, name):
         """Creates a container with the specified name."""
         name = self._resolve_name(name)
         self.connection.put_container(name)
+        self._remove_container_from_cache(name)
         return self.get_container(name)
 
 
@@ -293,14 +734,12 @@ class CFClient(object):
         still has objects stored in it; if that's the case and you want
         to delete the container anyway, set del_objects to True, and
         the container's objects will be deleted before the container is
-        deleted.
+        deleted. The objects are deleted with bulk_delete().
         """
-        self._remove_container_from_cache(container)
         cname = self._resolve_name(container)
         if del_objects:
-            objs = self.get_container_object_names(cname)
-            for obj in objs:
-                self.delete_object(cname, obj)
+            self.bulk_delete(cname)
+        self._remove_container_from_cache(container)
         self.connection.delete_container(cname)
         return True
 
@@ -318,9 +757,191 @@ class CFClient(object):
         ct.remove_from_cache(name)
         oname = self._resolve_name(name)
         self.connection.delete_object(ct.name, oname)
+        ct._invalidate_counts()
+        if self.content_cache:
+            self.content_cache.remove(ct.name, oname)
         return True
 
 
+    def bulk_delete(self, container, object_names=None, prefix=None,
+            workers=None):
+        """
+        Deletes many objects from the container, using as few requests as
+        possible. If 'object_names' is not supplied, all the objects in the
+        container are deleted; pass a 'prefix' to only delete the objects whose
+        names begin with it.
+
+        The names are sent to the bulk-delete middleware in batches of up to
+        'bulk_delete_batch_size' names per request. If the middleware is not
+        available, the objects are deleted individually by a pool of 'workers'
+        threads (default = DEFAULT_CONCURRENCY).
+
+        Failures don't stop the run. A dict is returned with the number of
+        objects 'deleted', the number 'not_found', and a list of 'errors',
+        each of which is an (object name, reason) 2-tuple.
+        """
+        cont = self.get_container(container)
+        result = {"deleted": 0, "not_found": 0, "errors": []}
+        if object_names is not None:
+            names = [self._resolve_name(nm) for nm in object_names]
+            if prefix:
+                names = [nm for nm in names if nm.startswith(prefix)]
+            batches = (names[pos:pos + self.bulk_delete_batch_size]
+                    for pos in xrange(0, len(names),
+                    self.bulk_delete_batch_size))
+        else:
+            batches = self._iter_name_batches(cont, prefix)
+        for batch in batches:
+            for nm in batch:
+                cont.remove_from_cache(nm)
+            counts = None
+            if self._bulk_delete_supported is not False:
+                counts = self._bulk_delete_batch(cont, batch)
+            if counts is None:
+                counts = self._delete_objects_concurrently(cont, batch,
+                        workers=workers)
+            result["deleted"] += counts["deleted"]
+            result["not_found"] += counts["not_found"]
+            result["errors"].extend(counts["errors"])
+        cont._invalidate_counts()
+        return result
+
+
+    def _iter_name_batches(self, cont, prefix):
+        """
+        Generates lists of the names of the objects in the container, one
+        listing page at a time.
+        """
+        marker = None
+        while True:
+            names = self.get_container_object_names(cont,
+                    limit=self.bulk_delete_batch_size, marker=marker,
+                    prefix=prefix)
+            if not names:
+                break
+            yield names
+            if len(names) < self.bulk_delete_batch_size:
+                break
+            marker = names[-1]
+
+
+    def _bulk_delete_batch(self, cont, names):
+        """
+        Deletes the named objects with a single bulk-delete request. Returns
+        None if the bulk-delete middleware is not available, or if the request
+        failed as a whole.
+        """
+        body = "\n".join("/%s/%s" % (_quote(cont.name), _quote(nm))
+                for nm in names)
+        resp = self.connection.storage_request("POST", [], data=body,
+                hdrs={"Content-Type": "text/plain",
+                "Accept": "application/json"}, query="bulk-delete")
+        raw = resp.read()
+        try:
+            info = json.loads(raw)
+        except ValueError:
+            info = None
+        if not isinstance(info, dict) or "Number Deleted" not in info:
+            # Without the middleware, the request is treated as an ordinary
+            # account POST.
+            if 200 <= resp.status < 300:
+                self._bulk_delete_supported = False
+            return None
+        self._bulk_delete_supported = True
+        errors = self._parse_bulk_errors(cont, info)
+        deleted = int(info["Number Deleted"])
+        not_found = int(info.get("Number Not Found", 0))
+        status = info.get("Response Status", "")
+        if not errors and not status.startswith("2") and (
+                deleted + not_found < len(names)):
+            # The whole request failed, so the objects that weren't deleted
+            # can't be identified; retry them individually.
+            return None
+        return {"deleted": deleted, "not_found": not_found, "errors": errors}
+
+
+    def _parse_bulk_errors(self, cont, info):
+        """
+        Returns a list of (object name, reason) 2-tuples for the errors listed
+        in the response to a bulk request.
+        """
+        errors = []
+        obj_prefix = "/%s/" % _quote(cont.name)
+        for pth, reason in info.get("Errors") or []:
+            if pth.startswith(obj_prefix):
+                pth = pth[len(obj_prefix):]
+            if isinstance(pth, unicode):
+                pth = pth.encode("utf-8")
+            errors.append((urllib.unquote(pth).decode("utf-8"), reason))
+        return errors
+
+
+    def _extract_archive(self, cont, items, archive_format="tar"):
+        """
+        Uploads the files to the container as a single archive, which is
+        unpacked by the extract-archive middleware. 'items' is a list of
+        (full_path, obj_name, size) 3-tuples. The archive is created on the
+        fly while it is sent, so no temporary files are needed.
+
+        Returns a 2-tuple of the number of objects created and a list of
+        (object name, reason) errors, or None if the middleware is not
+        available or the request failed as a whole.
+        """
+        if archive_format not in ("tar", "tar.gz"):
+            raise exc.InvalidArchiveFormat("Archive format must be 'tar' or "
+                    "'tar.gz'; received '%s'." % archive_format)
+        resp = self.connection.storage_request("PUT", [cont.name],
+                hdrs={"Accept": "application/json"},
+                query="extract-archive=%s" % archive_format,
+                chunks=lambda: _iter_tar(items, archive_format))
+        raw = resp.read()
+        try:
+            info = json.loads(raw)
+        except ValueError:
+            info = None
+        if not isinstance(info, dict) or "Number Files Created" not in info:
+            # Without the middleware, the request is treated as a PUT of the
+            # container itself.
+            if 200 <= resp.status < 300:
+                self._extract_archive_supported = False
+            return None
+        self._extract_archive_supported = True
+        errors = self._parse_bulk_errors(cont, info)
+        created = int(info["Number Files Created"])
+        status = info.get("Response Status", "")
+        if not errors and not status.startswith("2") and (
+                created < len(items)):
+            return None
+        cont._invalidate_counts()
+        for full_path, obj_name, size in items:
+            cont.remove_from_cache(obj_name)
+        return created, errors
+
+
+    def _delete_objects_concurrently(self, cont, names, workers=None):
+        """
+        Deletes the named objects with individual requests, made by a pool of
+        worker threads.
+        """
+        def delete(nm):
+            try:
+                self.connection.delete_object(cont.name, nm)
+            except _swift_client.ClientException as e:
+                if e.http_status == 404:
+                    return "not_found"
+                raise
+            return "deleted"
+
+        pool = utils.WorkerPool(delete, workers=workers or DEFAULT_CONCURRENCY)
+        counts = {"deleted": 0, "not_found": 0, "errors": []}
+        for nm, outcome, err in pool.map(names):
+            if err:
+                counts["errors"].append((nm, "%s" % err))
+            else:
+                counts[outcome] += 1
+        return counts
+
+
     def get_object(self, container, obj_name):
         """Returns a StorageObject instance for the object in the container."""
         cont = self.get_container(container)
@@ -346,6 +967,8 @@ class CFClient(object):
             with file(tmp, "rb") as tmpfile:
                 self.connection.put_object(cont.name, obj_name,
                         contents=tmpfile, content_type=content_type, etag=etag)
+        cont.remove_from_cache(obj_name)
+        cont._invalidate_counts()
         return self.get_object(container, obj_name)
 
 
@@ -360,9 +983,14 @@ class CFClient(object):
         new_cont = self.get_container(new_container)
         if new_obj_name is None:
             new_obj_name = obj.name
-        hdrs = {"X-Copy-From": "/%s/%s" % (cont.name, obj.name)}
-        return self.connection.put_object(new_cont.name, new_obj_name,
+        # The object name is returned as unicode, so both names are encoded.
+        hdrs = {"X-Copy-From": "/%s/%s" % (_quote(cont.name),
+                _quote(obj.name))}
+        ret = self.connection.put_object(new_cont.name, new_obj_name,
                 contents=None, headers=hdrs)
+        new_cont.remove_from_cache(new_obj_name)
+        new_cont._invalidate_counts()
+        return ret
 
 
     @handle_swiftclient_exception
@@ -379,6 +1007,154 @@ class CFClient(object):
         return new_obj_etag
 
 
+    def copy_objects(self, container, new_container, object_names=None,
+            prefix=None, new_prefix=None, workers=None):
+        """
+        Copies many objects to the new container on the server, without
+        downloading them. Either pass an iterable of 'object_names', or a
+        'prefix' to copy all the objects whose names begin with it (if neither
+        is given, every object in the container is copied).
+
+        If 'new_prefix' is given, the 'prefix' at the start of each name is
+        replaced with it in the copy's name; otherwise the names are kept. At
+        least one must differ when copying within the same container.
+
+        The copies are made by a pool of 'workers' threads (default =
+        DEFAULT_CONCURRENCY), fed one listing page of names at a time. Failures
+        don't stop the run. A dict is returned with the number of objects
+        'copied', the number 'not_found', and a list of 'errors', each of
+        which is an (object name, reason) 2-tuple.
+        """
+        return self._copy_objects(container, new_container, object_names,
+                prefix, new_prefix, workers, move=False)
+
+
+    def move_objects(self, container, new_container, object_names=None,
+            prefix=None, new_prefix=None, workers=None):
+        """
+        Works just like copy_objects(), except that each source object is
+        deleted once its copy has been verified by comparing the ETag of the
+        copy with that of the original. A dict is returned with the number of
+        objects 'moved', the number 'not_found', and a list of 'errors'; an
+        object whose copy can't be verified is left in place.
+        """
+        return self._copy_objects(container, new_container, object_names,
+                prefix, new_prefix, workers, move=True)
+
+
+    def _copy_objects(self, container, new_container, object_names, prefix,
+            new_prefix, workers, move):
+        cont = self.get_container(container)
+        new_cont = self.get_container(new_container)
+        if new_prefix is None:
+            new_prefix = prefix
+        if cont.name == new_cont.name:
+            old_pfx, new_pfx = prefix or "", new_prefix or ""
+            # When the names are listed, copies whose names begin with the
+            # prefix would be listed and copied again.
+            if (old_pfx == new_pfx) or (object_names is None and
+                    new_pfx.startswith(old_pfx)):
+                raise exc.InvalidCopyDestination("The copies would replace "
+                        "or be listed with the originals; supply a different "
+                        "container or 'new_prefix'.")
+        done = "moved" if move else "copied"
+
+        def copy(item):
+            nm, etag = item
+            new_nm = nm
+            if prefix and nm.startswith(prefix):
+                new_nm = new_prefix + nm[len(prefix):]
+            elif new_prefix and not prefix:
+                new_nm = new_prefix + nm
+            hdrs = {"X-Copy-From": "/%s/%s" % (_quote(cont.name), _quote(nm))}
+            try:
+                if move and etag is None:
+                    etag = self.connection.head_object(cont.name,
+                            nm).get("etag")
+                new_etag = self.connection.put_object(new_cont.name, new_nm,
+                        contents=None, headers=hdrs)
+            except _swift_client.ClientException as e:
+                if e.http_status == 404:
+                    return "not_found"
+                raise
+            new_cont.remove_from_cache(new_nm)
+            if not move:
+                return done
+            if not etag or (new_etag or "").strip('"') != etag.strip('"'):
+                raise exc.UploadFailed("Copy could not be verified; the "
+                        "original was not deleted.")
+            try:
+                self.connection.delete_object(cont.name, nm)
+            except _swift_client.ClientException as e:
+                if e.http_status != 404:
+                    raise
+            cont.remove_from_cache(nm)
+            return done
+
+        result = {done: 0, "not_found": 0, "errors": []}
+        try:
+            self._map_objects(cont, copy, result, object_names=object_names,
+                    prefix=prefix, workers=workers)
+        finally:
+            new_cont._invalidate_counts()
+            if move:
+                cont._invalidate_counts()
+        return result
+
+
+    def _map_objects(self, cont, fnc, result, object_names=None, prefix=None,
+            workers=None, callback=None):
+        """
+        Calls 'fnc' with a (name, etag) 2-tuple for each of the named objects
+        (the etag is None), or for each object in the container whose name
+        begins with 'prefix'. The calls are made by a single pool of 'workers'
+        threads, which is fed one listing page of objects at a time.
+
+        'fnc' returns the key in the 'result' dict whose count is incremented;
+        any error it raises is added to result["errors"] as an (object name,
+        reason) 2-tuple. If 'callback' is given, it is called with 'result'
+        once for each page, so that the caller can report progress; the last
+        call is made when every object has been processed.
+        """
+        if object_names is not None:
+            items = [(self._resolve_name(nm), None) for nm in object_names]
+            if prefix:
+                items = [item for item in items if item[0].startswith(prefix)]
+            size = self.listing_page_size
+            batches = (items[pos:pos + size]
+                    for pos in xrange(0, len(items), size))
+        else:
+            batches = ([(obj.name, obj.etag) for obj in page]
+                    for page in self._iter_listing_pages(cont, prefix=prefix,
+                    limit=self.listing_page_size))
+
+        def tally(results):
+            for item, outcome, err in results:
+                if err:
+                    result["errors"].append((item[0], "%s" % err))
+                else:
+                    result[outcome] += 1
+
+        pool = utils.WorkerPool(fnc, workers=workers or DEFAULT_CONCURRENCY)
+        queued = False
+        try:
+            for batch in batches:
+                tally(pool.pop_results())
+                if queued and callback:
+                    callback(result)
+                for item in batch:
+                    pool.put(item)
+                queued = True
+        except BaseException:
+            pool.cancel()
+            pool.join()
+            raise
+        tally(pool.join())
+        if queued and callback:
+            callback(result)
+        return result
+
+
     @handle_swiftclient_exception
     def upload_file(self, container, file_or_path, obj_name=None,
             content_type=None, etag=None, return_none=False):
@@ -399,38 +1175,70 @@ class CFClient(object):
             return total_size
 
         def upload(fileobj, content_type, etag):
+            start = 0
             if isinstance(fileobj, basestring):
                 # This is an empty directory file
                 fsize = 0
             else:
-                fsize = get_file_size(fileobj)
+                # Only the part of the file after the current position is
+                # uploaded, so the segments are counted from there.
+                start = fileobj.tell()
+                fsize = get_file_size(fileobj) - start
             if fsize < self.max_file_size:
                 # We can just upload it as-is.
                 return self.connection.put_object(cont.name, obj_name,
                         contents=fileobj, content_type=content_type,
                         etag=etag)
             # Files larger than self.max_file_size must be segmented
-            # and uploaded separately.
+            # and uploaded separately. The progress is recorded in a journal
+            # so that an interrupted upload can be resumed without having to
+            # re-send the segments that were already stored.
             num_segments = int(math.ceil(float(fsize) / self.max_file_size))
             digits = int(math.log10(num_segments)) + 1
+            journal_path = self._upload_journal_path(cont.name, fname, fileobj,
+                    start, fsize)
+            journal = self._load_upload_journal(journal_path)
+            if journal["segments"]:
+                # This is a retry; find out which segments are already stored.
+                remote_etags = self._get_segment_etags(cont, "%s." % fname)
+            else:
+                remote_etags = {}
             # NOTE: This could be greatly improved with threading or other
             # async design.
             for segment in xrange(num_segments):
                 sequence = str(segment + 1).zfill(digits)
                 seg_name = "%s.%s" % (fname, sequence)
+                offset = segment * self.max_file_size
+                seg_size = min(self.max_file_size, fsize - offset)
+                seg_key = seg_name
+                if isinstance(seg_key, str):
+                    seg_key = seg_key.decode(pyrax.encoding)
+                entry = journal["segments"].get(seg_key)
+                if (entry and entry["offset"] == offset
+                        and entry["size"] == seg_size
+                        and entry["etag"] == remote_etags.get(seg_key)):
+                    # Already uploaded during a previous attempt.
+                    continue
+                fileobj.seek(start + offset)
                 with utils.SelfDeletingTempfile() as tmpname:
                     with file(tmpname, "wb") as tmp:
                         tmp.write(fileobj.read(self.max_file_size))
                     with file(tmpname, "rb") as tmp:
                         # We have to calculate the etag for each segment
                         etag = utils.get_checksum(tmp)
-                        self.connection.put_object(cont.name, seg_name,
-                                contents=tmp, content_type=content_type,
-                                etag=etag)
+                        if etag != remote_etags.get(seg_key):
+                            self.connection.put_object(cont.name, seg_name,
+                                    contents=tmp, content_type=content_type,
+                                    etag=etag)
+                journal["segments"][seg_key] = {"offset": offset,
+                        "size": seg_size, "etag": etag}
+                self._save_upload_journal(journal_path, journal)
             # Upload the manifest
             hdr = {"X-Object-Meta-Manifest": "%s." % fname}
-            return self.connection.put_object(cont.name, fname,
+            ret = self.connection.put_object(cont.name, fname,
                     contents=None, headers=hdr)
+            self._remove_upload_journal(journal_path)
+            return ret
 
         ispath = isinstance(file_or_path, basestring)
         if ispath:
@@ -445,18 +1253,105 @@ class CFClient(object):
             obj_name = fname
 
         if ispath and os.path.isfile(file_or_path):
+            if (etag is None and self.checksum_cache
+                    and os.path.getsize(file_or_path) < self.max_file_size):
+                # The etag is free if the checksum is already cached, and
+                # lets the server verify the upload.
+                etag = self._get_local_checksum(file_or_path)
             # Need to wrap the call in a context manager
             with file(file_or_path, "rb") as ff:
                 upload(ff, content_type, etag)
         else:
             upload(file_or_path, content_type, etag)
+        cont.remove_from_cache(obj_name)
+        cont._invalidate_counts()
         if return_none:
             return None
         else:
             return self.get_object(container, obj_name)
 
 
-    def upload_folder(self, folder_path, container=None, ignore=None):
+    def _upload_journal_path(self, cname, fname, fileobj, start, fsize):
+        """
+        Returns the path of the journal file used to track the segments of a
+        large upload. The path is derived from the target object, the position
+        the upload starts from and the size, and the inode and modification
+        time of the source file, so that a changed file never resumes from a
+        stale journal.
+
+        Returns None for file-like objects that are not backed by a real file:
+        without a stat there is no way to tell whether a later stream holds
+        the same data, so such uploads are not journaled.
+        """
+        try:
+            st = os.fstat(fileobj.fileno())
+        except (AttributeError, OSError, ValueError):
+            return None
+        key = "%s/%s/%s/%s/%s/%s/%s" % (cname, fname, start, fsize,
+                st.st_ino, st.st_mtime, self.max_file_size)
+        if isinstance(key, unicode):
+            key = key.encode(pyrax.encoding)
+        jname = "%s.json" % hashlib.sha1(key).hexdigest()
+        return os.path.join(self.upload_journal_dir, jname)
+
+
+    def _load_upload_journal(self, journal_path):
+        """
+        Reads the journal for a segmented upload. If there is no journal, or
+        if it cannot be read, an empty journal is returned.
+        """
+        if journal_path is None:
+            return {"segments": {}}
+        try:
+            with open(journal_path, "rb") as jfile:
+                journal = json.load(jfile)
+            journal["segments"]
+        except (IOError, ValueError, KeyError, TypeError):
+            journal = {"segments": {}}
+        return journal
+
+
+    def _save_upload_journal(self, journal_path, journal):
+        """
+        Writes the journal for a segmented upload. Failing to write the journal
+        doesn't affect the upload; it only means that it cannot be resumed.
+        """
+        if journal_path is None:
+            return
+        tmp_path = "%s.tmp" % journal_path
+        try:
+            if not os.path.isdir(self.upload_journal_dir):
+                os.makedirs(self.upload_journal_dir)
+            with open(tmp_path, "wb") as jfile:
+                json.dump(journal, jfile)
+            os.rename(tmp_path, journal_path)
+        except (IOError, OSError):
+            pass
+
+
+    def _remove_upload_journal(self, journal_path):
+        """Deletes the journal once the segmented upload has completed."""
+        if journal_path is None:
+            return
+        try:
+            os.remove(journal_path)
+        except OSError:
+            pass
+
+
+    def _get_segment_etags(self, container, prefix):
+        """
+        Returns a dict mapping the names of any stored segments that begin
+        with the specified prefix to their etags.
+        """
+        cname = self._resolve_name(container)
+        hdrs, objs = self.connection.get_container(cname, prefix=prefix,
+                full_listing=True)
+        return dict((obj["name"], obj["hash"]) for obj in objs)
+
+
+    def upload_folder(self, folder_path, container=None, ignore=None,
+            workers=None, archive_format=None):
         """
         Convenience method for uploading an entire folder, including any
         sub-folders, to Cloud Files.
@@ -490,32 +1385,58 @@ class CFClient(object):
         cancel_folder_upload(uuid), passing the uuid returned by the initial call.
         It will then be up to you to either keep or delete the partially-uploaded
         content.
+
+        The files are uploaded concurrently by 'workers' threads (default =
+        DEFAULT_CONCURRENCY). Calling get_folder_upload_status(uuid) returns
+        the number of files and bytes uploaded so far, along with the current
+        upload rates.
+
+        Uploading a folder full of small files is dominated by the time taken
+        for each request. If 'archive_format' is 'tar' or 'tar.gz', files
+        smaller than 'archive_max_file_size' are instead combined into
+        archives, which are created while they are being sent and unpacked
+        into the container by Cloud Files. Larger files are uploaded
+        individually as usual.
         """
         if not os.path.isdir(folder_path):
             raise exc.FolderNotFound("No such folder: '%s'" % folder_path)
+        if archive_format not in (None, "tar", "tar.gz"):
+            raise exc.InvalidArchiveFormat("Archive format must be 'tar' or "
+                    "'tar.gz'; received '%s'." % archive_format)
 
         ignore = utils.coerce_string_to_list(ignore)
-        total_bytes = utils.folder_size(folder_path, ignore)
+        # Walk the folder just once; the same listing is used both for the
+        # total size and for the upload itself.
+        files = list(utils.walk_files(folder_path, ignore))
+        total_bytes = sum(size for relpath, size, mtime in files)
         upload_key = str(uuid.uuid4())
         self.folder_upload_status[upload_key] = {"continue": True,
                 "total_bytes": total_bytes,
                 "uploaded": 0,
+                "uploaded_files": 0,
+                "bytes_per_sec": 0.0,
+                "files_per_sec": 0.0,
+                "start_time": time.time(),
+                "errors": [],
                 }
         self._upload_folder_in_background(folder_path, container, ignore,
-                upload_key)
+                upload_key, workers=workers, files=files,
+                archive_format=archive_format)
         return (upload_key, total_bytes)
 
 
     def _upload_folder_in_background(self, folder_path, container, ignore,
-            upload_key):
+            upload_key, workers=None, files=None, archive_format=None):
         """Runs the folder upload in the background."""
         uploader = FolderUploader(folder_path, container, ignore, upload_key,
-                self)
+                self, workers=workers, files=files,
+                archive_format=archive_format)
         uploader.start()
 
 
     def sync_folder_to_container(self, folder_path, container, delete=False,
-            include_hidden=False, ignore=None, ignore_timestamps=False):
+            include_hidden=False, ignore=None, ignore_timestamps=False,
+            workers=None, hash_workers=None):
         """
         Compares the contents of the specified folder, and checks to make sure that
         the corresponding object is present in the specified container. If there is
@@ -539,76 +1460,309 @@ class CFClient(object):
         uploaded. The patterns should be standard *nix-style shell patterns; e.g.,
         '*pyc' will ignore all files ending in 'pyc', such as 'program.pyc' and
         'abcpyc'.
-        """
-        cont = self.get_container(container)
-        self._local_files = []
-        self._sync_folder_to_container(folder_path, cont, prefix="", delete=delete,
-                include_hidden=include_hidden, ignore=ignore,
-                ignore_timestamps=ignore_timestamps)
-
 
-    def _sync_folder_to_container(self, folder_path, cont, prefix, delete,
-            include_hidden, ignore, ignore_timestamps):
+        The checksums of the local files are computed by a pool of
+        'hash_workers' threads (default = the number of CPUs), and the files
+        that need to be uploaded are handed to 'workers' upload threads
+        (default = DEFAULT_CONCURRENCY) as soon as their checksums are known.
         """
-        This is the internal method that is called recursively to handle
-        nested folder structures.
-        """
-        fnames = os.listdir(folder_path)
+        cont = self.get_container(container)
         ignore = utils.coerce_string_to_list(ignore)
         if not include_hidden:
             ignore.append(".*")
-        for fname in fnames:
-            if utils.match_pattern(fname, ignore):
-                continue
-            pth = os.path.join(folder_path, fname)
-            if os.path.isdir(pth):
-                subprefix = fname
-                if prefix:
-                    subprefix = "%s/%s" % (prefix, subprefix)
-                self._sync_folder_to_container(pth, cont, prefix=subprefix,
-                        delete=delete, include_hidden=include_hidden,
-                        ignore=ignore, ignore_timestamps=ignore_timestamps)
-                continue
-            self._local_files.append(os.path.join(prefix, fname))
-            local_etag = utils.get_checksum(pth)
-            fullname = fname
-            if prefix:
-                fullname = "%s/%s" % (prefix, fname)
-            try:
-                obj = cont.get_object(fullname)
-                obj_etag = obj.etag
-            except exc.NoSuchObject:
-                obj = None
-                obj_etag = None
+        # List the container once, rather than looking up each object.
+        remote_index = self._get_remote_index(cont)
+        local_files = {}
+        for relpath, size, mtime in utils.walk_files(folder_path, ignore):
+            fullname = relpath.replace(os.sep, "/")
+            local_files[os.path.join(folder_path, relpath)] = (fullname, mtime)
+        self._local_files = [fullname for fullname, mtime
+                in local_files.values()]
+
+        def upload(item):
+            pth, fullname, local_etag = item
+            cont.upload_file(pth, obj_name=fullname, etag=local_etag,
+                    return_none=True)
+
+        checksums = self._checksum_files(local_files.keys(),
+                hash_workers=hash_workers)
+        pool = utils.WorkerPool(upload, workers=workers or DEFAULT_CONCURRENCY)
+        for pth, local_etag in checksums:
+            fullname, mtime = local_files[pth]
+            key = fullname
+            if isinstance(key, str):
+                key = key.decode(pyrax.encoding)
+            obj_etag, obj_last_modified, obj_bytes = remote_index.get(key,
+                    (None, None, None))
             if local_etag != obj_etag:
                 if not ignore_timestamps:
-                    if obj:
-                        obj_time_str = obj.last_modified[:19]
+                    if obj_last_modified:
+                        obj_time_str = obj_last_modified[:19]
                     else:
                         obj_time_str = EARLY_DATE_STR
-                    local_mod = datetime.datetime.utcfromtimestamp(
-                            os.stat(pth).st_mtime)
+                    local_mod = datetime.datetime.utcfromtimestamp(mtime)
                     local_mod_str = local_mod.isoformat()
                     if obj_time_str >= local_mod_str:
                         # Remote object is newer
                         continue
-                cont.upload_file(pth, obj_name=fullname, etag=local_etag,
-                        return_none=True)
-        if delete and not prefix:
-            self._delete_objects_not_in_list(cont)
+                pool.put((pth, fullname, local_etag))
+        errors = [err for item, result, err in pool.join() if err]
+        if errors:
+            raise errors[0]
+        if delete:
+            self._delete_objects_not_in_list(cont, remote_index)
 
 
-    def _delete_objects_not_in_list(self, cont):
+    def sync_container_to_folder(self, container, folder_path, prefix=None,
+            delete=False, include_hidden=False, ignore=None, workers=None,
+            hash_workers=None):
+        """
+        The reverse of sync_folder_to_container(): makes the local folder
+        match the objects in the container, or just those whose names begin
+        with 'prefix'. Each object is stored at the path given by its name,
+        relative to the folder.
+
+        A local file is left alone if its size and MD5 checksum match the
+        object's etag; all other objects are downloaded by a pool of
+        'workers' threads (default = DEFAULT_CONCURRENCY). Each object is
+        downloaded to a temporary file, checked against its etag, and then
+        renamed into place, so a file is never left partly written. Its
+        modification time is set to that of the object. Checksums are
+        computed as for sync_folder_to_container().
+
+        If 'delete' is True, any local files that don't have a corresponding
+        object are deleted; when a 'prefix' is given, only the files whose
+        paths begin with it are considered. Hidden files and files matching
+        the 'ignore' patterns are neither downloaded nor deleted.
+
+        Failures don't stop the run. A dict is returned with the number of
+        objects 'downloaded', the number of local files 'deleted', and a list
+        of 'errors', each of which is an (object name, reason) 2-tuple.
+        """
+        cont = self.get_container(container)
+        ignore = utils.coerce_string_to_list(ignore)
+        if not include_hidden:
+            ignore.append(".*")
+        regex = utils.compile_patterns(ignore)
+        folder_path = os.path.abspath(folder_path)
+        if not os.path.isdir(folder_path):
+            os.makedirs(folder_path)
+        remote = {}
+        for page in self._iter_listing_pages(cont, prefix=prefix,
+                limit=self.listing_page_size):
+            for obj in page:
+                parts = obj.name.split("/")
+                if obj.name.endswith("/") or "" in parts or "." in parts or (
+                        ".." in parts) or (regex and [part for part in parts
+                        if regex.match(part)]):
+                    # Pseudo-folders, names that can't be stored safely, and
+                    # ignored names are skipped.
+                    continue
+                remote[obj.name] = obj
+        local = {}
+        for relpath, size, mtime in utils.walk_files(folder_path, ignore):
+            name = relpath.replace(os.sep, "/")
+            if isinstance(name, str):
+                name = name.decode(pyrax.encoding)
+            if prefix and not name.startswith(prefix):
+                continue
+            local[name] = (os.path.join(folder_path, relpath), size)
+        to_check = {}
+        downloads = []
+        for name, obj in remote.iteritems():
+            pth, size = local.get(name, (None, None))
+            if size is not None and size == obj.total_bytes:
+                to_check[pth] = obj
+            else:
+                downloads.append(obj)
+        result = {"downloaded": 0, "deleted": 0, "errors": []}
+
+        def download(item):
+            obj, mtime = item
+            dest = os.path.join(folder_path, *obj.name.split("/"))
+            dirname = os.path.dirname(dest)
+            if not os.path.isdir(dirname):
+                try:
+                    os.makedirs(dirname)
+                except OSError:
+                    # Another thread may have just created it.
+                    if not os.path.isdir(dirname):
+                        raise
+            fd, tmp = tempfile.mkstemp(dir=dirname,
+                    prefix=".%s." % os.path.basename(dest))
+            os.close(fd)
+            parts = max(1, int(math.ceil(float(obj.total_bytes or 0) /
+                    self.download_part_size)))
+            try:
+                self.download_object(cont, obj.name, tmp,
+                        workers=min(parts, DEFAULT_CONCURRENCY))
+                if mtime is not None:
+                    os.utime(tmp, (mtime, mtime))
+                os.rename(tmp, dest)
+            except Exception:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+
+        def queue(obj):
+            # The times are parsed here, since strptime() isn't safe to call
+            # for the first time in several threads at once.
+            mtime = None
+            if obj.last_modified:
+                mtime = calendar.timegm(time.strptime(obj.last_modified[:19],
+                        "%Y-%m-%dT%H:%M:%S"))
+            pool.put((obj, mtime))
+
+        pool = utils.WorkerPool(download, workers=workers or DEFAULT_CONCURRENCY)
+        for obj in downloads:
+            queue(obj)
+        checksums = self._checksum_files(to_check.keys(),
+                hash_workers=hash_workers)
+        for pth, checksum in checksums:
+            obj = to_check[pth]
+            if checksum != (obj.etag or "").strip('"'):
+                queue(obj)
+        for (obj, mtime), ret, err in pool.join():
+            if err:
+                result["errors"].append((obj.name, "%s" % err))
+            else:
+                result["downloaded"] += 1
+        if delete:
+            for name, (pth, size) in local.iteritems():
+                if name in remote:
+                    continue
+                try:
+                    os.remove(pth)
+                    result["deleted"] += 1
+                except OSError as e:
+                    result["errors"].append((name, "%s" % e))
+        return result
+
+
+    def watch_folder(self, folder_path, container, delete=False,
+            include_hidden=False, ignore=None, debounce=None, workers=None,
+            hash_workers=None, poll_interval=None):
+        """
+        Keeps the container in sync with the folder until stopped, instead of
+        re-running sync_folder_to_container() on a timer. The folder is first
+        reconciled with the container as a whole; after that, only the files
+        that change are checksummed and uploaded, and when 'delete' is True
+        the objects for files that are removed are deleted. On Linux the
+        changes are reported by inotify; elsewhere, the folder is walked every
+        'poll_interval' seconds (default = folder_sync_poll_interval).
+
+        A file is only uploaded once it has been left alone for 'debounce'
+        seconds (default = folder_sync_debounce), so a file that is written
+        in several steps is uploaded just once. The local files always win:
+        an object is replaced whenever it differs from its file, whatever the
+        timestamps. 'include_hidden', 'ignore', 'workers' and 'hash_workers'
+        are as for sync_folder_to_container().
+
+        The syncing is done in the background. The FolderSyncer that does it
+        is returned; call its get_status() method for the progress so far,
+        and its stop() method to stop syncing.
+        """
+        if not os.path.isdir(folder_path):
+            raise exc.FolderNotFound("No such folder: '%s'" % folder_path)
+        syncer = FolderSyncer(folder_path, container, self, delete=delete,
+                include_hidden=include_hidden, ignore=ignore,
+                debounce=debounce, workers=workers, hash_workers=hash_workers,
+                poll_interval=poll_interval)
+        syncer.start()
+        return syncer
+
+
+    def _checksum_files(self, paths, hash_workers=None):
+        """
+        Generates a (path, checksum) 2-tuple for each of the specified local
+        files, in no particular order, as soon as its checksum is ready.
+        Checksums that are not available from the checksum cache are computed
+        by a pool of 'hash_workers' threads (default = the number of CPUs).
+        The files are read in 64KB blocks, and hashlib releases the GIL while
+        hashing blocks larger than 2KB, so all the CPUs are used.
+        'paths' can be any iterable, such as a folder walk; it is consumed
+        only as fast as the checksums are used. Files that can no longer be
+        read are skipped.
+        """
+        if hash_workers is None:
+            hash_workers = multiprocessing.cpu_count()
+        results = Queue.Queue(hash_workers * 4)
+        stop = threading.Event()
+
+        def put(kind, val):
+            # Give up if the caller has stopped reading the results.
+            while not stop.is_set():
+                try:
+                    results.put((kind, val), timeout=0.1)
+                    return
+                except Queue.Full:
+                    continue
+
+        def checksum(pth):
+            if stop.is_set():
+                return
+            try:
+                put("item", (pth, self._get_local_checksum(pth)))
+            except (IOError, OSError):
+                pass
+
+        def produce():
+            pool = utils.WorkerPool(checksum, workers=hash_workers)
+            try:
+                for pth in paths:
+                    if stop.is_set():
+                        break
+                    pool.put(pth)
+            except Exception:
+                pool.cancel()
+                pool.join()
+                self._flush_checksum_cache()
+                put("error", sys.exc_info())
+                return
+            pool.join()
+            # The cache commits its new checksums in batches.
+            self._flush_checksum_cache()
+            put("done", None)
+
+        thread = threading.Thread(target=produce)
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                kind, val = results.get()
+                if kind == "done":
+                    break
+                if kind == "error":
+                    raise val[0], val[1], val[2]
+                yield val
+        finally:
+            stop.set()
+
+
+    def _get_remote_index(self, cont):
+        """
+        Returns a dict that maps the name of every object in the container to
+        a 3-tuple of (etag, last_modified, bytes), built from a single full
+        listing of the container.
+        """
+        return dict((obj.name, (obj.etag, obj.last_modified, obj.total_bytes))
+                for obj in cont.get_objects(full_listing=True))
+
+
+    def _delete_objects_not_in_list(self, cont, remote_index=None):
         """
         Finds all the objects in the specified container that are not present in the
-        self._local_files list, and deletes them.
+        self._local_files list, and deletes them. If the 'remote_index' of the
+        container's objects is not supplied, the container is listed.
         """
-        for obj in cont.get_objects(full_listing=True):
-            objname = obj.name
+        if remote_index is None:
+            remote_index = self._get_remote_index(cont)
+        local_files = set(self._local_files)
+        for objname in remote_index:
             if isinstance(objname, unicode):
                 objname = objname.encode(pyrax.encoding)
-            if objname not in self._local_files:
-                obj.delete()
+            if objname not in local_files:
+                self.delete_object(container=cont.name, name=objname)
 
 
     def _valid_upload_key(fnc):
@@ -624,7 +1778,23 @@ class CFClient(object):
 
     @_valid_upload_key
     def _update_progress(self, upload_key, size):
-        self.folder_upload_status[upload_key]["uploaded"] += size
+        # Several upload workers may be reporting progress at the same time.
+        with self._progress_lock:
+            status = self.folder_upload_status[upload_key]
+            status["uploaded"] += size
+            status["uploaded_files"] = status.get("uploaded_files", 0) + 1
+            start = status.get("start_time")
+            if start:
+                elapsed = max(time.time() - start, 0.001)
+                status["bytes_per_sec"] = status["uploaded"] / elapsed
+                status["files_per_sec"] = status["uploaded_files"] / elapsed
+
+
+    @_valid_upload_key
+    def _record_upload_error(self, upload_key, obj_name, error):
+        with self._progress_lock:
+            status = self.folder_upload_status[upload_key]
+            status.setdefault("errors", []).append((obj_name, error))
 
 
     @_valid_upload_key
@@ -633,6 +1803,25 @@ class CFClient(object):
         return self.folder_upload_status[upload_key]["uploaded"]
 
 
+    @_valid_upload_key
+    def get_folder_upload_status(self, upload_key):
+        """
+        Returns a dict describing the progress of the specified folder upload,
+        with the following keys:
+            total_bytes - the total bytes to be uploaded
+            uploaded - the number of bytes uploaded so far
+            uploaded_files - the number of files uploaded so far
+            bytes_per_sec - the average upload rate in bytes
+            files_per_sec - the average upload rate in files
+            errors - a list of (object name, exception) for failed files
+        """
+        with self._progress_lock:
+            status = dict(self.folder_upload_status[upload_key])
+            status["errors"] = list(status.get("errors", []))
+        status.pop("continue", None)
+        return status
+
+
     @_valid_upload_key
     def cancel_folder_upload(self, upload_key):
         """
@@ -662,22 +1851,221 @@ class CFClient(object):
         When 'include_meta' is True, what is returned from this method is a 2-tuple:
             Element 0: a dictionary containing metadata about the file.
             Element 1: a stream of bytes representing the object's contents.
+
+        If the content cache is enabled (see enable_content_cache()) and no
+        'chunk_size' is given, an unchanged object is read from the cache.
         """
         cname = self._resolve_name(container)
         oname = self._resolve_name(obj_name)
-        (meta, data) = self.connection.get_object(cname, oname,
-                resp_chunk_size=chunk_size)
+        if self.content_cache and chunk_size is None:
+            (meta, data) = self._fetch_cached_object(cname, oname)
+        else:
+            (meta, data) = self.connection.get_object(cname, oname,
+                    resp_chunk_size=chunk_size)
         if include_meta:
             return (meta, data)
         else:
             return data
 
 
+    def _fetch_cached_object(self, cname, oname):
+        """
+        Returns the (headers, contents) of the object, using the copy in the
+        content cache if the object has not changed since it was cached.
+        """
+        cache = self.content_cache
+        etag = cache.lookup(cname, oname)
+        hdrs = {"If-None-Match": etag} if etag else {}
+        resp = self.connection.storage_request("GET", [cname, oname],
+                hdrs=hdrs)
+        contents = resp.read()
+        if resp.status == 304 and etag:
+            cached = cache.get(cname, oname)
+            if cached is not None:
+                return cached
+            # The cached copy has gone; get() forgot it, so ask again.
+            return self._fetch_cached_object(cname, oname)
+        if not 200 <= resp.status < 300:
+            if resp.status == 404:
+                cache.remove(cname, oname)
+            raise _swift_client.ClientException("Object GET failed",
+                    http_status=resp.status, http_reason=resp.reason)
+        headers = dict((key.lower(), val) for key, val in resp.getheaders())
+        cache.store(cname, oname, headers.get("etag"), headers, contents)
+        return (headers, contents)
+
+
+    @handle_swiftclient_exception
+    def open_object(self, container, obj_name, block_size=1048576,
+            cache_blocks=32):
+        """
+        Returns a RemoteFile: a read-only, seekable file-like object for the
+        specified object. Only the parts of the object that are read are
+        downloaded, using Range requests; up to 'cache_blocks' blocks of
+        'block_size' bytes are kept in memory.
+        """
+        return RemoteFile(self, container, obj_name, block_size=block_size,
+                cache_blocks=cache_blocks)
+
+
+    def stream_object(self, container, obj_name, chunk_size=65536):
+        """
+        Returns an ObjectStream: a read-only file-like object for the contents
+        of the specified object. The contents are read from the server as they
+        are consumed, so memory use is constant regardless of the object's
+        size. The stream uses a connection of its own from the connection
+        pool, so other requests can be made while it is being read; close the
+        stream to return the connection to the pool.
+
+        The stream's checksum is verified as it is read; if the contents don't
+        match the object's etag, a DownloadFailed exception is raised once the
+        end of the stream is reached.
+        """
+        cname = self._resolve_name(container)
+        oname = self._resolve_name(obj_name)
+        conn = self._connection_pool.get()
+
+        def release(reusable):
+            if not reusable and conn.http_conn:
+                # The rest of the response is still waiting to be read, so
+                # the connection can't be used for another request.
+                conn.http_conn[1].close()
+                conn.http_conn = None
+            self._connection_pool.put(conn)
+
+        try:
+            response = conn.storage_request("GET", [cname, oname])
+        except Exception:
+            self._connection_pool.put(conn)
+            raise
+        if not 200 <= response.status < 300:
+            response.read()
+            self._connection_pool.put(conn)
+            if response.status == 404:
+                raise exc.NoSuchObject("No object with the name '%s' exists"
+                        % oname)
+            raise exc.DownloadFailed("Bad response: (%s) %s" % (response.status,
+                    response.reason))
+        return ObjectStream(oname, response, chunk_size=chunk_size,
+                release=release)
+
+
+    @handle_swiftclient_exception
+    def download_object(self, container, obj_name, path, workers=None,
+            part_size=None):
+        """
+        Downloads the object to the file at the specified path. The object is
+        split into ranges of 'part_size' bytes, which are requested
+        concurrently by 'workers' threads and written to the file at their
+        respective offsets, so large objects are neither limited by a single
+        connection nor held in memory.
+
+        Once all the ranges have been written, the file is checked against the
+        object's etag. For segmented objects the file is instead checked
+        against the etag of each segment. If the check fails, the file is
+        deleted and a DownloadFailed exception is raised.
+        """
+        cname = self._resolve_name(container)
+        oname = self._resolve_name(obj_name)
+        if workers is None:
+            workers = DEFAULT_CONCURRENCY
+        if part_size is None:
+            part_size = self.download_part_size
+        headers = self.connection.head_object(cname, oname)
+        size = int(headers.get("content-length", 0))
+        etag = headers.get("etag", "").strip('"')
+        manifest = headers.get("x-object-manifest")
+        range_hdrs = {}
+        if not manifest:
+            # Make sure that every range comes from the same version of the
+            # object.
+            range_hdrs["If-Match"] = etag
+        # Create the file at its full size, so that each part can be written
+        # at its offset independently of the others.
+        with open(path, "wb") as ff:
+            ff.truncate(size)
+
+        def fetch_part(start):
+            end = min(start + part_size, size) - 1
+            hdrs = {"Range": "bytes=%s-%s" % (start, end)}
+            hdrs.update(range_hdrs)
+            response = self.connection.storage_request("GET", [cname, oname],
+                    hdrs=hdrs)
+            if not 200 <= response.status < 300:
+                response.read()
+                raise exc.DownloadFailed("Bad response for the range %s-%s of "
+                        "object '%s': (%s) %s" % (start, end, oname,
+                        response.status, response.reason))
+            received = 0
+            with open(path, "r+b") as ff:
+                ff.seek(start)
+                while True:
+                    chunk = response.read(65536)
+                    if not chunk:
+                        break
+                    ff.write(chunk)
+                    received += len(chunk)
+            if received != end - start + 1:
+                raise exc.DownloadFailed("Received %s bytes for the range "
+                        "%s-%s of object '%s'." % (received, start, end, oname))
+
+        pool = utils.WorkerPool(fetch_part, workers=workers)
+        results = pool.map(xrange(0, size, part_size))
+        errors = [err for item, result, err in results if err]
+        try:
+            if errors:
+                raise exc.DownloadFailed("Download of object '%s' failed: %s" %
+                        (oname, errors[0]))
+            if manifest:
+                self._verify_segments(path, manifest, size)
+            elif utils.get_file_checksum(path) != etag:
+                raise exc.DownloadFailed("The downloaded file does not match "
+                        "the etag of object '%s'." % oname)
+        except Exception:
+            os.remove(path)
+            raise
+
+
+    def _verify_segments(self, path, manifest, size):
+        """
+        Compares each range of the downloaded file with the etag of the
+        corresponding segment of a large object.
+        """
+        seg_cont, seg_prefix = manifest.split("/", 1)
+        hdrs, segments = self.connection.get_container(seg_cont,
+                prefix=seg_prefix, full_listing=True)
+        offset = 0
+        for seg in segments:
+            seg_size = int(seg["bytes"])
+            if utils.get_file_checksum(path, offset, seg_size) != seg["hash"]:
+                raise exc.DownloadFailed("The downloaded file does not match "
+                        "segment '%s'." % seg["name"])
+            offset += seg_size
+        if offset != size:
+            raise exc.DownloadFailed("The segments of the object total %s "
+                    "bytes, but %s bytes were expected." % (offset, size))
+
+
     @handle_swiftclient_exception
     def get_all_containers(self, limit=None, marker=None, **parms):
+        """
+        Returns a list of Container objects for the containers in the account.
+        The containers are also added to the container cache, so subsequent
+        calls to get_container() for any of them don't need a request.
+        """
         hdrs, conts = self.connection.get_container("")
-        ret = [Container(self, name=cont["name"], object_count=cont["count"],
-                total_bytes=cont["bytes"]) for cont in conts]
+        ret = []
+        for info in conts:
+            cont = self._container_cache.get(info["name"])
+            if cont:
+                # Keep the existing object, but with the current counts.
+                cont.object_count = int(info["count"])
+                cont.total_bytes = int(info["bytes"])
+            else:
+                cont = Container(self, name=info["name"],
+                        object_count=info["count"], total_bytes=info["bytes"])
+            self._container_cache[cont.name] = cont
+            ret.append(cont)
         return ret
 
 
@@ -696,6 +2084,14 @@ class CFClient(object):
         return cont
 
 
+    def clear_container_cache(self):
+        """
+        Discards all the cached Container objects, so that each container is
+        looked up again the next time it is needed.
+        """
+        self._container_cache.clear()
+
+
     @handle_swiftclient_exception
     def get_container_objects(self, container, marker=None, limit=None,
             prefix=None, delimiter=None, full_listing=False):
@@ -715,6 +2111,215 @@ class CFClient(object):
                 if "name" in obj]
 
 
+    def iter_container_objects(self, container, prefix=None, delimiter=None,
+            marker=None, page_size=None, prefetch=True):
+        """
+        Generates a StorageObject for each of the objects in the container, in
+        name order, without holding the full listing in memory. The listing is
+        requested one page of 'page_size' names at a time (default =
+        listing_page_size); unless 'prefetch' is False, the next page is
+        requested in the background while the current one is being consumed.
+        The 'prefix', 'delimiter' and 'marker' parameters work as they do for
+        get_container_objects().
+        """
+        cont = self.get_container(container)
+        pages = self._iter_listing_pages(cont, prefix=prefix,
+                delimiter=delimiter, marker=marker,
+                limit=page_size or self.listing_page_size)
+        if prefetch:
+            pages = utils.prefetch(pages)
+        for page in pages:
+            for obj in page:
+                yield obj
+
+
+    def iter_container_objects_parallel(self, container, prefixes=None,
+            partitions=None, prefix=None, ordered=True, workers=None,
+            page_size=None):
+        """
+        Generates a StorageObject for each of the objects in the container,
+        listing several ranges of names at the same time. This is much faster
+        than a sequential listing for containers holding millions of objects.
+
+        The names are divided into ranges in one of two ways. If you pass a
+        list of 'prefixes', each prefix is listed separately; these must not
+        overlap, and objects that don't match any of them are not listed.
+        Otherwise, the container (or just the names beginning with 'prefix')
+        is sampled with a few small listings to choose the boundaries of up to
+        'partitions' ranges (default = 'workers' * 4).
+
+        The ranges are listed by 'workers' threads (default =
+        DEFAULT_CONCURRENCY), each one page of 'page_size' names at a time.
+        If 'ordered' is True, the objects are returned in name order, just as
+        for iter_container_objects(). Otherwise they are returned as soon as
+        each page arrives, which is faster when the order doesn't matter.
+        """
+        cont = self.get_container(container)
+        workers = workers or DEFAULT_CONCURRENCY
+        limit = page_size or self.listing_page_size
+        if prefixes:
+            ranges = [(pfx, None, None) for pfx in sorted(set(prefixes))]
+        else:
+            bounds = self._sample_boundaries(cont, partitions or workers * 4,
+                    prefix=prefix, workers=workers)
+            # Swift's end_marker is exclusive, so append the lowest character
+            # to include each boundary name in the range that ends with it;
+            # the next range starts after it.
+            lowers = [None] + bounds
+            uppers = [bound + u"\x00" for bound in bounds] + [None]
+            ranges = [(prefix, lower, upper)
+                    for lower, upper in zip(lowers, uppers)]
+        if ordered:
+            # Each range has its own small queue, and the queues are read in
+            # order; the later ranges wait until they are reached.
+            queues = [Queue.Queue(2) for rng in ranges]
+        else:
+            shared = Queue.Queue(workers * 2)
+            queues = [shared] * len(ranges)
+        stop = threading.Event()
+
+        def put(que, kind, val):
+            while not stop.is_set():
+                try:
+                    que.put((kind, val), timeout=0.1)
+                    return True
+                except Queue.Full:
+                    continue
+            return False
+
+        def list_range(idx):
+            rng_prefix, marker, end_marker = ranges[idx]
+            que = queues[idx]
+            try:
+                for page in self._iter_listing_pages(cont, prefix=rng_prefix,
+                        marker=marker, end_marker=end_marker, limit=limit):
+                    if not put(que, "page", page):
+                        return
+            except Exception:
+                put(que, "error", sys.exc_info())
+                return
+            put(que, "done", None)
+
+        pool = utils.WorkerPool(list_range, workers=min(workers, len(ranges)),
+                queue_size=len(ranges))
+        try:
+            for idx in xrange(len(ranges)):
+                pool.put(idx)
+            remaining = len(ranges)
+            que_iter = iter(queues)
+            que = que_iter.next()
+            while remaining:
+                kind, val = que.get()
+                if kind == "page":
+                    for obj in val:
+                        yield obj
+                    continue
+                if kind == "error":
+                    raise val[0], val[1], val[2]
+                remaining -= 1
+                if ordered and remaining:
+                    que = que_iter.next()
+        finally:
+            stop.set()
+            pool.join()
+
+
+    def _sample_boundaries(self, cont, partitions, prefix=None, workers=None,
+            sample_size=100):
+        """
+        Returns a sorted list of up to 'partitions' - 1 object names that
+        divide the container's names into ranges of similar sizes.
+
+        The first page of names is listed, and the name space after it is
+        probed by listings that start at markers made by raising each
+        character of the last name on that page in turn. Each probe returns
+        up to 'sample_size' names, and the boundaries are picked evenly from
+        all of the names returned.
+        """
+        if partitions < 2:
+            return []
+        first = self._get_listing(cont.name, prefix=prefix, limit=sample_size)
+        names = [obj["name"] for obj in first if "name" in obj]
+        if len(names) < sample_size:
+            # Everything fits in a single page.
+            return []
+        last = names[-1]
+        probes = []
+        for pos in xrange(len(prefix or ""), len(last)):
+            higher = [char for char in _PROBE_CHARS if char > last[pos]]
+            step = max(1, len(higher) / self.listing_probe_fanout)
+            for char in higher[step - 1::step]:
+                probes.append(last[:pos] + char)
+        probes = probes[:self.listing_max_probes]
+
+        def probe(marker):
+            return [obj["name"] for obj in self._get_listing(cont.name,
+                    marker=marker, prefix=prefix, limit=sample_size)
+                    if "name" in obj]
+
+        pool = utils.WorkerPool(probe, workers=workers or DEFAULT_CONCURRENCY)
+        sample = set(names)
+        for marker, result, err in pool.map(probes):
+            if err:
+                raise err
+            sample.update(result)
+        sample = sorted(sample)
+        partitions = min(partitions, len(sample))
+        step = len(sample) / float(partitions)
+        return sorted(set(sample[int(step * idx)]
+                for idx in xrange(1, partitions)))
+
+
+    def _get_listing(self, cname, marker=None, limit=None, prefix=None,
+            delimiter=None, end_marker=None):
+        """
+        Returns a single page of the container's listing, as a list of dicts.
+        swiftclient doesn't support 'end_marker', so when it is needed the
+        request is made directly.
+        """
+        if end_marker is None:
+            hdrs, objs = self.connection.get_container(cname, marker=marker,
+                    limit=limit, prefix=prefix, delimiter=delimiter)
+            return objs
+        qparms = ["format=json"]
+        for key, val in (("marker", marker), ("end_marker", end_marker),
+                ("prefix", prefix), ("delimiter", delimiter)):
+            if val:
+                qparms.append("%s=%s" % (key, _quote(val)))
+        if limit:
+            qparms.append("limit=%d" % limit)
+        resp = self.connection.storage_request("GET", [cname],
+                query="&".join(qparms))
+        body = resp.read()
+        if resp.status == 404:
+            raise exc.NoSuchContainer("Container '%s' doesn't exist" % cname)
+        if not 200 <= resp.status < 300:
+            raise _swift_client.ClientException("Container GET failed",
+                    http_status=resp.status, http_reason=resp.reason)
+        if not body:
+            return []
+        return json.loads(body)
+
+
+    def _iter_listing_pages(self, cont, prefix=None, delimiter=None,
+            marker=None, limit=None, end_marker=None):
+        """
+        Generates a list of StorageObjects for each page of the container's
+        listing.
+        """
+        while True:
+            objs = self._get_listing(cont.name, marker=marker, limit=limit,
+                    prefix=prefix, delimiter=delimiter, end_marker=end_marker)
+            if not objs:
+                break
+            yield [StorageObject(self, container=cont, attdict=obj)
+                    for obj in objs if "name" in obj]
+            last = objs[-1]
+            marker = last.get("name", last.get("subdir"))
+            if limit and len(objs) < limit:
+                break
+
+
     @handle_swiftclient_exception
     def get_container_object_names(self, container, marker=None, limit=None,
             prefix=None, delimiter=None, full_listing=False):
@@ -768,6 +2373,47 @@ class CFClient(object):
         return response.read().splitlines()
 
 
+    @handle_swiftclient_exception
+    def load_cdn_data(self, containers=None):
+        """
+        Fetches the CDN settings of all the containers in the account with a
+        single listing (one request for each 10,000 containers), instead of a
+        HEAD request for each container. The CDN attributes of the Container
+        objects in 'containers' (default = all the containers in the cache)
+        are set from it, and remain valid for 'cdn_cache_ttl' seconds.
+        Containers that are not in the listing have never been CDN-enabled.
+
+        Returns a dict of the CDN info for each container in the listing,
+        keyed by name.
+        """
+        limit = 10000
+        info = {}
+        marker = None
+        while True:
+            query = "format=json&limit=%d" % limit
+            if marker:
+                query = "%s&marker=%s" % (query, _quote(marker))
+            response = self.connection.cdn_request("GET", [""], query=query)
+            status = response.status
+            body = response.read()
+            if not 200 <= status < 300:
+                raise exc.CDNFailed("Bad response: (%s) %s" % (status,
+                        response.reason))
+            page = json.loads(body) if body else []
+            for cdn_info in page:
+                info[cdn_info["name"]] = cdn_info
+            if len(page) < limit:
+                break
+            marker = page[-1]["name"]
+        if containers is None:
+            containers = [self._container_cache.get(cname)
+                    for cname in self._container_cache.keys()]
+        for cont in containers:
+            if cont:
+                cont._load_cdn_info(info.get(cont.name))
+        return info
+
+
     def make_container_public(self, container, ttl=None):
         """Enables CDN access for the specified container."""
         return self._cdn_set_access(container, ttl, True)
@@ -862,23 +2508,55 @@ class CFClient(object):
         if not ct.cdn_enabled:
             raise exc.NotCDNEnabled("The object '%s' is not in a "
                     "CDN-enabled container." % oname)
+        self._purge_cdn_path(ct.name, oname, email_addresses)
+        return True
+
+
+    def _purge_cdn_path(self, cname, oname, email_addresses=None):
+        """
+        Sends the request to purge the object from the CDN, and returns the
+        response, which has been read.
+        """
         hdrs = {}
         if email_addresses:
             if not isinstance(email_addresses, (list, tuple)):
                 email_addresses = [email_addresses]
             emls = ", ".join(email_addresses)
             hdrs = {"X-Purge-Email": emls}
-        response = self.connection.cdn_request("DELETE", ct.name, oname, hdrs=hdrs)
+        response = self.connection.cdn_request("DELETE", [cname, oname],
+                hdrs=hdrs)
         # Read the response to force it to close for the next request.
         response.read()
-        return True
+        return response
+
+
+    def purge_cdn_objects(self, container, names, email_addresses=None,
+            workers=None, rate=None):
+        """
+        Purges many objects in the container from the CDN, using a
+        CDNPurgeQueue. Returns the result of CDNPurgeQueue.flush().
+        """
+        queue = CDNPurgeQueue(self, email_addresses=email_addresses,
+                workers=workers, rate=rate)
+        for name in names:
+            queue.add(container, name)
+        return queue.flush()
 
 
     def _get_user_agent(self):
-        return self.connection.user_agent
+        if self._user_agent is None:
+            return self.connection.user_agent
+        return self._user_agent
 
     def _set_user_agent(self, val):
-        self.connection.user_agent = val
+        self._user_agent = val
+        # Update the connections of every thread, and those in the pool, not
+        # just the one used by the calling thread.
+        conns = set(self._connection_pool.connections())
+        conns.update((self._connection, self.connection))
+        for conn in conns:
+            if conn is not None:
+                conn.user_agent = val
 
     user_agent = property(_get_user_agent, _set_user_agent)
 
@@ -899,18 +2577,153 @@ class CFClient(object):
 
 
 
+class _SharedAuth(object):
+    """
+    Holds the storage URL and token shared by all of a client's connections,
+    so that when the token expires it is only renewed once, no matter how many
+    connections find that it has expired.
+    """
+    def __init__(self):
+        self.url = None
+        self.token = None
+        self._lock = threading.Lock()
+
+
+    def renew(self, stale_token, authenticate):
+        """
+        Returns the current (url, token), calling 'authenticate' to get new
+        ones unless another connection has already replaced 'stale_token'.
+        """
+        with self._lock:
+            if not self.token or self.token == stale_token:
+                self.url, self.token = authenticate()
+            return self.url, self.token
+
+
+
+class ConnectionPool(object):
+    """
+    Keeps connections that are no longer in use, so that other threads can
+    use them instead of opening new ones. Up to 'max_idle' connections are
+    kept; any more are closed. New connections are made by calling 'factory'.
+    """
+    def __init__(self, factory, max_idle=20):
+        self.factory = factory
+        self.max_idle = max_idle
+        self._idle = []
+        self._leases = set()
+        # Every connection made or returned by the pool that is still alive,
+        # whether idle or in use.
+        self._known = weakref.WeakSet()
+        # A lease can be collected, and so release its connection, at any
+        # point, even while this thread holds the lock.
+        self._lock = threading.RLock()
+
+
+    def get(self):
+        """Returns an idle connection, or a new one if there are none."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn = self.factory()
+        if conn is not None:
+            with self._lock:
+                self._known.add(conn)
+        return conn
+
+
+    def put(self, conn):
+        """Returns the connection to the pool."""
+        if conn is None:
+            return
+        with self._lock:
+            self._known.add(conn)
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+
+    def lease(self, conn):
+        """
+        Returns an object that puts the connection back in the pool when it
+        is garbage-collected, such as when the thread-local data holding it
+        is discarded.
+        """
+        holder = _Lease()
+
+        def release(ref):
+            with self._lock:
+                self._leases.discard(ref)
+            self.put(conn)
+
+        with self._lock:
+            self._leases.add(weakref.ref(holder, release))
+        return holder
+
+
+    def connections(self):
+        """
+        Returns the connections made by the pool, or returned to it, that
+        are still alive, whether they are idle or in use by a thread.
+        """
+        with self._lock:
+            return list(self._known)
+
+
+    def clear(self):
+        """Closes all the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+
+class _Lease(object):
+    pass
+
+
+
 class Connection(_swift_client.Connection):
     """This class wraps the swiftclient connection, adding support for CDN"""
     def __init__(self, *args, **kwargs):
         self.http_log_debug = kwargs.pop("http_log_debug", False)
+        self.shared_auth = kwargs.pop("shared_auth", None)
         self._http_log = _swift_client.http_log
         super(Connection, self).__init__(*args, **kwargs)
+        # The token that get_auth() should replace when it is next called.
+        self._auth_token = self.token
         # Add the user_agent, if not defined
         try:
             self.user_agent
         except AttributeError:
             self.user_agent = "swiftclient"
 
+
+    def get_auth(self):
+        """
+        Authenticates, or if the connection shares its token with others,
+        uses the token that another connection has already renewed.
+        """
+        authenticate = super(Connection, self).get_auth
+        if self.shared_auth is None:
+            url, token = authenticate()
+        else:
+            url, token = self.shared_auth.renew(self._auth_token, authenticate)
+        self._auth_token = token
+        return url, token
+
+
+    def close(self):
+        """Closes the storage and CDN connections."""
+        if self.http_conn:
+            self.http_conn[1].close()
+            self.http_conn = None
+        cdn_conn = getattr(self, "cdn_connection", None)
+        if cdn_conn is not None:
+            cdn_conn.close()
+
     def _make_cdn_connection(self, cdn_url=None):
         if cdn_url is not None:
             self.cdn_url = cdn_url
@@ -933,21 +2746,19 @@ class Connection(_swift_client.Connection):
         self.cdn_connection.is_ssl = is_ssl
 
 
-    def cdn_request(self, method, path=[], data="", hdrs=None):
+    def cdn_request(self, method, path=[], data="", hdrs=None, query=None):
         """
         Given a method (i.e. GET, PUT, POST, etc.), a path, data, header and
-        metadata dicts, performs an http request against the CDN service.
+        metadata dicts, performs an http request against the CDN service. An
+        optional 'query' string is appended to the URL.
 
         Taken directly from the cloudfiles library and modified for use here.
         """
-        def quote(val):
-            if isinstance(val, unicode):
-                val = val.encode("utf-8")
-            return urllib.quote(val)
-
-        pth = "/".join([quote(elem) for elem in path])
+        pth = "/".join([_quote(elem) for elem in path])
         uri_path = urlparse.urlparse(self.uri).path
         path = "%s/%s" % (uri_path.rstrip("/"), pth)
+        if query:
+            path = "%s?%s" % (path, query)
         headers = {"Content-Length": str(len(data)),
                 "User-Agent": self.user_agent,
                 "X-Auth-Token": self.token}
@@ -967,26 +2778,326 @@ class Connection(_swift_client.Connection):
                 response = None
             if response:
                 if response.status == 401:
-                    pyrax.identity.authenticate()
-                    headers["X-Auth-Token"] = pyrax.identity.token
+                    response.read()
+                    self.url, self.token = self.get_auth()
+                    headers["X-Auth-Token"] = self.token
+                else:
+                    break
+            attempt += 1
+        if self.http_log_debug:
+            self._http_log((path, method), {"headers": headers, "data": data},
+                    response, "")
+        return response
+
+
+    def storage_request(self, method, path=[], data="", hdrs=None, query=None,
+            chunks=None):
+        """
+        Performs an http request against the storage service, for those calls
+        that are not supported by swiftclient. The parameters are the same as
+        for cdn_request().
+
+        If the size of the request body is not known in advance, pass a
+        callable as 'chunks' instead of 'data'. It must return an iterator of
+        strings, which are sent using chunked transfer encoding; it is called
+        again if the request has to be retried.
+
+        The response is returned unread; it must be read completely before
+        another request is made with this connection.
+        """
+        pth = "/".join([_quote(elem) for elem in path])
+        uri_path = urlparse.urlparse(self.url).path
+        path = "%s/%s" % (uri_path.rstrip("/"), pth)
+        if query:
+            path = "%s?%s" % (path, query)
+        headers = {"User-Agent": self.user_agent,
+                "X-Auth-Token": self.token}
+        if chunks is None:
+            headers["Content-Length"] = str(len(data))
+        else:
+            headers["Transfer-Encoding"] = "chunked"
+        if isinstance(hdrs, dict):
+            headers.update(hdrs)
+
+        attempt = 0
+        response = None
+        error = None
+        while attempt < CONNECTION_RETRIES:
+            if not self.http_conn:
+                self.http_conn = self.http_connection()
+            parsed, conn = self.http_conn
+            try:
+                if chunks is None:
+                    conn.request(method, path, data, headers)
+                else:
+                    self._send_chunked(conn, method, path, headers, chunks())
+                response = conn.getresponse()
+            except (socket.error, IOError, httplib.HTTPException) as e:
+                # Re-create the connection for the next try.
+                self.http_conn = None
+                response = None
+                error = e
+            except Exception:
+                # The request may have been abandoned part way through, so
+                # the connection can't be used again.
+                self.http_conn = None
+                raise
+            if response is not None:
+                if response.status == 401:
+                    response.read()
+                    self.url, self.token = self.get_auth()
+                    headers["X-Auth-Token"] = self.token
                 else:
                     break
             attempt += 1
         if self.http_log_debug:
             self._http_log((path, method), {"headers": headers, "data": data},
                     response, "")
+        if response is None:
+            # Every attempt failed; report why, rather than leaving the caller
+            # with no response.
+            raise error
         return response
 
 
+    def _send_chunked(self, conn, method, path, headers, chunks):
+        """Sends a request whose body is made up of the supplied chunks."""
+        conn.putrequest(method, path)
+        for key, val in headers.items():
+            conn.putheader(key, val)
+        conn.endheaders()
+        for chunk in chunks:
+            if chunk:
+                conn.send("%x\r\n%s\r\n" % (len(chunk), chunk))
+        conn.send("0\r\n\r\n")
+
+
     @property
     def uri(self):
         return self.url
 
 
 
+class CDNPurgeQueue(object):
+    """
+    Collects objects to be purged from the CDN, and purges them all at once
+    when flush() is called. Objects added more than once are only purged once.
+
+    The purge requests are sent by a pool of 'workers' threads (default =
+    DEFAULT_CONCURRENCY), no faster than 'rate' requests per second (default
+    = the client's 'cdn_purge_rate'), to stay within the CDN's limits. Each
+    container's CDN status is checked once per flush, rather than for each
+    object. If 'email_addresses' are given, they are only sent with the last
+    purge request of each flush, so that a single notice is sent for the
+    whole batch instead of one for every object.
+    """
+    def __init__(self, client, email_addresses=None, workers=None,
+            rate=None):
+        self.client = client
+        self.email_addresses = email_addresses
+        self.workers = workers or DEFAULT_CONCURRENCY
+        self.rate = rate or client.cdn_purge_rate
+        self._pending = []
+        self._seen = set()
+        self._lock = threading.Lock()
+
+
+    def add(self, container, obj):
+        """
+        Queues the object to be purged. Returns False if it was already in
+        the queue.
+        """
+        key = (self.client._resolve_name(container),
+                self.client._resolve_name(obj))
+        with self._lock:
+            if key in self._seen:
+                return False
+            self._seen.add(key)
+            self._pending.append(key)
+        return True
+
+
+    def __len__(self):
+        return len(self._pending)
+
+
+    def flush(self):
+        """
+        Purges all the queued objects, and empties the queue. Failures don't
+        stop the run. A dict is returned with the number of objects 'purged'
+        and a list of 'errors', each of which is a ("container/object",
+        reason) 2-tuple.
+        """
+        with self._lock:
+            pending, self._pending, self._seen = self._pending, [], set()
+        result = {"purged": 0, "errors": []}
+        enabled = {}
+        items = []
+        for cname, oname in pending:
+            if cname not in enabled:
+                try:
+                    enabled[cname] = self.client.get_container(
+                            cname).cdn_enabled
+                except Exception as e:
+                    enabled[cname] = e
+            status = enabled[cname]
+            if status is True:
+                items.append((cname, oname))
+                continue
+            reason = status if status else ("The object '%s' is not in a "
+                    "CDN-enabled container." % oname)
+            result["errors"].append(("%s/%s" % (cname, oname), "%s" % reason))
+        if not items:
+            return result
+        limiter = utils.RateLimiter(self.rate)
+
+        def purge(item, email_addresses=None):
+            limiter.wait()
+            response = self.client._purge_cdn_path(item[0], item[1],
+                    email_addresses)
+            if not 200 <= response.status < 300:
+                raise exc.CDNFailed("Bad response: (%s) %s" % (response.status,
+                        response.reason))
+
+        outcomes = []
+        if len(items) > 1:
+            pool = utils.WorkerPool(purge, workers=min(self.workers,
+                    len(items) - 1))
+            outcomes = pool.map(items[:-1])
+        # The email addresses are only sent with the final request.
+        last = items[-1]
+        try:
+            purge(last, self.email_addresses)
+            outcomes.append((last, None, None))
+        except Exception as e:
+            outcomes.append((last, None, e))
+        for item, ret, err in outcomes:
+            if err:
+                result["errors"].append(("%s/%s" % item, "%s" % err))
+            else:
+                result["purged"] += 1
+        return result
+
+
+
+class ObjectStream(object):
+    """
+    A read-only file-like object for streaming the contents of a stored object.
+    The MD5 checksum of the contents is computed as they are read, and is
+    compared with the object's etag once the end of the stream is reached.
+
+    Iterating over the stream returns its contents in chunks of 'chunk_size'
+    bytes. If 'release' is given, it is called when the stream is closed,
+    with True if the response was read completely.
+
+    If the response has no Content-Length, as with chunked responses,
+    'total_bytes' is None and the length is not checked.
+    """
+    def __init__(self, name, response, chunk_size=65536, release=None):
+        self.name = name
+        self.chunk_size = chunk_size
+        self._response = response
+        self._release = release
+        self.headers = dict((key.lower(), val)
+                for key, val in response.getheaders())
+        length = self.headers.get("content-length")
+        self.total_bytes = int(length) if length is not None else None
+        # Large object manifests don't return the MD5 of their contents.
+        if "x-object-manifest" in self.headers:
+            self.etag = None
+        else:
+            self.etag = self.headers.get("etag", "").strip('"') or None
+        self.bytes_read = 0
+        self.closed = False
+        self._md5 = hashlib.md5()
+        self._verified = False
+
+
+    def read(self, size=-1):
+        """
+        Reads up to 'size' bytes from the stream. If 'size' is negative or
+        omitted, the remainder of the stream is read.
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed stream")
+        if size is None or size < 0:
+            data = self._response.read()
+        else:
+            data = self._response.read(size)
+        self._md5.update(data)
+        self.bytes_read += len(data)
+        if not data or (self.total_bytes is not None
+                and self.bytes_read >= self.total_bytes):
+            self._verify()
+        return data
+
+
+    def _verify(self):
+        if self._verified:
+            return
+        self._verified = True
+        if (self.total_bytes is not None
+                and self.bytes_read != self.total_bytes):
+            raise exc.DownloadFailed("Received %s of %s bytes for object "
+                    "'%s'." % (self.bytes_read, self.total_bytes, self.name))
+        if self.etag and (self._md5.hexdigest() != self.etag):
+            raise exc.DownloadFailed("The contents of object '%s' do not "
+                    "match its etag." % self.name)
+
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+    def save(self, path):
+        """
+        Writes the remaining contents of the stream to the file at the
+        specified path. If the contents fail verification, the file is deleted.
+        """
+        try:
+            with open(path, "wb") as ff:
+                for chunk in self:
+                    ff.write(chunk)
+        except exc.DownloadFailed:
+            os.remove(path)
+            raise
+        finally:
+            self.close()
+
+
+    def close(self):
+        """
+        Closes the stream, and releases its connection. If the stream has
+        not been read completely, the connection is closed too, since it
+        cannot be re-used.
+        """
+        if not self.closed:
+            self.closed = True
+            self._response.close()
+            if self._release:
+                self._release(self._verified)
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+
 class FolderUploader(threading.Thread):
-    """Threading class to allow for uploading multiple files in the background."""
-    def __init__(self, root_folder, container, ignore, upload_key, client):
+    """
+    Threading class to allow for uploading multiple files in the background.
+    The folder is walked in this thread, and the files are uploaded by a pool
+    of worker threads.
+    """
+    def __init__(self, root_folder, container, ignore, upload_key, client,
+            workers=None, files=None, archive_format=None):
         self.root_folder = root_folder.rstrip("/")
         if container:
             self.container = client.create_container(container)
@@ -995,32 +3106,406 @@ class FolderUploader(threading.Thread):
         self.ignore = utils.coerce_string_to_list(ignore)
         self.upload_key = upload_key
         self.client = client
+        self.workers = workers or DEFAULT_CONCURRENCY
+        # The (relpath, size, mtime) tuples from walking the folder; if not
+        # supplied, the folder is walked when the upload runs.
+        self.files = files
+        # If set, small files are uploaded in archives of this format.
+        self.archive_format = archive_format
         threading.Thread.__init__(self)
 
     def folder_name_from_path(self, pth):
         """Convenience method that first strips trailing path separators."""
         return os.path.basename(pth.rstrip(os.sep))
 
-    def upload_files_in_folder(self, arg, dirname, fnames):
-        """Handles the iteration across files within a folder."""
-        if utils.match_pattern(dirname, self.ignore):
-            return False
-        for fname in (nm for nm in fnames
-                if not utils.match_pattern(nm, self.ignore)):
+    def get_items(self):
+        """
+        Generates a (full_path, obj_name, obj_size, etag) item for each of the
+        files to be uploaded. The etag is always None.
+        """
+        files = self.files
+        if files is None:
+            files = utils.walk_files(self.root_folder, self.ignore)
+        for relpath, size, mtime in files:
+            yield (os.path.join(self.root_folder, relpath), relpath, size,
+                    None)
+
+    def upload_file(self, item):
+        """Uploads a single file; called by the worker threads."""
+        full_path, obj_name, obj_size, etag = item
+        if self.client._should_abort_folder_upload(self.upload_key):
+            return
+        try:
+            self.client.upload_file(self.container, full_path,
+                    obj_name=obj_name, etag=etag, return_none=True)
+        except Exception as e:
+            self.client._record_upload_error(self.upload_key, obj_name, e)
+            return
+        self.client._update_progress(self.upload_key, obj_size)
+
+    def upload_archive(self, items):
+        """
+        Uploads a list of small files as a single archive; called by the
+        worker threads. If archives can't be used, the files are uploaded
+        individually instead.
+        """
+        if self.client._should_abort_folder_upload(self.upload_key):
+            return
+        result = None
+        if self.client._extract_archive_supported is not False:
+            try:
+                result = self.client._extract_archive(self.container,
+                        [item[:3] for item in items], self.archive_format)
+            except exc.UploadFailed:
+                # A file could not be read; fall back to individual uploads
+                # so that the error is reported for just that file.
+                result = None
+        if result is None:
+            for item in items:
+                self.upload_file(item)
+            return
+        created, errors = result
+        failed = set()
+        for obj_name, reason in errors:
+            failed.add(obj_name)
+            self.client._record_upload_error(self.upload_key, obj_name,
+                    exc.UploadFailed(reason))
+        for full_path, obj_name, obj_size, etag in items:
+            key = obj_name.replace(os.sep, "/")
+            if isinstance(key, str):
+                key = key.decode(pyrax.encoding)
+            if key not in failed:
+                self.client._update_progress(self.upload_key, obj_size)
+
+    def upload(self, item):
+        """
+        Called by the worker threads with either a single file, or a list of
+        files to be uploaded as an archive.
+        """
+        if isinstance(item, list):
+            self.upload_archive(item)
+        else:
+            self.upload_file(item)
+
+    def batch_small_files(self, items):
+        """
+        Passes through the items for large files, and groups the items for
+        small files into lists to be uploaded as archives.
+        """
+        client = self.client
+        batch = []
+        batch_bytes = 0
+        for item in items:
+            size = item[2]
+            if size >= client.archive_max_file_size:
+                yield item
+                continue
+            batch.append(item)
+            batch_bytes += size
+            if (len(batch) >= client.archive_batch_files or
+                    batch_bytes >= client.archive_batch_bytes):
+                yield batch
+                batch = []
+                batch_bytes = 0
+        if batch:
+            yield batch
+
+    def run(self):
+        """Starts the uploading thread."""
+        if self.client.checksum_cache and not self.archive_format:
+            # The etags are needed, so compute any checksums that are not
+            # already cached in a pool of threads, and upload each file as
+            # soon as its checksum is known. The walk is consumed as the
+            # checksums are used, so only the files in progress are held.
+            pending = {}
+
+            def paths():
+                for item in self.get_items():
+                    pending[item[0]] = item
+                    yield item[0]
+
+            checksums = self.client._checksum_files(paths())
+            items = (pending.pop(full_path)[:3] + (etag, )
+                    for full_path, etag in checksums)
+        else:
+            items = self.get_items()
+        if self.archive_format:
+            items = self.batch_small_files(items)
+        # Keep the queue bounded so that the walk doesn't get too far ahead
+        # of the uploads.
+        pool = utils.WorkerPool(self.upload, workers=self.workers,
+                queue_size=self.workers * 4)
+        for item in items:
             if self.client._should_abort_folder_upload(self.upload_key):
+                break
+            pool.put(item)
+        pool.join()
+
+
+
+class FolderSyncer(threading.Thread):
+    """
+    Threading class that keeps a container in sync with a local folder until
+    it is stopped. The folder is first reconciled with a single listing of
+    the container; after that, only the files reported as changed by a
+    folder watcher are examined. Inotify is used where it is available;
+    otherwise the folder is walked every 'poll_interval' seconds, which only
+    has to stat the files.
+
+    Changes are not acted on until the file has been left alone for
+    'debounce' seconds, so a file that is being written is uploaded once,
+    after the writing stops. The files are uploaded, and the objects for
+    removed files deleted when 'delete' is True, by a pool of 'workers'
+    threads. The local files always win: an object is replaced whenever its
+    etag differs from the checksum of its file.
+    """
+    # The number of errors kept for get_status().
+    max_errors = 100
+    # The number of seconds to wait before trying again after an error.
+    retry_interval = 10
+
+    def __init__(self, root_folder, container, client, delete=False,
+            include_hidden=False, ignore=None, debounce=None, workers=None,
+            hash_workers=None, poll_interval=None):
+        self.root_folder = root_folder
+        self.container = client.get_container(container)
+        self.client = client
+        self.delete = delete
+        self.ignore = utils.coerce_string_to_list(ignore)
+        if not include_hidden:
+            self.ignore.append(".*")
+        self.debounce = (client.folder_sync_debounce if debounce is None
+                else debounce)
+        self.workers = workers or DEFAULT_CONCURRENCY
+        self.hash_workers = hash_workers
+        self.poll_interval = poll_interval or client.folder_sync_poll_interval
+        # Maps the name of each object in the container to its etag.
+        self._index = {}
+        self._index_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._status = {"uploaded": 0, "deleted": 0, "errors": [],
+                "pending": 0, "watcher": None}
+        self._status_lock = threading.Lock()
+        self._watcher = None
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def _object_name(self, relpath):
+        name = relpath.replace(os.sep, "/")
+        if isinstance(name, str):
+            name = name.decode(pyrax.encoding)
+        return name
+
+    def _record(self, key, name=None, error=None):
+        with self._status_lock:
+            if error is None:
+                self._status[key] += 1
                 return
-            full_path = os.path.join(dirname, fname)
-            if os.path.isdir(full_path):
-                # Skip folders; os.walk will include them in the next pass.
-                continue
-            obj_name = os.path.relpath(full_path, self.base_path)
-            obj_size = os.stat(full_path).st_size
-            self.client.upload_file(self.container, full_path, obj_name=obj_name,
+            errors = self._status["errors"]
+            errors.append((name, "%s" % error))
+            del errors[:-self.max_errors]
+
+    def get_status(self):
+        """
+        Returns a dict with the number of files 'uploaded' and objects
+        'deleted' so far, the number of changes 'pending', the kind of
+        'watcher' in use, whether the syncer is still 'running', and a list
+        of the most recent 'errors', each of which is an (object_name,
+        reason) 2-tuple. Errors that don't concern a single object, such as
+        a failed listing of the container, have None for the object name;
+        after one of those, the whole folder is compared with the container
+        again once 'retry_interval' seconds have passed.
+        """
+        with self._status_lock:
+            status = dict(self._status)
+            status["errors"] = list(status["errors"])
+        status["running"] = self.is_alive()
+        return status
+
+    def stop(self, wait=True):
+        """
+        Stops syncing. Changes that are still waiting to be acted on are
+        dropped. Unless 'wait' is False, this waits for the uploads in
+        progress to finish.
+        """
+        self._stop_event.set()
+        if wait and self.is_alive():
+            self.join()
+
+    def upload(self, item):
+        """Uploads a single file if its object differs; called by workers."""
+        pth, name, etag = item
+        if etag is None:
+            try:
+                etag = self.client._get_local_checksum(pth)
+            except (IOError, OSError):
+                # It is gone already; its removal will be reported.
+                return
+        with self._index_lock:
+            if self._index.get(name) == etag:
+                return
+        try:
+            self.container.upload_file(pth, obj_name=name, etag=etag,
                     return_none=True)
-            self.client._update_progress(self.upload_key, obj_size)
+        except Exception as e:
+            self._record("uploaded", name, e)
+            return
+        with self._index_lock:
+            self._index[name] = etag
+        self._record("uploaded")
+
+    def delete_object(self, name):
+        """Deletes a single object; called by the worker threads."""
+        try:
+            self.client.delete_object(self.container, name)
+        except exc.NoSuchObject:
+            pass
+        except Exception as e:
+            self._record("deleted", name, e)
+            return
+        with self._index_lock:
+            self._index.pop(name, None)
+        self._record("deleted")
+
+    def work(self, item):
+        if isinstance(item, tuple):
+            self.upload(item)
+        else:
+            self.delete_object(item)
+
+    def reconcile(self):
+        """
+        Compares every file in the folder with the index of the container,
+        uploading the ones that differ, and deleting the objects that have
+        no file if 'delete' is True.
+        """
+        local_files = {}
+        for relpath, size, mtime in utils.walk_files(self.root_folder,
+                self.ignore):
+            local_files[os.path.join(self.root_folder, relpath)] = (
+                    self._object_name(relpath))
+        checksums = self.client._checksum_files(local_files.keys(),
+                hash_workers=self.hash_workers)
+        pool = utils.WorkerPool(self.work, workers=self.workers)
+        for pth, etag in checksums:
+            pool.put((pth, local_files[pth], etag))
+        if self.delete:
+            names = set(local_files.values())
+            with self._index_lock:
+                extra = [name for name in self._index if name not in names]
+            for name in extra:
+                pool.put(name)
+        pool.join()
+
+    def sync_changes(self, relpaths):
+        """
+        Uploads or deletes the objects for the files and folders that have
+        changed. A folder that has been removed takes all the objects below
+        it with it.
+        """
+        pool = utils.WorkerPool(self.work, workers=self.workers)
+        # A removed file is often reported along with its removed folder, so
+        # collect the names first to delete each object just once.
+        gone = set()
+        for relpath in relpaths:
+            pth = os.path.join(self.root_folder, relpath)
+            name = self._object_name(relpath)
+            if os.path.isfile(pth):
+                pool.put((pth, name, None))
+                continue
+            if not self.delete or os.path.isdir(pth):
+                # The files in a new folder are reported individually.
+                continue
+            below = name + "/"
+            with self._index_lock:
+                gone.update(nm for nm in self._index
+                        if nm == name or nm.startswith(below))
+        for name in gone:
+            pool.put(name)
+        pool.join()
+        self.client._flush_checksum_cache()
 
     def run(self):
-        """Starts the uploading thread."""
-        root_path, folder_name = os.path.split(self.root_folder)
-        self.base_path = os.path.join(root_path, folder_name)
-        os.path.walk(self.root_folder, self.upload_files_in_folder, None)
+        """Starts the syncing thread."""
+        # Start watching before the initial reconciliation, so that nothing
+        # that changes during it is missed.
+        try:
+            self._watcher = folder_watcher.get_watcher(self.root_folder,
+                    self.ignore, self.poll_interval)
+        except Exception as e:
+            self._record(None, error=e)
+            return
+        try:
+            self._run()
+        finally:
+            self._watcher.close()
+
+    def _set_watcher(self, watcher):
+        self._watcher = watcher
+        with self._status_lock:
+            self._status["watcher"] = ("inotify"
+                    if isinstance(watcher, folder_watcher.InotifyWatcher)
+                    else "polling")
+
+    def _run(self):
+        self._set_watcher(self._watcher)
+        # Maps each changed path to the time of its latest change.
+        pending = {}
+        # The index is listed again and the whole folder compared at the
+        # start, and after any error, since changes may have been missed.
+        refresh = True
+        while not self._stop_event.is_set():
+            try:
+                if refresh:
+                    pending.clear()
+                    with self.client.checkout_connection():
+                        index = self.client._get_remote_index(self.container)
+                        with self._index_lock:
+                            self._index = dict((name, info[0])
+                                    for name, info in index.items())
+                        self.reconcile()
+                    refresh = False
+                self._sync_pass(pending)
+            except Exception as e:
+                self._record(None, error=e)
+                refresh = True
+                self._stop_event.wait(self.retry_interval)
+
+    def _sync_pass(self, pending):
+        """
+        Waits for changes from the watcher, and acts on the ones that have
+        been left alone for 'debounce' seconds.
+        """
+        now = time.time()
+        timeout = self.debounce
+        if pending:
+            timeout = max(0, min(pending.values()) + self.debounce - now)
+        # Wake up at least once a second to check for stop().
+        try:
+            changed = self._watcher.read(min(timeout, 1))
+        except OSError:
+            # Inotify ran out of watches for new folders; walk the folder
+            # from now on.
+            watcher = folder_watcher.PollingWatcher(self.root_folder,
+                    self.ignore, self.poll_interval)
+            self._watcher.close()
+            self._set_watcher(watcher)
+            changed = None
+        now = time.time()
+        if changed is None:
+            # Changes were lost, so compare everything again.
+            pending.clear()
+            with self.client.checkout_connection():
+                self.reconcile()
+            return
+        for relpath in changed:
+            pending[relpath] = now
+        ready = [relpath for relpath, changed_at in pending.items()
+                if now - changed_at >= self.debounce]
+        for relpath in ready:
+            del pending[relpath]
+        with self._status_lock:
+            self._status["pending"] = len(pending)
+        if ready and not self._stop_event.is_set():
+            with self.client.checkout_connection():
+                self.sync_changes(ready)
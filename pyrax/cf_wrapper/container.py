@@ -17,31 +17,101 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+import email.utils
+import time
 
+from swiftclient import client as _swift_client
 import pyrax
+from pyrax.cf_wrapper.storage_object import StorageObject
 from pyrax import exceptions as exc
+import pyrax.utils as utils
 
 # Used to indicate values that are lazy-loaded
 class Fault(object):
     def __nonzero__(self):
         return False
 
+    def __reduce__(self):
+        # Unpickles as the module's FAULT, so that 'is FAULT' still works.
+        return "FAULT"
+
 FAULT = Fault()
 
+# Stored in the object cache for names that are known not to exist.
+_MISSING = object()
+
+
+def _cache_key(name):
+    """Object names are cached as unicode whenever they can be decoded."""
+    if isinstance(name, str):
+        try:
+            return name.decode(pyrax.encoding)
+        except UnicodeDecodeError:
+            pass
+    return name
+
+
+def _iso_time(http_date):
+    """
+    Converts the HTTP date format used in the Last-Modified header to the
+    format used for 'last_modified' in container listings.
+    """
+    if not http_date:
+        return None
+    parsed = email.utils.parsedate_tz(http_date)
+    if not parsed:
+        return http_date
+    stamp = email.utils.mktime_tz(parsed)
+    return datetime.datetime.utcfromtimestamp(stamp).strftime(
+            "%Y-%m-%dT%H:%M:%S.%f")
+
 
 class Container(object):
     """Represents a CloudFiles container."""
+    # The maximum number of StorageObjects to cache for each container, and
+    # the number of seconds that they remain valid.
+    object_cache_size = 1000
+    object_cache_ttl = 300
+    # Names that were not found are remembered for a shorter time.
+    missing_object_ttl = 10
+    __slots__ = ("client", "name", "_object_count", "_total_bytes",
+            "_cdn_uri", "_cdn_ttl", "_cdn_ssl_uri", "_cdn_streaming_uri",
+            "_cdn_log_retention", "_cdn_expires", "_objects")
+
     def __init__(self, client, name, object_count=None, total_bytes=None):
         self.client = client
         self.name = name
-        self.object_count = int(object_count)
-        self.total_bytes = int(total_bytes)
+        # The counts are fetched lazily if they are not supplied.
+        self._object_count = FAULT
+        self._total_bytes = FAULT
+        if object_count is not None:
+            self._object_count = int(object_count)
+        if total_bytes is not None:
+            self._total_bytes = int(total_bytes)
         self._cdn_uri = FAULT
         self._cdn_ttl = FAULT
         self._cdn_ssl_uri = FAULT
         self._cdn_streaming_uri = FAULT
         self._cdn_log_retention = FAULT
-        self._object_cache = {}
+        # The time after which the CDN attributes must be fetched again.
+        self._cdn_expires = None
+        # The object cache isn't created until an object is looked up.
+        self._objects = None
+
+
+    def __getstate__(self):
+        # Instances have no __dict__, so protocols 0 and 1 need the state
+        # spelled out. The object cache holds a lock and is not pickled.
+        state = dict((att, getattr(self, att)) for att in self.__slots__
+                if hasattr(self, att))
+        state["_objects"] = None
+        return state
+
+
+    def __setstate__(self, state):
+        for att, val in state.items():
+            setattr(self, att, val)
 
 
     def _set_cdn_defaults(self):
@@ -53,9 +123,58 @@ class Container(object):
         self._cdn_log_retention = False
 
 
+    def _fetch_counts(self):
+        """Fetches the object count and total bytes from the server."""
+        hdrs = self.client.connection.head_container(self.name)
+        self._object_count = int(hdrs.get("x-container-object-count", 0))
+        self._total_bytes = int(hdrs.get("x-container-bytes-used", 0))
+
+
+    def _invalidate_counts(self):
+        """
+        Called when objects in the container have been changed, so that the
+        object count and total bytes are fetched again the next time they are
+        needed.
+        """
+        self._object_count = FAULT
+        self._total_bytes = FAULT
+
+
+    def _cdn_data_stale(self):
+        """
+        Returns True if the CDN attributes were loaded more than the client's
+        'cdn_cache_ttl' seconds ago.
+        """
+        return self._cdn_expires is not None and time.time() > self._cdn_expires
+
+
+    def _set_cdn_expiry(self):
+        ttl = self.client.cdn_cache_ttl
+        self._cdn_expires = time.time() + ttl if ttl is not None else None
+
+
+    def _load_cdn_info(self, info):
+        """
+        Sets the CDN attributes from the container's entry in the CDN
+        listing, or to the defaults if 'info' is None because the container
+        isn't in the listing.
+        """
+        self._set_cdn_defaults()
+        if info:
+            if info.get("cdn_enabled"):
+                self._cdn_uri = info.get("cdn_uri")
+                self._cdn_ssl_uri = info.get("cdn_ssl_uri")
+                self._cdn_streaming_uri = info.get("cdn_streaming_uri")
+            if info.get("ttl") is not None:
+                self._cdn_ttl = int(info["ttl"])
+            self._cdn_log_retention = bool(info.get("log_retention"))
+        self._set_cdn_expiry()
+
+
     def _fetch_cdn_data(self):
         """Fetches the object's CDN data from the CDN service"""
         response = self.client.connection.cdn_request("HEAD", [self.name])
+        self._set_cdn_expiry()
         if 200 <= response.status < 300:
             # Set defaults in case not all headers are present.
             self._set_cdn_defaults()
@@ -94,21 +213,55 @@ class Container(object):
         return objs
 
 
+    def iter_objects(self, prefix=None, delimiter=None, marker=None,
+            page_size=None):
+        """
+        Generates the StorageObjects in this container one page at a time,
+        so that even a huge container can be processed in constant memory.
+        See CFClient.iter_container_objects() for details.
+        """
+        return self.client.iter_container_objects(self, prefix=prefix,
+                delimiter=delimiter, marker=marker, page_size=page_size)
+
+
+    def iter_objects_parallel(self, prefixes=None, partitions=None,
+            prefix=None, ordered=True, workers=None, page_size=None):
+        """
+        Generates the StorageObjects in this container, listing several
+        ranges of names concurrently. See
+        CFClient.iter_container_objects_parallel() for details.
+        """
+        return self.client.iter_container_objects_parallel(self,
+                prefixes=prefixes, partitions=partitions, prefix=prefix,
+                ordered=ordered, workers=workers, page_size=page_size)
+
+
     def get_object(self, name):
         """
         Return the StorageObject in this container with the
         specified name.
         """
-        if isinstance(name, str):
-            name = name.decode(pyrax.encoding)
+        name = _cache_key(name)
         ret = self._object_cache.get(name)
+        if ret is _MISSING:
+            raise exc.NoSuchObject("No object with the name '%s' exists" % name)
         if not ret:
-            objs = [obj for obj in self.client.get_container_objects(self.name)
-                    if obj.name == name]
+            # A HEAD of the object is a single small request, no matter how
+            # many objects the container holds.
             try:
-                ret = objs[0]
-            except IndexError:
-                raise exc.NoSuchObject("No object with the name '%s' exists" % name)
+                hdrs = self.client.connection.head_object(self.name, name)
+            except _swift_client.ClientException as e:
+                if e.http_status != 404:
+                    raise
+                self._object_cache.set(name, _MISSING,
+                        ttl=self.missing_object_ttl)
+                raise exc.NoSuchObject("No object with the name '%s' exists"
+                        % name)
+            ret = StorageObject(self.client, container=self, name=name,
+                    total_bytes=int(hdrs.get("content-length", 0)),
+                    content_type=hdrs.get("content-type"),
+                    last_modified=_iso_time(hdrs.get("last-modified")),
+                    etag=hdrs.get("etag", "").strip('"') or None)
             self._object_cache[name] = ret
         return ret
 
@@ -151,16 +304,19 @@ class Container(object):
         return self.client.delete_object(self, obj)
 
 
-    def delete_all_objects(self):
-        """Deletes all objects from this container."""
-        for obj_name in self.client.get_container_object_names(self):
-            self.client.delete_object(self, obj_name)
+    def delete_all_objects(self, prefix=None, workers=None):
+        """
+        Deletes all objects from this container, or just those whose names
+        begin with 'prefix'. See CFClient.bulk_delete() for details.
+        """
+        return self.client.bulk_delete(self, prefix=prefix, workers=workers)
 
 
     def remove_from_cache(self, obj):
         """Removes the object from the cache."""
-        nm = self.client._resolve_name(obj)
-        self._object_cache.pop(nm, None)
+        if self._objects is not None:
+            nm = _cache_key(self.client._resolve_name(obj))
+            self._objects.pop(nm, None)
 
 
     def delete(self, del_objects=False):
@@ -190,6 +346,32 @@ class Container(object):
                 chunk_size=chunk_size)
 
 
+    def open_object(self, obj_name, block_size=1048576, cache_blocks=32):
+        """
+        Returns a read-only, seekable file-like object for the object. See
+        CFClient.open_object() for details.
+        """
+        return self.client.open_object(self, obj_name, block_size=block_size,
+                cache_blocks=cache_blocks)
+
+
+    def stream_object(self, obj_name, chunk_size=65536):
+        """
+        Returns a file-like object that streams the contents of the object.
+        See CFClient.stream_object() for details.
+        """
+        return self.client.stream_object(self, obj_name, chunk_size=chunk_size)
+
+
+    def download_object(self, obj_name, path, workers=None, part_size=None):
+        """
+        Downloads the object to the file at the specified path, using
+        concurrent ranged requests. See CFClient.download_object() for details.
+        """
+        return self.client.download_object(self, obj_name, path,
+                workers=workers, part_size=part_size)
+
+
     def get_metadata(self):
         return self.client.get_container_metadata(self)
 
@@ -245,13 +427,43 @@ class Container(object):
         return "<Container '%s'>" % self.name
 
 
+    def _get_object_count(self):
+        if self._object_count is FAULT:
+            self._fetch_counts()
+        return self._object_count
+
+    def _set_object_count(self, val):
+        self._object_count = val
+
+
+    def _get_total_bytes(self):
+        if self._total_bytes is FAULT:
+            self._fetch_counts()
+        return self._total_bytes
+
+    def _set_total_bytes(self, val):
+        self._total_bytes = val
+
+
+    @property
+    def _object_cache(self):
+        if self._objects is None:
+            self._objects = utils.LRUCache(max_size=self.object_cache_size,
+                    ttl=self.object_cache_ttl)
+        return self._objects
+
+
+    object_count = property(_get_object_count, _set_object_count)
+    total_bytes = property(_get_total_bytes, _set_total_bytes)
+
+
     ## BEGIN - CDN property definitions ##
     @property
     def cdn_enabled(self):
         return bool(self.cdn_uri)
 
     def _get_cdn_log_retention(self):
-        if self._cdn_log_retention is FAULT:
+        if self._cdn_log_retention is FAULT or self._cdn_data_stale():
             self._fetch_cdn_data()
         return self._cdn_log_retention
 
@@ -261,7 +473,7 @@ class Container(object):
 
 
     def _get_cdn_uri(self):
-        if self._cdn_uri is FAULT:
+        if self._cdn_uri is FAULT or self._cdn_data_stale():
             self._fetch_cdn_data()
         return self._cdn_uri
 
@@ -270,7 +482,7 @@ class Container(object):
 
 
     def _get_cdn_ttl(self):
-        if self._cdn_ttl is FAULT:
+        if self._cdn_ttl is FAULT or self._cdn_data_stale():
             self._fetch_cdn_data()
         return self._cdn_ttl
 
@@ -279,7 +491,7 @@ class Container(object):
 
 
     def _get_cdn_ssl_uri(self):
-        if self._cdn_ssl_uri is FAULT:
+        if self._cdn_ssl_uri is FAULT or self._cdn_data_stale():
             self._fetch_cdn_data()
         return self._cdn_ssl_uri
 
@@ -288,7 +500,7 @@ class Container(object):
 
 
     def _get_cdn_streaming_uri(self):
-        if self._cdn_streaming_uri is FAULT:
+        if self._cdn_streaming_uri is FAULT or self._cdn_data_stale():
             self._fetch_cdn_data()
         return self._cdn_streaming_uri
 
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2012 Rackspace
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.pyrax/content_cache")
+# 100MB
+DEFAULT_MAX_SIZE = 104857600
+
+
+class ContentCache(object):
+    """
+    A persistent cache of the contents of stored objects, kept in files in a
+    local directory. An index of the cached objects, with the etag and headers
+    of each, is kept in a SQLite database in the same directory.
+
+    The total size of the cached contents is kept below 'max_size' bytes by
+    discarding the least recently used objects; objects larger than that are
+    not cached at all. The cache doesn't decide whether an entry is still
+    current: the etag is used to ask the server whether the object has
+    changed since it was cached.
+    """
+    def __init__(self, path=None, max_size=None):
+        self.path = path or DEFAULT_CACHE_DIR
+        self.max_size = max_size or DEFAULT_MAX_SIZE
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(self.path, "index.db"),
+                check_same_thread=False)
+        with self._lock:
+            self._db.execute("CREATE TABLE IF NOT EXISTS objects "
+                    "(key BLOB PRIMARY KEY, etag TEXT, size INTEGER, "
+                    "headers TEXT, used REAL)")
+            self._db.commit()
+
+
+    def _key(self, cname, oname):
+        # Names may be unicode or byte strings, which may not be ASCII, so the
+        # key is built from bytes; a unicode name and its UTF-8 encoding give
+        # the same key.
+        parts = [nm.encode("utf-8") if isinstance(nm, unicode) else str(nm)
+                for nm in (cname, oname)]
+        return sqlite3.Binary("/".join(parts))
+
+
+    def _file_path(self, key):
+        return os.path.join(self.path, hashlib.sha1(key).hexdigest())
+
+
+    def lookup(self, cname, oname):
+        """
+        Returns the etag of the cached copy of the object, or None if it is
+        not cached.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT etag FROM objects WHERE key = ?",
+                    (self._key(cname, oname), )).fetchone()
+        return row[0] if row else None
+
+
+    def get(self, cname, oname):
+        """
+        Returns a (headers, contents) 2-tuple for the cached copy of the
+        object, or None if it is not cached.
+        """
+        key = self._key(cname, oname)
+        # The file is read under the lock, so that the contents always match
+        # the headers, even if the object is being stored by another thread.
+        with self._lock:
+            row = self._db.execute("SELECT headers FROM objects WHERE key = ?",
+                    (key, )).fetchone()
+            if not row:
+                return None
+            try:
+                with open(self._file_path(key), "rb") as cached:
+                    contents = cached.read()
+            except IOError:
+                # The file was removed from outside; forget the entry.
+                self._db.execute("DELETE FROM objects WHERE key = ?", (key, ))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE objects SET used = ? WHERE key = ?",
+                    (time.time(), key))
+            self._db.commit()
+        return (json.loads(row[0]), contents)
+
+
+    def store(self, cname, oname, etag, headers, contents):
+        """
+        Caches the contents of the object, along with its etag and headers,
+        and then discards the least recently used objects if the cache is too
+        large.
+        """
+        size = len(contents)
+        if not etag or size > self.max_size:
+            return
+        key = self._key(cname, oname)
+        # Write to a temporary file first, so that a partly-written file is
+        # never mistaken for the contents.
+        fd, tmp = tempfile.mkstemp(dir=self.path)
+        try:
+            with os.fdopen(fd, "wb") as tmpfile:
+                tmpfile.write(contents)
+            # The file and its index entry are replaced together, so that
+            # concurrent stores of the same object can't leave the contents
+            # of one with the etag of the other.
+            with self._lock:
+                os.rename(tmp, self._file_path(key))
+                self._db.execute("INSERT OR REPLACE INTO objects "
+                        "(key, etag, size, headers, used) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, etag, size, json.dumps(headers), time.time()))
+                self._db.commit()
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._evict()
+
+
+    def _evict(self):
+        """Discards the least recently used objects until the cache fits."""
+        with self._lock:
+            total = self._db.execute("SELECT SUM(size) FROM objects"
+                    ).fetchone()[0] or 0
+            if total <= self.max_size:
+                return
+            discard = []
+            for key, size in self._db.execute("SELECT key, size FROM objects "
+                    "ORDER BY used"):
+                if total <= self.max_size:
+                    break
+                discard.append(key)
+                total -= size
+            for key in discard:
+                self._db.execute("DELETE FROM objects WHERE key = ?", (key, ))
+                self._remove_file(key)
+            self._db.commit()
+
+
+    def _remove_file(self, key):
+        try:
+            os.remove(self._file_path(key))
+        except OSError:
+            pass
+
+
+    def remove(self, cname, oname):
+        """Removes the object from the cache, if it is there."""
+        key = self._key(cname, oname)
+        with self._lock:
+            self._db.execute("DELETE FROM objects WHERE key = ?", (key, ))
+            self._db.commit()
+            self._remove_file(key)
+
+
+    def clear(self):
+        """Removes all the objects from the cache."""
+        with self._lock:
+            for (key, ) in self._db.execute("SELECT key FROM objects"
+                    ).fetchall():
+                self._remove_file(key)
+            self._db.execute("DELETE FROM objects")
+            self._db.commit()
+
+
+    def close(self):
+        with self._lock:
+            self._db.close()
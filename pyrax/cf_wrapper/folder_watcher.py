@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2012 Rackspace
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+import pyrax.utils as utils
+
+
+# Values from <sys/inotify.h>.
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0x00080000
+IN_NONBLOCK = 0x00000800
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+        IN_CREATE | IN_DELETE | IN_ONLYDIR)
+# Each event is a struct inotify_event: wd, mask, cookie and len, followed
+# by 'len' bytes of null-padded name.
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc():
+    """
+    Returns libc with the inotify functions set up, or raises OSError if
+    inotify is not available on this system.
+    """
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6",
+            use_errno=True)
+    try:
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except AttributeError:
+        raise OSError(errno.ENOSYS, "inotify is not available")
+    return libc
+
+
+class InotifyWatcher(object):
+    """
+    Watches a folder tree for changes with Linux's inotify, so that the
+    changed files are reported without the tree having to be walked again.
+    A watch is placed on every folder in the tree; folders that are created
+    or moved into the tree later are watched as soon as they appear.
+
+    Files and folders whose names match one of the 'ignore' patterns are
+    not reported, and ignored folders are not watched. Symlinked folders are
+    not watched either: inotify identifies a folder by its inode, so one
+    that can be reached by several paths would be reported under only one.
+    Raises OSError if inotify is not available, or if the tree has more
+    folders than the system's limit on watches allows.
+    """
+    def __init__(self, root, ignore=None):
+        self.root = root
+        self._regex = utils.compile_patterns(ignore)
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # Maps each watch descriptor to the path of its folder, relative to
+        # the root.
+        self._folders = {}
+        try:
+            self._add_tree("")
+        except OSError:
+            self.close()
+            raise
+
+
+    def _encode(self, pth):
+        if isinstance(pth, unicode):
+            return pth.encode(sys.getfilesystemencoding() or "utf-8")
+        return pth
+
+
+    def _decode(self, name):
+        if isinstance(self.root, unicode):
+            return name.decode(sys.getfilesystemencoding() or "utf-8")
+        return name
+
+
+    def _add_tree(self, relfolder):
+        """
+        Watches the folder and all the folders below it. Returns the paths
+        of the files found in them, relative to the root, since they may
+        have been created before the watches were in place.
+        """
+        found = []
+        top = os.path.join(self.root, relfolder) if relfolder else self.root
+        for dirpath, dirnames, filenames in os.walk(top):
+            rel = os.path.relpath(dirpath, self.root)
+            rel = "" if rel == os.curdir else rel
+            if not self._add_watch(rel):
+                dirnames[:] = []
+                continue
+            dirnames[:] = [nm for nm in dirnames
+                    if not (self._regex and self._regex.match(nm))]
+            found.extend(os.path.join(rel, nm) if rel else nm
+                    for nm in filenames
+                    if not (self._regex and self._regex.match(nm)))
+        return found
+
+
+    def _add_watch(self, relfolder):
+        """
+        Watches a single folder. Returns False if the folder has already
+        gone; any other failure, such as running out of watches, is raised.
+        """
+        pth = os.path.join(self.root, relfolder) if relfolder else self.root
+        wd = self._libc.inotify_add_watch(self._fd, self._encode(pth),
+                WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return False
+            raise OSError(err, "Could not watch '%s': %s" % (pth,
+                    os.strerror(err)))
+        self._folders[wd] = relfolder
+        return True
+
+
+    def _remove_tree(self, relfolder):
+        """Stops watching a folder that has been moved out of its place."""
+        below = relfolder + os.sep
+        for wd, folder in self._folders.items():
+            if folder == relfolder or folder.startswith(below):
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._folders[wd]
+
+
+    def read(self, timeout):
+        """
+        Waits up to 'timeout' seconds for changes, and returns the set of
+        paths, relative to the root, of the files and folders that were
+        created, modified, moved or deleted. None is returned if events were
+        lost because too many happened at once, in which case the whole tree
+        has to be examined.
+        """
+        readable = select.select([self._fd], [], [], timeout)[0]
+        if not readable:
+            return set()
+        data = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR):
+                    break
+                raise
+            if not chunk:
+                break
+            data.append(chunk)
+        return self._parse("".join(data))
+
+
+    def _parse(self, data):
+        changed = set()
+        overflow = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip("\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                # The folder was deleted, or its watch was removed.
+                self._folders.pop(wd, None)
+                continue
+            relfolder = self._folders.get(wd)
+            if relfolder is None or not name:
+                continue
+            name = self._decode(name)
+            if self._regex and self._regex.match(name):
+                continue
+            relpath = os.path.join(relfolder, name) if relfolder else name
+            changed.add(relpath)
+            if mask & IN_ISDIR:
+                if mask & IN_MOVED_FROM:
+                    self._remove_tree(relpath)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    changed.update(self._add_tree(relpath))
+        return None if overflow else changed
+
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+
+class PollingWatcher(object):
+    """
+    Finds the changes to a folder tree by walking it every 'interval'
+    seconds, and comparing the size and modification time of each file with
+    those found by the previous walk. Used where inotify is not available;
+    each walk only needs to stat the files, not read them.
+    """
+    def __init__(self, root, ignore=None, interval=10):
+        self.root = root
+        self.ignore = ignore
+        self.interval = interval
+        self._files = self._scan()
+        self._next_scan = time.time() + interval
+
+
+    def _scan(self):
+        return dict((relpath, (size, mtime)) for relpath, size, mtime
+                in utils.walk_files(self.root, self.ignore))
+
+
+    def read(self, timeout):
+        """
+        Waits up to 'timeout' seconds for the next walk, and returns the set
+        of paths, relative to the root, of the files that were created,
+        modified or deleted since the last one.
+        """
+        wait = self._next_scan - time.time()
+        if wait > timeout:
+            time.sleep(timeout)
+            return set()
+        if wait > 0:
+            time.sleep(wait)
+        self._next_scan = time.time() + self.interval
+        files = self._scan()
+        changed = set(relpath for relpath, sig in files.iteritems()
+                if self._files.get(relpath) != sig)
+        changed.update(relpath for relpath in self._files
+                if relpath not in files)
+        self._files = files
+        return changed
+
+
+    def close(self):
+        pass
+
+
+
+def get_watcher(root, ignore=None, poll_interval=10):
+    """
+    Returns an InotifyWatcher for the folder tree if inotify can be used, or
+    a PollingWatcher that walks the tree every 'poll_interval' seconds if not.
+    """
+    try:
+        return InotifyWatcher(root, ignore)
+    except OSError:
+        return PollingWatcher(root, ignore, poll_interval)
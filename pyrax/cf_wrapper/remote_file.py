@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2012 Rackspace
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+
+from pyrax import exceptions as exc
+import pyrax.utils as utils
+
+
+class RemoteFile(object):
+    """
+    A read-only, seekable file-like object for a stored object. Only the parts
+    of the object that are actually read are downloaded, using HTTP Range
+    requests, so modules such as tarfile and zipfile can work directly on
+    large objects while transferring a minimum of data.
+
+    The object is read in blocks of 'block_size' bytes, and the most recently
+    used 'cache_blocks' blocks are kept in memory. When the reads are
+    sequential, each request reads further ahead, up to 'max_readahead'
+    blocks at a time.
+    """
+    def __init__(self, client, container, name, block_size=1048576,
+            cache_blocks=32, max_readahead=8):
+        self.client = client
+        self.container = client._resolve_name(container)
+        self.name = client._resolve_name(name)
+        self.block_size = block_size
+        self.max_readahead = max_readahead
+        headers = client.connection.head_object(self.container, self.name)
+        self.size = int(headers.get("content-length", 0))
+        if "x-object-manifest" in headers:
+            # The etag of a manifest can't be used to detect changes.
+            self.etag = None
+        else:
+            self.etag = headers.get("etag")
+        self.closed = False
+        self._pos = 0
+        self._cache = utils.LRUCache(max(cache_blocks, max_readahead))
+        self._readahead = 1
+        self._next_block = None
+
+
+    def _fetch_blocks(self, first, count):
+        """Reads 'count' blocks starting with block number 'first'."""
+        start = first * self.block_size
+        end = min(start + (count * self.block_size), self.size) - 1
+        hdrs = {"Range": "bytes=%s-%s" % (start, end)}
+        if self.etag:
+            # Make sure the object hasn't changed since it was opened.
+            hdrs["If-Match"] = self.etag
+        response = self.client.connection.storage_request("GET",
+                [self.container, self.name], hdrs=hdrs)
+        data = response.read()
+        if not 200 <= response.status < 300:
+            raise exc.DownloadFailed("Bad response reading object '%s': "
+                    "(%s) %s" % (self.name, response.status, response.reason))
+        if len(data) != end - start + 1:
+            raise exc.DownloadFailed("Received %s bytes for the range %s-%s of "
+                    "object '%s'." % (len(data), start, end, self.name))
+        for num in xrange(count):
+            offset = num * self.block_size
+            self._cache[first + num] = data[offset:offset + self.block_size]
+        self._next_block = first + count
+
+
+    def _get_block(self, num):
+        block = self._cache.get(num)
+        if block is None:
+            if num == self._next_block:
+                # Sequential access; read further ahead each time.
+                self._readahead = min(self._readahead * 2, self.max_readahead)
+            else:
+                self._readahead = 1
+            last = (self.size - 1) // self.block_size
+            self._fetch_blocks(num, min(self._readahead, last - num + 1))
+            block = self._cache.get(num)
+        return block
+
+
+    def read(self, size=-1):
+        """
+        Reads up to 'size' bytes from the current position. If 'size' is
+        negative or omitted, everything up to the end of the object is read.
+        """
+        self._check_closed()
+        remaining = self.size - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        parts = []
+        while size > 0:
+            num, offset = divmod(self._pos, self.block_size)
+            data = self._get_block(num)[offset:offset + size]
+            parts.append(data)
+            self._pos += len(data)
+            size -= len(data)
+        return "".join(parts)
+
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        """Sets the current position, in the same manner as file.seek()."""
+        self._check_closed()
+        if whence == os.SEEK_CUR:
+            offset += self._pos
+        elif whence == os.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise IOError("Invalid offset: %s" % offset)
+        self._pos = offset
+
+
+    def tell(self):
+        """Returns the current position."""
+        self._check_closed()
+        return self._pos
+
+
+    def close(self):
+        """Closes the file and releases the cached blocks."""
+        self.closed = True
+        self._cache.clear()
+
+
+    def _check_closed(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+    def __repr__(self):
+        return "<RemoteFile '%s/%s'>" % (self.container, self.name)
@@ -20,17 +20,21 @@
 
 class StorageObject(object):
     """Represents a CloudFiles storage object."""
+    # Listings can create millions of these, so they don't carry a __dict__.
+    __slots__ = ("client", "_container", "_container_name", "name",
+            "total_bytes", "content_type", "last_modified", "etag")
+
     def __init__(self, client, container, name=None, total_bytes=None,
             content_type=None, last_modified=None, etag=None, attdict=None):
         """
         The object can either be initialized with individual params, or by
         passing the dict that is returned by swiftclient.
+
+        'container' may be either a Container or the name of one; if a name
+        is passed, the Container is not looked up until it is needed.
         """
         self.client = client
-        if isinstance(container, basestring):
-            self.container = self.client.get_container(container)
-        else:
-            self.container = container
+        self.container = container
         self.name = name
         self.total_bytes = total_bytes
         self.content_type = content_type
@@ -40,6 +44,18 @@ class StorageObject(object):
             self._read_attdict(attdict)
 
 
+    def __getstate__(self):
+        # Instances have no __dict__, so protocols 0 and 1 need the state
+        # spelled out.
+        return dict((att, getattr(self, att)) for att in self.__slots__
+                if hasattr(self, att))
+
+
+    def __setstate__(self, state):
+        for att, val in state.items():
+            setattr(self, att, val)
+
+
     def _read_attdict(self, dct):
         """
         Populates the object attributes using the dict returned by swiftclient.
@@ -71,14 +87,44 @@ class StorageObject(object):
             Element 0: a dictionary containing metadata about the file.
             Element 1: a stream of bytes representing the object's contents.
         """
-        return self.client.fetch_object(container=self.container.name,
+        return self.client.fetch_object(container=self.container_name,
                 obj_name=self.name, include_meta=include_meta,
                 chunk_size=chunk_size)
 
 
+    def open(self, block_size=1048576, cache_blocks=32):
+        """
+        Returns a read-only, seekable file-like object for this object, which
+        only downloads the parts that are read. See CFClient.open_object() for
+        details.
+        """
+        return self.client.open_object(container=self.container_name,
+                obj_name=self.name, block_size=block_size,
+                cache_blocks=cache_blocks)
+
+
+    def stream(self, chunk_size=65536):
+        """
+        Returns a file-like object that streams the contents of this object.
+        See CFClient.stream_object() for details.
+        """
+        return self.client.stream_object(container=self.container_name,
+                obj_name=self.name, chunk_size=chunk_size)
+
+
+    def download(self, path, workers=None, part_size=None):
+        """
+        Downloads the object to the file at the specified path, using
+        concurrent ranged requests. See CFClient.download_object() for details.
+        """
+        self.client.download_object(container=self.container_name,
+                obj_name=self.name, path=path, workers=workers,
+                part_size=part_size)
+
+
     def delete(self):
         """Deletes the object from storage."""
-        self.client.delete_object(container=self.container.name, name=self.name)
+        self.client.delete_object(container=self.container_name, name=self.name)
 
 
     def purge(self, email_addresses=[]):
@@ -86,7 +132,7 @@ class StorageObject(object):
         Purges the object from the CDN network, sending an optional
         email confirmation.
         """
-        self.client.purge_cdn_object(container=self.container.name,
+        self.client.purge_cdn_object(container=self.container_name,
                 name=self.name, email_addresses=email_addresses)
 
 
@@ -113,3 +159,26 @@ class StorageObject(object):
 
     def __repr__(self):
         return "<Object '%s' (%s)>" % (self.name, self.content_type)
+
+
+    @property
+    def container_name(self):
+        """The name of the container, without looking the container up."""
+        if self._container is None:
+            return self._container_name
+        return self._container.name
+
+
+    def _get_container(self):
+        if self._container is None:
+            self._container = self.client.get_container(self._container_name)
+        return self._container
+
+    def _set_container(self, val):
+        if isinstance(val, basestring):
+            self._container, self._container_name = None, val
+        else:
+            self._container, self._container_name = val, None
+
+
+    container = property(_get_container, _set_container)
@@ -59,6 +59,9 @@ class DomainRecordUpdateFailed(PyraxException):
 class DomainUpdateFailed(PyraxException):
     pass
 
+class DownloadFailed(PyraxException):
+    pass
+
 class EndpointNotFound(PyraxException):
     pass
 
@@ -77,12 +80,18 @@ class KeyringModuleNotInstalled(PyraxException):
 class KeyringUsernameMissing(PyraxException):
     pass
 
+class InvalidArchiveFormat(PyraxException):
+    pass
+
 class InvalidCDNMetadata(PyraxException):
     pass
 
 class InvalidConfigurationFile(PyraxException):
     pass
 
+class InvalidCopyDestination(PyraxException):
+    pass
+
 class InvalidCredentialFile(PyraxException):
     pass
 
@@ -1,21 +1,35 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import collections
 import datetime
 import fnmatch
 import hashlib
 import os
+import Queue
 import random
 import re
 import shutil
+import stat
 import string
 import sys
 import tempfile
+import threading
 import time
 import types
 import uuid
 
 import prettytable
+try:
+    # Python 3.5+ includes scandir() in the os module; for earlier versions
+    # the 'scandir' backport, which setup.py installs, is used. If neither
+    # can be imported, folders are read with listdir() and lstat().
+    from os import scandir as _scandir
+except ImportError:
+    try:
+        from scandir import scandir as _scandir
+    except ImportError:
+        _scandir = None
 try:
     import pudb
 except ImportError:
@@ -89,6 +103,234 @@ class SelfDeletingTempDirectory(object):
         shutil.rmtree(self.name)
 
 
+class LRUCache(object):
+    """
+    A dict-like cache that holds at most 'max_size' items. When it is full,
+    adding an item discards the item that was least recently used. If 'ttl'
+    is given, items also expire that many seconds after they were stored; an
+    individual item can be given a different lifetime by storing it with
+    set(). It is safe to use from multiple threads.
+    """
+    def __init__(self, max_size=1000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                val, expires = self._items.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires <= time.time():
+                return default
+            # Re-insert it to mark it as the most recently used.
+            self._items[key] = (val, expires)
+            return val
+
+    def __getitem__(self, key):
+        val = self.get(key, self)
+        if val is self:
+            raise KeyError(key)
+        return val
+
+    def set(self, key, val, ttl=None):
+        """
+        Stores the item. It expires after 'ttl' seconds, or after the cache's
+        default ttl if that is not specified.
+        """
+        if ttl is None:
+            ttl = self.ttl
+        expires = None
+        if ttl is not None:
+            expires = time.time() + ttl
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = (val, expires)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __setitem__(self, key, val):
+        self.set(key, val)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            try:
+                val, expires = self._items.pop(key)
+            except KeyError:
+                return default
+        if expires is not None and expires <= time.time():
+            return default
+        return val
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def __len__(self):
+        return len(self._items)
+
+    def keys(self):
+        with self._lock:
+            return self._items.keys()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class WorkerPool(object):
+    """
+    Calls a function for each of a series of items, using a fixed number of
+    worker threads. Items are handed to the workers through a bounded queue,
+    so adding items blocks whenever the workers fall behind.
+
+    Usage:
+
+    \code
+    pool = WorkerPool(some_func, workers=8)
+    for item in items:
+        pool.put(item)
+    results = pool.join()
+    \endcode
+
+    The value returned by join() is a list of (item, result, error) 3-tuples,
+    one for each item, in the order in which they completed. 'error' is the
+    exception raised by the function for that item, or None if it succeeded.
+    """
+    _done = object()
+
+    def __init__(self, fnc, workers=4, queue_size=None):
+        self.fnc = fnc
+        self.workers = max(1, workers)
+        self.queue = Queue.Queue(queue_size or self.workers * 2)
+        self.results = []
+        self.cancelled = False
+        self._lock = threading.Lock()
+        self._threads = []
+        for ii in xrange(self.workers):
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is self._done:
+                break
+            if self.cancelled:
+                # Drain the queue without doing any more work.
+                continue
+            try:
+                result, error = self.fnc(item), None
+            except Exception as e:
+                result, error = None, e
+            with self._lock:
+                self.results.append((item, result, error))
+
+    def put(self, item):
+        """Queues the item to be processed by the next available worker."""
+        self.queue.put(item)
+
+    def pop_results(self):
+        """
+        Returns the results for the items that have completed since the last
+        call, so that progress can be tallied while items are still queued.
+        """
+        with self._lock:
+            results, self.results = self.results, []
+        return results
+
+    def cancel(self):
+        """Any items that have not been started yet will be skipped."""
+        self.cancelled = True
+
+    def join(self):
+        """
+        Waits for all queued items to be processed, and returns the results
+        that have not already been returned by pop_results(). No more items
+        can be added after this is called.
+        """
+        for thread in self._threads:
+            self.queue.put(self._done)
+        for thread in self._threads:
+            thread.join()
+        return self.results
+
+    def map(self, items):
+        """Processes all the items, and returns the results."""
+        for item in items:
+            self.put(item)
+        return self.join()
+
+
+class RateLimiter(object):
+    """
+    Spaces out calls to wait() so that, across all threads, they return no
+    more than 'rate' times per second. A 'rate' of None means no limit.
+    """
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Blocks until the next call is allowed."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def prefetch(iterable, depth=1):
+    """
+    Generates the items of 'iterable', which is consumed by a background
+    thread so that up to 'depth' items are ready before they are requested.
+    Any exception raised by the iterable is re-raised in the caller. If the
+    caller stops iterating early, the background thread stops as well.
+    """
+    results = Queue.Queue(depth)
+    stop = threading.Event()
+
+    def put(kind, val):
+        while not stop.is_set():
+            try:
+                results.put((kind, val), timeout=0.1)
+                return True
+            except Queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put("item", item):
+                    return
+        except Exception:
+            put("error", sys.exc_info())
+            return
+        put("done", None)
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            kind, val = results.get()
+            if kind == "done":
+                break
+            if kind == "error":
+                raise val[0], val[1], val[2]
+            yield val
+    finally:
+        stop.set()
+
+
 def get_checksum(content, encoding="utf8"):
     """
     Returns the MD5 checksum in hex for the given content. If 'content'
@@ -116,6 +358,29 @@ def get_checksum(content, encoding="utf8"):
     return md.hexdigest()
 
 
+def get_file_checksum(pth, offset=0, length=None, chunk_size=65536):
+    """
+    Returns the MD5 checksum in hex for the file at the specified path. The
+    file is read in chunks, so memory use does not depend on its size. If
+    'offset' and/or 'length' are supplied, only that range of the file is
+    included in the checksum.
+    """
+    md = hashlib.md5()
+    with open(pth, "rb") as ff:
+        ff.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            to_read = chunk_size
+            if remaining is not None:
+                to_read = min(chunk_size, remaining)
+                remaining -= to_read
+            chunk = ff.read(to_read)
+            if not chunk:
+                break
+            md.update(chunk)
+    return md.hexdigest()
+
+
 def random_name(length=20, ascii_only=False):
     """
     Generates a random name; useful for testing.
@@ -154,29 +419,102 @@ def folder_size(pth, ignore=None):
     """
     Returns the total bytes for the specified path, optionally ignoring
     any files which match the 'ignore' parameter. 'ignore' can either be
-    a single string pattern, or a list of such patterns.
+    a single string pattern, or a list of such patterns. As in walk_files(),
+    the patterns are matched against the names of the files and folders,
+    not their full paths.
     """
     if not os.path.isdir(pth):
         raise exc.FolderNotFound
+    return sum(size for relpath, size, mtime in walk_files(pth, ignore))
 
-    ignore = coerce_string_to_list(ignore)
-
-    def get_size(total, root, names):
-        paths = [os.path.realpath(os.path.join(root, nm)) for nm in names]
-        for pth in paths[::-1]:
-            if not os.path.exists(pth):
-                paths.remove(pth)
-            if os.path.isdir(pth):
-                # Don't count folder stat sizes
-                paths.remove(pth)
-            if match_pattern(pth, ignore):
-                paths.remove(pth)
-        total[0] += sum(os.stat(pth).st_size for pth in paths)
-
-    # Need a mutable to pass
-    total = [0]
-    os.path.walk(pth, get_size, total)
-    return total[0]
+
+def compile_patterns(patterns):
+    """
+    Combines the supplied file-name wildcard patterns into a single compiled
+    regular expression, so that a name can be tested against all of them
+    with one match() call. Returns None if there are no patterns.
+    """
+    patterns = coerce_string_to_list(patterns)
+    if not patterns:
+        return None
+    regexes = []
+    for pat in patterns:
+        regex = fnmatch.translate(pat)
+        # Python 2 appends the flags to the end of the translated pattern;
+        # they can't be repeated in the combined expression.
+        if regex.endswith("(?ms)"):
+            regex = regex[:-5]
+        regexes.append("(?:%s)" % regex)
+    return re.compile("|".join(regexes), re.M | re.S)
+
+
+def _iter_dir(pth):
+    """
+    Generates a (name, is_dir, stat) 3-tuple for each entry in the specified
+    folder. Symlinks are followed, both to files and to folders; the stat is
+    only returned for files. Broken links and entries that disappear during
+    the walk are skipped.
+    """
+    if _scandir is not None:
+        for entry in _scandir(pth):
+            try:
+                if entry.is_dir():
+                    yield entry.name, True, None
+                else:
+                    yield entry.name, False, entry.stat()
+            except OSError:
+                continue
+        return
+    for name in os.listdir(pth):
+        try:
+            st = os.stat(os.path.join(pth, name))
+        except OSError:
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            yield name, True, None
+        else:
+            yield name, False, st
+
+
+def walk_files(pth, ignore=None):
+    """
+    Walks the folder tree starting at 'pth', and generates a 3-tuple of
+    (relative path, size, mtime) for every file found in it. Any file or
+    folder whose name matches one of the 'ignore' patterns is skipped; the
+    contents of ignored folders are not examined at all.
+
+    Symlinks to folders are followed, as os.walk(followlinks=True) does, so
+    a linked folder's files are reported under the link's path. A link to
+    one of the folders that contain it is skipped, so that a loop is not
+    walked forever.
+
+    The directory entries are read with scandir() when it is available, so
+    that no additional system calls are needed to tell files from folders.
+    """
+    regex = compile_patterns(ignore)
+    # Each folder is kept with the (device, inode) pairs of the folders that
+    # lead to it.
+    folders = [("", frozenset())]
+    while folders:
+        relfolder, parents = folders.pop()
+        folder = os.path.join(pth, relfolder) if relfolder else pth
+        try:
+            st = os.stat(folder)
+            key = (st.st_dev, st.st_ino)
+            if key in parents:
+                continue
+            parents = parents | set([key])
+            entries = list(_iter_dir(folder))
+        except OSError:
+            continue
+        for name, is_dir, st in entries:
+            if regex and regex.match(name):
+                continue
+            relpath = os.path.join(relfolder, name) if relfolder else name
+            if is_dir:
+                folders.append((relpath, parents))
+            elif stat.S_ISREG(st.st_mode):
+                yield relpath, st.st_size, st.st_mtime
 
 
 def add_method(obj, func, name=None):
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Copyright 2012 Rackspace
+
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+# Measures the memory used by the StorageObjects for a listing of a million
+# objects. No credentials are needed, as nothing is sent to Cloud Files.
+# Run with the number of objects as an optional argument.
+
+import gc
+import os
+import sys
+
+from pyrax.cf_wrapper.storage_object import StorageObject
+
+
+# A copy of StorageObject without __slots__, so that every instance has a
+# __dict__, for comparison.
+DictStorageObject = type("DictStorageObject", (object, ),
+        dict((key, val) for key, val in StorageObject.__dict__.items()
+        if key not in StorageObject.__slots__ + ("__slots__", )))
+
+
+def rss():
+    """Returns the resident memory of this process in bytes."""
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return pages * 4096
+
+
+def measure(cls, count):
+    # The listing dicts are built up front so that only the objects are
+    # measured.
+    listing = [{"name": u"logs/2013/%08d.gz" % num, "bytes": num,
+            "content_type": u"application/x-gzip",
+            "last_modified": u"2013-01-01T00:00:00.000000",
+            "hash": u"d41d8cd98f00b204e9800998ecf8427e"}
+            for num in xrange(count)]
+    gc.collect()
+    before = rss()
+    objs = [cls(None, "logs", attdict=dct) for dct in listing]
+    gc.collect()
+    used = rss() - before
+    del objs, listing
+    gc.collect()
+    return used
+
+
+count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+for label, cls in (("With __dict__", DictStorageObject),
+        ("With __slots__", StorageObject)):
+    # Memory freed by Python isn't returned to the OS, so each measurement is
+    # made in a fresh child process.
+    pid = os.fork()
+    if not pid:
+        used = measure(cls, count)
+        print "%-15s %6.1f MB, %5d bytes per object" % (label,
+                used / 1048576.0, used / count)
+        os._exit(0)
+    os.waitpid(pid, 0)
@@ -35,6 +35,7 @@ setup(
         "python-swiftclient",
         "httplib2",
         "keyring",
+        "scandir",
     ],
     packages=[
         "pyrax",
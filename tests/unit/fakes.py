@@ -47,6 +47,24 @@ class FakeResponse(dict):
         pass
 
 
+class FakeStreamingResponse(FakeResponse):
+    def __init__(self, body="", status=200):
+        self.body = body
+        self.status = status
+        self._pos = 0
+
+    def read(self, amt=None):
+        start = self._pos
+        if amt is None:
+            self._pos = len(self.body)
+        else:
+            self._pos = min(start + amt, len(self.body))
+        return self.body[start:self._pos]
+
+    def close(self):
+        pass
+
+
 class FakeClient(object):
     user_agent = "Fake"
     USER_AGENT = "Fake"
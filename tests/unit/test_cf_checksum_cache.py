@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import unittest
+
+from mock import patch
+from mock import MagicMock as Mock
+
+from pyrax.cf_wrapper.checksum_cache import ChecksumCache
+import pyrax.utils as utils
+
+
+
+class CF_ChecksumCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = utils.SelfDeletingTempDirectory()
+        self.folder = self.tmpdir.__enter__()
+        self.cache = ChecksumCache(os.path.join(self.folder, "sub",
+                "checksums.db"), min_age=0)
+        self.pth = os.path.join(self.folder, "data")
+        self._write("some data")
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.__exit__(None, None, None)
+
+    def _write(self, content, age=60):
+        with file(self.pth, "w") as ff:
+            ff.write(content)
+        then = time.time() - age
+        os.utime(self.pth, (then, then))
+
+    def test_get_checksum(self):
+        expected = utils.get_checksum("some data")
+        self.assertEqual(self.cache.get_checksum(self.pth), expected)
+        self.assertEqual(self.cache.lookup(self.pth), expected)
+        with patch.object(utils, "get_file_checksum") as gfc:
+            self.assertEqual(self.cache.get_checksum(self.pth), expected)
+            self.assertEqual(gfc.call_count, 0)
+
+    def test_persistent(self):
+        self.cache.get_checksum(self.pth)
+        self.cache.flush()
+        other = ChecksumCache(self.cache.path, min_age=0)
+        self.assertEqual(other.lookup(self.pth),
+                utils.get_checksum("some data"))
+        other.close()
+
+    def test_batched_commits(self):
+        self.cache.commit_interval = 3
+        other = ChecksumCache(self.cache.path, min_age=0)
+        paths = []
+        for idx in xrange(4):
+            self.pth = os.path.join(self.folder, "data%s" % idx)
+            self._write("data %s" % idx)
+            paths.append(self.pth)
+            self.cache.get_checksum(self.pth)
+        # The first three were committed together; the last is still pending,
+        # although this connection can already see it.
+        self.assertIsNotNone(other.lookup(paths[2]))
+        self.assertIsNone(other.lookup(paths[3]))
+        self.assertIsNotNone(self.cache.lookup(paths[3]))
+        self.cache.close()
+        self.assertIsNotNone(other.lookup(paths[3]))
+        other.close()
+        self.cache = ChecksumCache(other.path, min_age=0)
+
+    def test_changed_file(self):
+        self.cache.get_checksum(self.pth)
+        self._write("other data!", age=30)
+        self.assertIsNone(self.cache.lookup(self.pth))
+        self.assertEqual(self.cache.get_checksum(self.pth),
+                utils.get_checksum("other data!"))
+
+    def test_recently_modified(self):
+        self.cache.min_age = 10
+        self._write("some data", age=0)
+        self.cache.get_checksum(self.pth)
+        self.assertIsNone(self.cache.lookup(self.pth))
+
+    def test_remove_and_clear(self):
+        self.cache.get_checksum(self.pth)
+        self.cache.remove(self.pth)
+        self.assertIsNone(self.cache.lookup(self.pth))
+        self.cache.get_checksum(self.pth)
+        self.cache.clear()
+        self.assertIsNone(self.cache.lookup(self.pth))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
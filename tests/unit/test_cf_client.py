@@ -1,13 +1,26 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
 import os
+import socket
+import StringIO
+import tarfile
+import threading
+import time
 import unittest
+import urllib
 
 from mock import patch
 from mock import MagicMock as Mock
 
 import pyrax
+from pyrax.cf_wrapper.checksum_cache import ChecksumCache
+from pyrax.cf_wrapper.client import _iter_tar
+from pyrax.cf_wrapper.client import CDNPurgeQueue
+from pyrax.cf_wrapper.client import ConnectionPool
+from pyrax.cf_wrapper.client import FolderSyncer
+from pyrax.cf_wrapper.client import _SharedAuth
 from pyrax.cf_wrapper.client import _swift_client
 from pyrax.cf_wrapper.container import Container
 import pyrax.utils as utils
@@ -17,6 +30,7 @@ from tests.unit.fakes import FakeFolderUploader
 from tests.unit.fakes import FakeIdentity
 from tests.unit.fakes import FakeResponse
 from tests.unit.fakes import FakeStorageObject
+from tests.unit.fakes import FakeStreamingResponse
 
 
 
@@ -38,7 +52,9 @@ class CF_ClientTest(unittest.TestCase):
         pyrax.set_credentials("fakeuser", "fakeapikey")
         pyrax.connect_to_cloudfiles()
         self.client = pyrax.cloudfiles
-        self.client._container_cache = {}
+        self.client.clear_container_cache()
+        # Objects are looked up with a HEAD request.
+        self.client.connection.head_object = Mock(return_value={})
         self.cont_name = utils.random_name()
         self.obj_name = utils.random_name()
         self.fake_object = FakeStorageObject(self.client, self.cont_name,
@@ -128,6 +144,131 @@ class CF_ClientTest(unittest.TestCase):
         client.connection.post_container.assert_called_with(self.cont_name,
                 {"x-container-meta-bar": ""})
 
+    def test_metadata_batch(self):
+        client = self.client
+        client._make_thread_connection = Mock(return_value=client.connection)
+        client.connection.head_object = Mock(return_value={
+                "X-Object-Meta-Foo": "foo", "X-Object-Meta-Bar": "bar"})
+        client.connection.head_container = Mock()
+        client.connection.post_object = Mock()
+        client.connection.post_container = Mock()
+        with client.metadata_batch():
+            client.set_object_metadata(self.cont_name, self.obj_name,
+                    {"a": "1"})
+            client.set_object_metadata(self.cont_name, self.obj_name,
+                    {"b": "2"})
+            client.remove_object_metadata_key(self.cont_name, self.obj_name,
+                    "Bar")
+            client.set_container_metadata(self.cont_name, {"c": "3"})
+            client.remove_container_metadata_key(self.cont_name, "d")
+            with client.metadata_batch():
+                client.set_object_metadata(self.cont_name, "other", {"e": "5"},
+                        clear=True)
+            self.assertFalse(client.connection.post_object.called)
+        self.assertEqual(client.connection.head_object.call_count, 1)
+        self.assertFalse(client.connection.head_container.called)
+        client.connection.post_object.assert_any_call(self.cont_name,
+                self.obj_name, {"x-object-meta-foo": "foo",
+                "x-object-meta-a": "1", "x-object-meta-b": "2"})
+        client.connection.post_object.assert_any_call(self.cont_name, "other",
+                {"x-object-meta-e": "5"})
+        client.connection.post_container.assert_called_once_with(self.cont_name,
+                {"x-container-meta-c": "3", "x-container-meta-d": ""})
+
+    def test_metadata_batch_discarded(self):
+        client = self.client
+        client.connection.post_container = Mock()
+        for err in (ValueError, KeyboardInterrupt):
+            def fail():
+                with client.metadata_batch():
+                    client.set_container_metadata(self.cont_name, {"c": "3"})
+                    raise err()
+
+            self.assertRaises(err, fail)
+            self.assertFalse(client.connection.post_container.called)
+        client.set_container_metadata(self.cont_name, {"c": "3"})
+        self.assertTrue(client.connection.post_container.called)
+
+    def test_connection_pool_reuse(self):
+        client = self.client
+        conns = []
+
+        def make():
+            conn = Mock()
+            conns.append(conn)
+            return conn
+
+        client._make_thread_connection = Mock(side_effect=make)
+        used = []
+
+        def work():
+            used.append(client.connection)
+
+        for ii in xrange(3):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+            # The thread's local data is discarded just after join() returns.
+            for attempt in xrange(100):
+                if client._connection_pool._idle:
+                    break
+                time.sleep(0.01)
+        # Each thread re-used the connection of the one before.
+        self.assertEqual(len(conns), 1)
+        self.assertEqual(used, conns * 3)
+        with client.checkout_connection() as conn:
+            self.assertTrue(conn is conns[0])
+            self.assertTrue(client.connection is conn)
+        self.assertFalse(client.connection is conn)
+        self.assertTrue(client._connection_pool.get() is conn)
+
+    def test_user_agent_all_connections(self):
+        client = self.client
+        idle = client._connection_pool.get()
+        client._connection_pool.put(idle)
+        client.user_agent = "agent/1"
+        self.assertEqual(idle.user_agent, "agent/1")
+        used = []
+
+        def work():
+            used.append(client.connection)
+            client.user_agent = "agent/2"
+
+        # A connection made for another thread gets the current agent, and
+        # setting it there updates the other connections too.
+        client._connection_pool.clear()
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.assertEqual(used[0].user_agent, "agent/2")
+        self.assertEqual(client.connection.user_agent, "agent/2")
+        self.assertEqual(client.user_agent, "agent/2")
+        thread = threading.Thread(target=lambda: used.append(
+                client.connection))
+        thread.start()
+        thread.join()
+        self.assertEqual(used[-1].user_agent, "agent/2")
+
+    def test_connection_pool_limit(self):
+        pool = ConnectionPool(Mock, max_idle=1)
+        conn1, conn2 = pool.get(), pool.get()
+        pool.put(conn1)
+        pool.put(conn2)
+        self.assertFalse(conn1.close.called)
+        conn2.close.assert_called_once_with()
+        pool.clear()
+        conn1.close.assert_called_once_with()
+
+    def test_shared_auth(self):
+        shared = _SharedAuth()
+        auth = Mock(side_effect=[("url", "tok1"), ("url", "tok2")])
+        self.assertEqual(shared.renew(None, auth), ("url", "tok1"))
+        # Another connection that was using the old token gets the new one.
+        self.assertEqual(shared.renew(None, auth), ("url", "tok1"))
+        self.assertEqual(shared.renew("tok1", auth), ("url", "tok2"))
+        self.assertEqual(shared.renew("tok1", auth), ("url", "tok2"))
+        self.assertEqual(auth.call_count, 2)
+
     def test_massage_metakeys(self):
         prefix = "ABC-"
         orig = {"ABC-yyy": "ok", "zzz": "change"}
@@ -180,16 +321,69 @@ class CF_ClientTest(unittest.TestCase):
         client.connection.delete_container = Mock()
         client.get_container_object_names = Mock()
         client.get_container_object_names.return_value = ["o1", "o2", "o3"]
-        client.delete_object = Mock()
+        client.bulk_delete = Mock()
         client.delete_container(self.cont_name)
-        self.assertEqual(client.get_container_object_names.call_count, 0)
+        self.assertEqual(client.bulk_delete.call_count, 0)
         client.connection.delete_container.assert_called_with(self.cont_name)
         # Now call with del_objects=True
         client.delete_container(self.cont_name, True)
-        self.assertEqual(client.get_container_object_names.call_count, 1)
-        self.assertEqual(client.delete_object.call_count, 3)
+        client.bulk_delete.assert_called_once_with(self.cont_name)
         client.connection.delete_container.assert_called_with(self.cont_name)
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_bulk_delete(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client.bulk_delete_batch_size = 2
+        names = ["o1", "o2", "o3", u"o\xf1"]
+        client.get_container_object_names = Mock(side_effect=[names[:2],
+                names[2:], []])
+        body = json.dumps({"Number Deleted": 1, "Number Not Found": 0,
+                "Response Status": "400 Bad Request",
+                "Errors": [["/%s/o%%C3%%B1" % urllib.quote(self.cont_name),
+                "409 Conflict"]]})
+        responses = [FakeStreamingResponse(json.dumps({"Number Deleted": 1,
+                "Number Not Found": 1, "Response Status": "200 OK",
+                "Errors": []})), FakeStreamingResponse(body)]
+        client.connection.storage_request = Mock(side_effect=responses)
+        result = client.bulk_delete(self.cont_name)
+        self.assertEqual(result, {"deleted": 2, "not_found": 1,
+                "errors": [(u"o\xf1", "409 Conflict")]})
+        self.assertEqual(client.connection.storage_request.call_count, 2)
+        args, kwargs = client.connection.storage_request.call_args_list[0]
+        self.assertEqual(args[0], "POST")
+        self.assertEqual(kwargs["query"], "bulk-delete")
+        quoted = urllib.quote(self.cont_name)
+        self.assertEqual(kwargs["data"], "/%s/o1\n/%s/o2" % (quoted, quoted))
+        self.assertEqual(
+                client.get_container_object_names.call_args_list[1][1][
+                "marker"], "o2")
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_bulk_delete_fallback(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        # Without the middleware, the POST just updates the account.
+        client.connection.storage_request = Mock(
+                return_value=FakeStreamingResponse("", status=204))
+        def delete_object(cname, oname):
+            if oname == "missing":
+                raise _swift_client.ClientException("gone", http_status=404)
+            if oname == "bad":
+                raise _swift_client.ClientException("fail", http_status=500)
+        client.connection.delete_object = Mock(side_effect=delete_object)
+        client._make_thread_connection = Mock(return_value=client.connection)
+        names = ["o1", "o2", "missing", "bad", "skip"]
+        result = client.bulk_delete(self.cont_name, names, prefix="o",
+                workers=2)
+        self.assertEqual(result, {"deleted": 2, "not_found": 0, "errors": []})
+        result = client.bulk_delete(self.cont_name, names)
+        self.assertEqual(result["deleted"], 3)
+        self.assertEqual(result["not_found"], 1)
+        self.assertEqual([nm for nm, reason in result["errors"]], ["bad"])
+        # The middleware is only probed once.
+        self.assertEqual(client.connection.storage_request.call_count, 1)
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_delete_object(self):
         client = self.client
@@ -207,9 +401,52 @@ class CF_ClientTest(unittest.TestCase):
         client.connection.cdn_request = Mock()
         emls = ["foo@example.com", "bar@example.com"]
         client.purge_cdn_object(self.cont_name, self.obj_name, emls)
-        client.connection.cdn_request.assert_called_with("DELETE", self.cont_name, self.obj_name,
+        client.connection.cdn_request.assert_called_with("DELETE",
+                [self.cont_name, self.obj_name],
                 hdrs={"X-Purge-Email": "foo@example.com, bar@example.com"})
 
+    def test_purge_cdn_objects(self):
+        client = self.client
+        client._make_thread_connection = Mock(return_value=client.connection)
+        client.connection.head_container = Mock()
+        client.get_container(self.cont_name).cdn_uri = "http://example.com"
+        client.get_container("private").cdn_uri = None
+        resp = FakeResponse()
+        resp.status = 204
+        client.connection.cdn_request = Mock(return_value=resp)
+        queue = CDNPurgeQueue(client, email_addresses="me@example.com",
+                workers=1, rate=1000)
+        self.assertTrue(queue.add(self.cont_name, "o1"))
+        self.assertTrue(queue.add(self.cont_name, "o2"))
+        self.assertFalse(queue.add(self.cont_name, "o1"))
+        queue.add("private", "o3")
+        self.assertEqual(len(queue), 3)
+        client.connection.head_container.reset_mock()
+        ret = queue.flush()
+        self.assertEqual(ret["purged"], 2)
+        self.assertEqual([err[0] for err in ret["errors"]], ["private/o3"])
+        self.assertEqual(len(queue), 0)
+        calls = client.connection.cdn_request.call_args_list
+        self.assertEqual(calls[0], (("DELETE", [self.cont_name, "o1"]),
+                {"hdrs": {}}))
+        # Only the last request carries the email address.
+        self.assertEqual(calls[1], (("DELETE", [self.cont_name, "o2"]),
+                {"hdrs": {"X-Purge-Email": "me@example.com"}}))
+
+    def test_purge_cdn_objects_failure(self):
+        client = self.client
+        client._make_thread_connection = Mock(return_value=client.connection)
+        client.connection.head_container = Mock()
+        client.get_container(self.cont_name).cdn_uri = "http://example.com"
+        resp = FakeResponse()
+        resp.status = 500
+        client.connection.cdn_request = Mock(return_value=resp)
+        ret = client.purge_cdn_objects(self.cont_name, ["o1", "o2", "o1"],
+                rate=1000)
+        self.assertEqual(ret["purged"], 0)
+        self.assertEqual(sorted(err[0] for err in ret["errors"]),
+                ["%s/o1" % self.cont_name, "%s/o2" % self.cont_name])
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_get_object(self):
         client = self.client
@@ -234,6 +471,20 @@ class CF_ClientTest(unittest.TestCase):
         self.assertEqual(client.connection.put_object.call_count, 1)
         client.get_object = gobj
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_store_object_clears_cache(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client.connection.put_object = Mock()
+        client.connection.head_object = Mock(side_effect=_swift_client.ClientException(
+                "HEAD failed", http_status=404))
+        self.assertRaises(exc.NoSuchObject, client.get_object, self.cont_name,
+                "o1")
+        client.connection.head_object = Mock(return_value={
+                "content-length": "4"})
+        obj = client.store_object(self.cont_name, "o1", "test")
+        self.assertEqual(obj.total_bytes, 4)
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_upload_file(self):
         client = self.client
@@ -254,6 +505,23 @@ class CF_ClientTest(unittest.TestCase):
         client.get_object = gobj
 
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_file_checksum_cache(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client.connection.put_object = Mock()
+        client.checksum_cache = Mock()
+        client.checksum_cache.get_checksum.return_value = "cached"
+        cont = client.get_container(self.cont_name)
+        with utils.SelfDeletingTempfile() as tmpname:
+            with file(tmpname, "wb") as tmp:
+                tmp.write("Test Value")
+            client.upload_file(cont, tmpname, return_none=True)
+            client.checksum_cache.get_checksum.assert_called_with(tmpname)
+            self.assertEqual(client.connection.put_object.call_args[1]["etag"],
+                    "cached")
+        client.checksum_cache = None
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_upload_large_file(self):
         client = self.client
@@ -275,6 +543,90 @@ class CF_ClientTest(unittest.TestCase):
             self.assertEqual(client.connection.put_object.call_count, 3)
         client.get_object = gobj
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_large_file_resume(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        cont = client.get_container(self.cont_name)
+        gobj = client.get_object
+        client.get_object = Mock(return_value=self.fake_object)
+        with utils.SelfDeletingTempDirectory() as jdir:
+            client.upload_journal_dir = jdir
+            with utils.SelfDeletingTempfile() as tmpname:
+                small_file_contents = "Test Value " * 25
+                client.max_file_size = len(small_file_contents) - 1
+                with file(tmpname, "wb") as tmp:
+                    tmp.write(small_file_contents)
+                fname = os.path.basename(tmpname)
+                # Fail on the second segment.
+                client.connection.put_object = Mock(side_effect=[None,
+                        exc.UploadFailed("")])
+                self.assertRaises(exc.UploadFailed, client.upload_file, cont,
+                        tmpname)
+                self.assertEqual(len(os.listdir(jdir)), 1)
+                seg_etag = utils.get_checksum(
+                        small_file_contents[:client.max_file_size])
+                client.connection.get_container = Mock(return_value=({},
+                        [{"name": "%s.1" % fname, "hash": seg_etag}]))
+                client.connection.put_object = Mock()
+                client.upload_file(cont, tmpname)
+                # Only the second segment and the manifest are uploaded.
+                self.assertEqual(client.connection.put_object.call_count, 2)
+                self.assertEqual(os.listdir(jdir), [])
+        client.get_object = gobj
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_large_file_partly_read(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        cont = client.get_container(self.cont_name)
+        gobj = client.get_object
+        client.get_object = Mock(return_value=self.fake_object)
+        sent = {}
+
+        def put(cname, nm, contents=None, **kwargs):
+            if contents is not None:
+                sent[nm] = contents.read()
+
+        client.connection.put_object = Mock(side_effect=put)
+        header = "HEADER"
+        body = "Test Value " * 25
+        client.max_file_size = 100
+        with utils.SelfDeletingTempDirectory() as jdir:
+            client.upload_journal_dir = jdir
+            with utils.SelfDeletingTempfile() as tmpname:
+                with file(tmpname, "wb") as tmp:
+                    tmp.write(header + body)
+                with file(tmpname, "rb") as tmp:
+                    self.assertEqual(tmp.read(len(header)), header)
+                    client.upload_file(cont, tmp, obj_name="partial")
+        # Only what follows the current position is uploaded.
+        self.assertEqual(len(sent), 3)
+        self.assertEqual("".join(sent[nm] for nm in sorted(sent)), body)
+        self.assertEqual(sent["%s.1" % tmpname], body[:100])
+        client.get_object = gobj
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_large_stream_not_journaled(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client.connection.put_object = Mock()
+        cont = client.get_container(self.cont_name)
+        gobj = client.get_object
+        client.get_object = Mock(return_value=self.fake_object)
+        contents = "Test Value " * 25
+        client.max_file_size = len(contents) - 1
+        stream = StringIO.StringIO(contents)
+        stream.name = "stream"
+        self.assertIsNone(client._upload_journal_path(cont.name, "stream",
+                stream, 0, len(contents)))
+        with utils.SelfDeletingTempDirectory() as jdir:
+            client.upload_journal_dir = jdir
+            client.upload_file(cont, stream)
+            self.assertEqual(os.listdir(jdir), [])
+        self.assertEqual(client.connection.put_object.call_count, 3)
+        client.get_object = gobj
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_upload_folder_bad_folder(self):
         self.assertRaises(exc.FolderNotFound, self.client.upload_folder, "/doesnt_exist")
@@ -291,9 +643,11 @@ class CF_ClientTest(unittest.TestCase):
         pat1 = "*.foo"
         pat2 = "*.bar"
         upload_key, total_bytes = client.upload_folder(test_folder, ignore=pat1)
-        client._upload_folder_in_background.assert_called_with(test_folder, None, [pat1], upload_key)
+        client._upload_folder_in_background.assert_called_with(test_folder, None, [pat1], upload_key,
+                workers=None, files=[], archive_format=None)
         upload_key, total_bytes = client.upload_folder(test_folder, ignore=[pat1, pat2])
-        client._upload_folder_in_background.assert_called_with(test_folder, None, [pat1, pat2], upload_key)
+        client._upload_folder_in_background.assert_called_with(test_folder, None, [pat1, pat2], upload_key,
+                workers=None, files=[], archive_format=None)
         client._upload_folder_in_background = bg
         os.path.isdir = opi
 
@@ -304,14 +658,18 @@ class CF_ClientTest(unittest.TestCase):
         client._upload_folder_in_background = Mock()
         opi = os.path.isdir
         os.path.isdir = Mock(return_value=True)
-        ufs = utils.folder_size
-        fake_size = 1234
-        utils.folder_size = Mock(return_value=fake_size)
+        uwf = utils.walk_files
+        files = [("a", 1000, 1), ("b", 234, 1)]
+        utils.walk_files = Mock(return_value=iter(files))
         test_folder = "testfolder"
         key, total_bytes = client.upload_folder(test_folder)
-        self.assertEqual(total_bytes, fake_size)
+        self.assertEqual(total_bytes, 1234)
+        self.assertEqual(utils.walk_files.call_count, 1)
+        self.assertEqual(
+                client._upload_folder_in_background.call_args[1]["files"],
+                files)
         client._upload_folder_in_background = bg
-        utils.folder_size = ufs
+        utils.walk_files = uwf
         os.path.isdir = opi
 
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
@@ -345,9 +703,14 @@ class CF_ClientTest(unittest.TestCase):
         self.client.connection.put_container = Mock()
         self.client.connection.head_container = Mock()
         fake_upload_key = "abcd"
-        uploader = FakeFolderUploader("root", "cont", "*.bad", fake_upload_key, self.client)
-        ret = uploader.upload_files_in_folder(None, "folder.bad", ["a", "b"])
-        self.assertFalse(ret)
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "folder.bad"))
+            file(os.path.join(tmpdir, "folder.bad", "a"), "w").write("test")
+            file(os.path.join(tmpdir, "b"), "w").write("test")
+            uploader = FakeFolderUploader(tmpdir, "cont", "*.bad",
+                    fake_upload_key, self.client)
+            items = list(uploader.get_items())
+        self.assertEqual(items, [(os.path.join(tmpdir, "b"), "b", 4, None)])
 
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_upload_folder_with_files(self):
@@ -371,7 +734,8 @@ class CF_ClientTest(unittest.TestCase):
                 nm = "file%s" % idx
                 pth = os.path.join(tmpdir, nm)
                 file(pth, "w").write("test")
-            uploader = FakeFolderUploader(tmpdir, cont, "", fake_upload_key, client)
+            uploader = FakeFolderUploader(tmpdir, cont, "", fake_upload_key, client,
+                    workers=1)
             # Note that the fake moved the actual run() code to a different method
             uploader.actual_run()
             self.assertEqual(client.upload_file.call_count, num_files)
@@ -380,6 +744,126 @@ class CF_ClientTest(unittest.TestCase):
         client._should_abort_folder_upload = safu
         client._update_progress = upprog
 
+    def test_iter_tar(self):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            items = []
+            for idx in xrange(3):
+                pth = os.path.join(tmpdir, "file%s" % idx)
+                file(pth, "w").write("test%s" % idx)
+                items.append((pth, os.path.join("sub", "file%s" % idx), 5))
+            data = "".join(_iter_tar(items, "tar.gz"))
+            items.append((os.path.join(tmpdir, "missing"), "missing", 0))
+            self.assertRaises(exc.UploadFailed, list, _iter_tar(items))
+        tar = tarfile.open(fileobj=StringIO.StringIO(data), mode="r:gz")
+        self.assertEqual(tar.getnames(), ["sub/file0", "sub/file1",
+                "sub/file2"])
+        self.assertEqual(tar.extractfile("sub/file1").read(), "test1")
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_folder_archive(self):
+        client = self.client
+        up = client.upload_file
+        client.upload_file = Mock()
+        client.connection.head_container = Mock()
+        client.connection.put_container = Mock()
+        cont = client.create_container(utils.random_name(ascii_only=True))
+        client.archive_max_file_size = 10
+        client.archive_batch_files = 2
+        received = []
+        def extract(method, path, hdrs=None, query=None, chunks=None):
+            tar = tarfile.open(fileobj=StringIO.StringIO(
+                    "".join(chunks())), mode="r|")
+            names = [info.name for info in tar]
+            received.append((query, names))
+            errors = []
+            if "small1" in names:
+                errors = [["/%s/small1" % cont.name, "400 Bad Request"]]
+            return FakeStreamingResponse(json.dumps({
+                    "Number Files Created": len(names) - len(errors),
+                    "Response Status": "201 Created", "Errors": errors}))
+        client.connection.storage_request = Mock(side_effect=extract)
+        client._make_thread_connection = Mock(return_value=client.connection)
+        fake_upload_key = "abcd"
+        client.folder_upload_status = {fake_upload_key: {"continue": True,
+                "uploaded": 0}}
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            for idx in xrange(3):
+                file(os.path.join(tmpdir, "small%s" % idx), "w").write("test")
+            file(os.path.join(tmpdir, "large"), "w").write("x" * 20)
+            uploader = FakeFolderUploader(tmpdir, cont, "", fake_upload_key,
+                    client, workers=1, archive_format="tar")
+            uploader.actual_run()
+        self.assertEqual(client.upload_file.call_count, 1)
+        self.assertEqual(client.upload_file.call_args[1]["obj_name"], "large")
+        self.assertEqual(sorted(name for query, names in received
+                for name in names), ["small0", "small1", "small2"])
+        self.assertEqual(received[0][0], "extract-archive=tar")
+        status = client.get_folder_upload_status(fake_upload_key)
+        self.assertEqual(status["uploaded_files"], 3)
+        self.assertEqual([nm for nm, err in status["errors"]], ["small1"])
+        client.upload_file = up
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_folder_archive_unsupported(self):
+        client = self.client
+        up = client.upload_file
+        client.upload_file = Mock()
+        client.connection.head_container = Mock()
+        client.connection.put_container = Mock()
+        cont = client.create_container(utils.random_name(ascii_only=True))
+        client.archive_batch_files = 2
+        client.connection.storage_request = Mock(
+                return_value=FakeStreamingResponse("", status=201))
+        client._make_thread_connection = Mock(return_value=client.connection)
+        fake_upload_key = "abcd"
+        client.folder_upload_status = {fake_upload_key: {"continue": True,
+                "uploaded": 0}}
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            for idx in xrange(5):
+                file(os.path.join(tmpdir, "small%s" % idx), "w").write("test")
+            uploader = FakeFolderUploader(tmpdir, cont, "", fake_upload_key,
+                    client, workers=1, archive_format="tar.gz")
+            uploader.actual_run()
+        self.assertEqual(client.upload_file.call_count, 5)
+        self.assertEqual(client.connection.storage_request.call_count, 1)
+        self.assertFalse(client._extract_archive_supported)
+        client.upload_file = up
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_folder_errors(self):
+        client = self.client
+        up = client.upload_file
+        client.upload_file = Mock(side_effect=exc.UploadFailed("fail"))
+        client.connection.head_container = Mock()
+        client.connection.put_container = Mock()
+        cont = client.create_container(utils.random_name())
+        fake_upload_key = "abcd"
+        client.folder_upload_status = {fake_upload_key: {"continue": True,
+                "uploaded": 0}}
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            for idx in xrange(3):
+                file(os.path.join(tmpdir, "file%s" % idx), "w").write("test")
+            uploader = FakeFolderUploader(tmpdir, cont, "", fake_upload_key,
+                    client, workers=2)
+            uploader.actual_run()
+        status = client.get_folder_upload_status(fake_upload_key)
+        self.assertEqual(len(status["errors"]), 3)
+        self.assertEqual(status["uploaded"], 0)
+        client.upload_file = up
+
+    def test_folder_upload_status(self):
+        clt = self.client
+        clt.folder_upload_status = {"good": {"continue": True, "uploaded": 0,
+                "uploaded_files": 0, "start_time": 1}}
+        clt._update_progress("good", 100)
+        clt._update_progress("good", 50)
+        status = clt.get_folder_upload_status("good")
+        self.assertEqual(status["uploaded"], 150)
+        self.assertEqual(status["uploaded_files"], 2)
+        self.assert_(status["bytes_per_sec"] > 0)
+        self.assert_(status["files_per_sec"] > 0)
+        self.assert_("continue" not in status)
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_valid_upload_key(self):
         clt = self.client
@@ -403,10 +887,162 @@ class CF_ClientTest(unittest.TestCase):
                 nm = "file%s" % idx
                 pth = os.path.join(tmpdir, nm)
                 file(pth, "w").write("test")
-            clt.sync_folder_to_container(tmpdir, cont)
+            clt.sync_folder_to_container(tmpdir, cont, workers=1)
             self.assertEqual(clt.upload_file.call_count, num_files)
         clt.upload_file = up
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_sync_container_to_folder(self):
+        clt = self.client
+        clt.connection.head_container = Mock()
+        clt._make_thread_connection = Mock(return_value=clt.connection)
+        contents = {u"same": "same", u"changed": "new!", u"sub/new": "fresh",
+                u"sub/": "", u"../escape": "x", u".hidden": "h"}
+        listing = [{"name": nm, "bytes": len(val),
+                "hash": utils.get_checksum(val),
+                "last_modified": "2013-02-03T04:05:06.000000"}
+                for nm, val in sorted(contents.items())]
+        clt.connection.get_container = Mock(return_value=({}, listing))
+
+        def download_object(cont, name, path, workers=None):
+            with open(path, "wb") as ff:
+                ff.write(contents[name])
+
+        clt.download_object = Mock(side_effect=download_object)
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            for nm, val in (("same", "same"), ("changed", "old!"),
+                    ("extra", "extra")):
+                with open(os.path.join(tmpdir, nm), "w") as ff:
+                    ff.write(val)
+            ret = clt.sync_container_to_folder(self.cont_name, tmpdir,
+                    delete=True, hash_workers=1)
+            self.assertEqual(ret, {"downloaded": 2, "deleted": 1,
+                    "errors": []})
+            self.assertEqual(sorted(call[0][1] for call in
+                    clt.download_object.call_args_list), ["changed", "sub/new"])
+            self.assertEqual(open(os.path.join(tmpdir, "changed")).read(),
+                    "new!")
+            self.assertEqual(open(os.path.join(tmpdir, "sub", "new")).read(),
+                    "fresh")
+            self.assertEqual(os.path.getmtime(os.path.join(tmpdir, "changed")),
+                    1359864306)
+            self.assertEqual(sorted(os.listdir(tmpdir)),
+                    ["changed", "same", "sub"])
+            self.assertEqual(os.listdir(os.path.join(tmpdir, "sub")), ["new"])
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_sync_container_to_folder_prefix_failure(self):
+        clt = self.client
+        clt.connection.head_container = Mock()
+        clt._make_thread_connection = Mock(return_value=clt.connection)
+        listing = [{"name": u"a/one", "bytes": 3, "hash": "x"}]
+        clt.connection.get_container = Mock(return_value=({}, listing))
+        clt.download_object = Mock(side_effect=exc.DownloadFailed("bad"))
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "a"))
+            for nm in ("a/two", "b"):
+                with open(os.path.join(tmpdir, nm), "w") as ff:
+                    ff.write("keep")
+            ret = clt.sync_container_to_folder(self.cont_name, tmpdir,
+                    prefix="a/", delete=True)
+            self.assertEqual(ret["errors"], [(u"a/one", "bad")])
+            self.assertEqual(ret["deleted"], 1)
+            # Files outside the prefix are kept, and no temporary files are
+            # left behind.
+            self.assertEqual(sorted(os.listdir(tmpdir)), ["a", "b"])
+            self.assertEqual(os.listdir(os.path.join(tmpdir, "a")), [])
+            self.assertEqual(clt.connection.get_container.call_args[1][
+                    "prefix"], "a/")
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_watch_folder(self):
+        clt = self.client
+        clt.connection.head_container = Mock()
+        clt._make_thread_connection = Mock(return_value=clt.connection)
+        clt._get_remote_index = Mock(return_value={
+                u"same": (utils.get_checksum("same"), None, 4),
+                u"changed": ("old", None, 3),
+                u"gone": ("x", None, 1),
+                u"sub/one": ("x", None, 1)})
+        uploaded = []
+        deleted = []
+        clt.upload_file = Mock(side_effect=lambda cont, pth, obj_name=None,
+                **kwargs: uploaded.append(obj_name))
+        clt.delete_object = Mock(side_effect=lambda cont, name:
+                deleted.append(name))
+
+        def wait_for(lst, count):
+            end = time.time() + 5
+            while len(lst) < count and time.time() < end:
+                time.sleep(0.05)
+
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "sub"))
+            for nm in ("same", "changed", "sub/one", ".hidden"):
+                with open(os.path.join(tmpdir, nm), "w") as ff:
+                    ff.write(nm)
+            syncer = clt.watch_folder(tmpdir, self.cont_name, delete=True,
+                    debounce=0.1, workers=1, hash_workers=1,
+                    poll_interval=0.1)
+            try:
+                wait_for(deleted, 1)
+                # The initial reconciliation.
+                self.assertEqual(sorted(uploaded), ["changed", "sub/one"])
+                self.assertEqual(deleted, ["gone"])
+                with open(os.path.join(tmpdir, "new"), "w") as ff:
+                    ff.write("new")
+                wait_for(uploaded, 3)
+                self.assertEqual(uploaded[2:], ["new"])
+                os.remove(os.path.join(tmpdir, "sub", "one"))
+                os.rmdir(os.path.join(tmpdir, "sub"))
+                wait_for(deleted, 2)
+                self.assertEqual(deleted[1:], ["sub/one"])
+            finally:
+                syncer.stop()
+            self.assertFalse(syncer.is_alive())
+            status = syncer.get_status()
+            self.assertEqual(status["uploaded"], 3)
+            self.assertEqual(status["deleted"], 2)
+            self.assertEqual(status["errors"], [])
+            self.assertFalse(status["running"])
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_watch_folder_retries(self):
+        clt = self.client
+        clt.connection.head_container = Mock()
+        clt._make_thread_connection = Mock(return_value=clt.connection)
+        # The first listing of the container fails.
+        get_index = clt._get_remote_index
+        clt._get_remote_index = Mock(side_effect=[ValueError("no listing"),
+                {}])
+        uploaded = []
+        up = clt.upload_file
+        clt.upload_file = Mock(side_effect=lambda cont, pth, obj_name=None,
+                **kwargs: uploaded.append(obj_name))
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "a"), "w") as ff:
+                ff.write("a")
+            with patch.object(FolderSyncer, "retry_interval", 0.1):
+                syncer = clt.watch_folder(tmpdir, self.cont_name,
+                        workers=1, hash_workers=1, poll_interval=0.1)
+                try:
+                    end = time.time() + 5
+                    while not uploaded and time.time() < end:
+                        time.sleep(0.05)
+                    status = syncer.get_status()
+                    self.assertTrue(status["running"])
+                    self.assertEqual(status["errors"], [(None, "no listing")])
+                    self.assertEqual(uploaded, ["a"])
+                finally:
+                    syncer.stop()
+        self.assertFalse(syncer.get_status()["running"])
+        clt._get_remote_index = get_index
+        clt.upload_file = up
+
+    def test_watch_folder_missing(self):
+        self.assertRaises(exc.FolderNotFound, self.client.watch_folder,
+                "/no/such/folder", self.cont_name)
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_sync_folder_to_container_hidden(self):
         clt = self.client
@@ -429,7 +1065,8 @@ class CF_ClientTest(unittest.TestCase):
                 nm = ".file%s" % idx
                 pth = os.path.join(tmpdir, nm)
                 file(pth, "w").write("test")
-            clt.sync_folder_to_container(tmpdir, cont, include_hidden=True)
+            clt.sync_folder_to_container(tmpdir, cont, include_hidden=True,
+                    workers=1)
             self.assertEqual(clt.upload_file.call_count, num_all_files)
         clt.upload_file = up
 
@@ -457,10 +1094,114 @@ class CF_ClientTest(unittest.TestCase):
                 nm = "file%s" % idx
                 pth = os.path.join(nested_folder, nm)
                 file(pth, "w").write("test")
-            clt.sync_folder_to_container(tmpdir, cont)
+            clt.sync_folder_to_container(tmpdir, cont, workers=1)
             self.assertEqual(clt.upload_file.call_count, num_all_files)
         clt.upload_file = up
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_sync_folder_to_container_single_listing(self):
+        clt = self.client
+        up = clt.upload_file
+        clt.upload_file = Mock()
+        clt.connection.head_container = Mock()
+        clt.connection.put_container = Mock()
+        cont = clt.create_container(utils.random_name(8))
+        clt.delete_object = Mock()
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            file(os.path.join(tmpdir, "same"), "w").write("same")
+            file(os.path.join(tmpdir, "changed"), "w").write("changed")
+            nested_folder = os.path.join(tmpdir, "nested")
+            os.mkdir(nested_folder)
+            file(os.path.join(nested_folder, "new"), "w").write("new")
+            objs = [FakeStorageObject(clt, cont, name=u"same",
+                    etag=utils.get_checksum("same")),
+                    FakeStorageObject(clt, cont, name=u"changed",
+                    etag="0000"),
+                    FakeStorageObject(clt, cont, name=u"removed",
+                    etag="0000")]
+            clt.get_container_objects = Mock(return_value=objs)
+            clt.sync_folder_to_container(tmpdir, cont, delete=True,
+                    ignore_timestamps=True)
+            self.assertEqual(clt.get_container_objects.call_count, 1)
+            uploaded = sorted([call[1]["obj_name"]
+                    for call in clt.upload_file.call_args_list])
+            self.assertEqual(uploaded, ["changed", "nested/new"])
+            clt.delete_object.assert_called_once_with(container=cont.name,
+                    name="removed")
+        clt.upload_file = up
+
+    def test_checksum_files(self):
+        clt = self.client
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            paths = []
+            for idx in xrange(5):
+                pth = os.path.join(tmpdir, "file%s" % idx)
+                file(pth, "w").write("test%s" % idx)
+                paths.append(pth)
+            missing = os.path.join(tmpdir, "missing")
+            results = dict(clt._checksum_files(paths + [missing],
+                    hash_workers=2))
+            self.assertEqual(len(results), 5)
+            for idx, pth in enumerate(paths):
+                self.assertEqual(results[pth],
+                        utils.get_checksum("test%s" % idx))
+
+    def test_checksum_files_cached(self):
+        clt = self.client
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            clt.checksum_cache = ChecksumCache(os.path.join(tmpdir, "db"),
+                    min_age=0)
+            cached = os.path.join(tmpdir, "cached")
+            file(cached, "w").write("cached")
+            new = os.path.join(tmpdir, "new")
+            file(new, "w").write("new")
+            clt.checksum_cache.store(cached, "abc", os.stat(cached))
+            results = dict(clt._checksum_files(iter([cached, new]),
+                    hash_workers=1))
+            self.assertEqual(results[cached], "abc")
+            self.assertEqual(results[new], utils.get_checksum("new"))
+            self.assertEqual(clt.checksum_cache.lookup(new),
+                    utils.get_checksum("new"))
+            # The new checksum has been committed for other connections.
+            other = ChecksumCache(clt.checksum_cache.path, min_age=0)
+            self.assertEqual(other.lookup(new), utils.get_checksum("new"))
+            other.close()
+            clt.disable_checksum_cache()
+
+    def test_checksum_files_error(self):
+        def paths():
+            yield __file__
+            raise OSError("walk failed")
+
+        self.assertRaises(OSError, list, self.client._checksum_files(paths(),
+                hash_workers=2))
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_folder_with_checksums(self):
+        client = self.client
+        up = client.upload_file
+        client.upload_file = Mock()
+        client.connection.head_container = Mock()
+        client.connection.put_container = Mock()
+        cont = client.create_container(utils.random_name())
+        client.checksum_cache = Mock()
+        client.checksum_cache.get_checksum.side_effect = (lambda pth:
+                utils.get_file_checksum(pth))
+        fake_upload_key = "abcd"
+        client.folder_upload_status = {fake_upload_key: {"continue": True,
+                "uploaded": 0}}
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            for idx in xrange(4):
+                file(os.path.join(tmpdir, "file%s" % idx), "w").write("test")
+            uploader = FakeFolderUploader(tmpdir, cont, "", fake_upload_key,
+                    client, workers=1)
+            uploader.actual_run()
+        self.assertEqual(client.upload_file.call_count, 4)
+        for call in client.upload_file.call_args_list:
+            self.assertEqual(call[1]["etag"], utils.get_checksum("test"))
+        client.upload_file = up
+        client.checksum_cache = None
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_delete_objects_not_in_list(self):
         client = self.client
@@ -482,11 +1223,10 @@ class CF_ClientTest(unittest.TestCase):
         client.connection.head_container = Mock()
         cont = client.get_container(self.cont_name)
         client.connection.put_object = Mock()
-        cont.client.connection.get_container = Mock()
-        cont.client.connection.get_container.return_value = ({}, [{"name": "o1"}, {"name": "o2"}])
         client.copy_object(self.cont_name, "o1", "newcont")
+        client.connection.head_object.assert_called_with(self.cont_name, "o1")
         client.connection.put_object.assert_called_with("newcont", "o1", contents=None,
-                headers={"X-Copy-From": "/%s/o1" % self.cont_name})
+                headers={"X-Copy-From": "/%s/o1" % urllib.quote(self.cont_name)})
 
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_move_object(self):
@@ -494,14 +1234,171 @@ class CF_ClientTest(unittest.TestCase):
         client.connection.head_container = Mock()
         cont = client.get_container(self.cont_name)
         client.connection.put_object = Mock(return_value="0000")
-        cont.client.connection.get_container = Mock()
-        cont.client.connection.get_container.return_value = ({}, [{"name": "o1"}, {"name": "o2"}])
         client.delete_object = Mock()
         client.move_object(self.cont_name, "o1", "newcont")
         client.connection.put_object.assert_called_with("newcont", "o1", contents=None,
-                headers={"X-Copy-From": "/%s/o1" % self.cont_name})
+                headers={"X-Copy-From": "/%s/o1" % urllib.quote(self.cont_name)})
         client.delete_object.assert_called_with(self.cont_name, "o1")
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_get_objects_metadata(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+
+        def head(cont, nm):
+            if nm == "missing":
+                raise _swift_client.ClientException("", http_status=404)
+            return {"x-object-meta-name": nm, "content-type": "text/plain"}
+
+        client.connection.head_object = Mock(side_effect=head)
+        progress = []
+        ret = client.get_objects_metadata(self.cont_name,
+                ["o1", "o2", "missing"], callback=lambda res: progress.append(
+                res["not_found"]))
+        self.assertEqual(ret["metadata"], {"o1": {"x-object-meta-name": "o1"},
+                "o2": {"x-object-meta-name": "o2"}})
+        self.assertEqual(ret["not_found"], 1)
+        self.assertEqual(ret["errors"], [])
+        self.assertEqual(progress, [1])
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_get_objects_metadata_pages(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        client.listing_page_size = 2
+        client.connection.head_object = Mock(return_value={})
+        progress = []
+        with patch.object(utils, "WorkerPool",
+                side_effect=utils.WorkerPool) as pool_class:
+            ret = client.get_objects_metadata(self.cont_name,
+                    ["o%s" % ii for ii in xrange(5)], workers=1,
+                    callback=lambda res: progress.append(len(res["metadata"])))
+        # A single pool handles every page.
+        self.assertEqual(pool_class.call_count, 1)
+        self.assertEqual(len(ret["metadata"]), 5)
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(progress[-1], 5)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_set_objects_metadata_clear(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        client.connection.head_object = Mock()
+        client.connection.post_object = Mock()
+        ret = client.set_objects_metadata(self.cont_name, {"a": "1"},
+                {"o1": {"b": "2"}, "o2": {}}, clear=True)
+        self.assertEqual(ret, {"updated": 2, "not_found": 0, "errors": []})
+        self.assertFalse(client.connection.head_object.called)
+        client.connection.post_object.assert_any_call(self.cont_name, "o1",
+                {"x-object-meta-a": "1", "x-object-meta-b": "2"})
+        client.connection.post_object.assert_any_call(self.cont_name, "o2",
+                {"x-object-meta-a": "1"})
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_set_objects_metadata_merge(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        objs = [{"name": "p/o1", "hash": "e1"}]
+        client.connection.get_container = Mock(return_value=({}, objs))
+        client.connection.head_object = Mock(return_value={
+                "X-Object-Meta-Old": "x", "x-object-meta-gone": "y",
+                "etag": "e1"})
+        client.connection.post_object = Mock(side_effect=Exception("boom"))
+        ret = client.set_objects_metadata(self.cont_name, {"new": "z",
+                "gone": ""}, prefix="p/")
+        self.assertEqual(ret["errors"], [("p/o1", "boom")])
+        client.connection.post_object.assert_called_once_with(self.cont_name,
+                "p/o1", {"x-object-meta-old": "x", "x-object-meta-new": "z"})
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_copy_objects_prefix(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        objs = [{"name": "old/o1", "hash": "a1"}, {"name": "old/o2",
+                "hash": "a2"}]
+        client.connection.get_container = Mock(return_value=({}, objs))
+        client.connection.put_object = Mock(side_effect=["a1",
+                _swift_client.ClientException("", http_status=404)])
+        ret = client.copy_objects(self.cont_name, self.cont_name,
+                prefix="old/", new_prefix="new/", workers=1)
+        self.assertEqual(ret, {"copied": 1, "not_found": 1, "errors": []})
+        client.connection.put_object.assert_any_call(self.cont_name,
+                "new/o1", contents=None,
+                headers={"X-Copy-From": "/%s/old/o1" %
+                urllib.quote(self.cont_name)})
+        self.assertEqual(client.connection.get_container.call_args[1]["prefix"],
+                "old/")
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_copy_objects_same_names(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        self.assertRaises(exc.InvalidCopyDestination, client.copy_objects,
+                self.cont_name, self.cont_name, ["o1"])
+        self.assertRaises(exc.InvalidCopyDestination, client.copy_objects,
+                self.cont_name, self.cont_name, prefix="a/",
+                new_prefix="a/b/")
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_move_objects(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        etags = {"o1": "e1", "o2": "e2", "o3": "e3"}
+        client.connection.head_object = Mock(
+                side_effect=lambda cont, nm: {"etag": etags[nm]})
+        # The copy of o2 has the wrong ETag, so it isn't deleted.
+        copies = {"o1": '"e1"', "o2": "bad", "o3": "e3"}
+        client.connection.put_object = Mock(
+                side_effect=lambda cont, nm, **kw: copies[nm])
+        client.connection.delete_object = Mock()
+        ret = client.move_objects(self.cont_name, "newcont",
+                ["o1", "o2", "o3"], workers=1)
+        self.assertEqual(ret["moved"], 2)
+        self.assertEqual([err[0] for err in ret["errors"]], ["o2"])
+        deleted = [call[0] for call in
+                client.connection.delete_object.call_args_list]
+        self.assertEqual(deleted, [(self.cont_name, "o1"),
+                (self.cont_name, "o3")])
+
+    def test_fetch_object_content_cache(self):
+        client = self.client
+        client.content_cache = Mock()
+        client.content_cache.lookup.return_value = None
+        resp = FakeResponse()
+        resp.status = 200
+        resp.headers = [("ETag", "abc"), ("Content-Length", "4")]
+        resp.read = Mock(return_value="data")
+        client.connection.storage_request = Mock(return_value=resp)
+        ret = client.fetch_object(self.cont_name, self.obj_name,
+                include_meta=True)
+        self.assertEqual(ret, ({"etag": "abc", "content-length": "4"}, "data"))
+        client.connection.storage_request.assert_called_with("GET",
+                [self.cont_name, self.obj_name], hdrs={})
+        client.content_cache.store.assert_called_once_with(self.cont_name,
+                self.obj_name, "abc", ret[0], "data")
+        # Fetching it again sends the etag; the object hasn't changed.
+        client.content_cache.lookup.return_value = "abc"
+        client.content_cache.get.return_value = ({"etag": "abc"}, "data")
+        resp.status = 304
+        resp.read.return_value = ""
+        self.assertEqual(client.fetch_object(self.cont_name, self.obj_name),
+                "data")
+        client.connection.storage_request.assert_called_with("GET",
+                [self.cont_name, self.obj_name], hdrs={"If-None-Match": "abc"})
+        self.assertEqual(client.content_cache.store.call_count, 1)
+        resp.status = 404
+        self.assertRaises(_swift_client.ClientException, client.fetch_object,
+                self.cont_name, self.obj_name)
+        client.content_cache.remove.assert_called_with(self.cont_name,
+                self.obj_name)
+        client.content_cache = None
+
     def test_fetch_object(self):
         client = self.client
         text = "file_contents"
@@ -510,6 +1407,155 @@ class CF_ClientTest(unittest.TestCase):
         self.assertEqual(len(resp), 2)
         self.assertEqual(resp[1], text)
 
+    def _fake_ranged_get(self, content):
+        def fake_get(method, path, hdrs=None):
+            start, end = hdrs["Range"].split("=")[1].split("-")
+            return FakeStreamingResponse(content[int(start):int(end) + 1],
+                    status=206)
+        return fake_get
+
+    def _fake_stream_connection(self, content, etag):
+        resp = FakeStreamingResponse(content)
+        resp.headers = [("Content-Length", str(len(content))), ("Etag", etag)]
+        conn = Mock()
+        conn.storage_request.return_value = resp
+        return conn
+
+    def test_stream_object(self):
+        client = self.client
+        content = "0123456789" * 10
+        conn = self._fake_stream_connection(content,
+                utils.get_checksum(content))
+        client._make_thread_connection = Mock(return_value=conn)
+        stream = client.stream_object(self.cont_name, self.obj_name,
+                chunk_size=30)
+        self.assertEqual(stream.total_bytes, len(content))
+        self.assertEqual(stream.read(5), content[:5])
+        chunks = list(stream)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual("".join(chunks), content[5:])
+        conn.storage_request.assert_called_with("GET", [self.cont_name,
+                self.obj_name])
+        # The connection goes back to the pool once the stream is closed.
+        self.assertFalse(conn in client._connection_pool._idle)
+        stream.close()
+        self.assertTrue(conn in client._connection_pool._idle)
+        self.assertTrue(conn.http_conn is not None)
+
+    def test_stream_object_chunked(self):
+        client = self.client
+        content = "0123456789" * 10
+        conn = self._fake_stream_connection(content,
+                '"%s"' % utils.get_checksum(content))
+        conn.storage_request.return_value.headers = [("Etag",
+                '"%s"' % utils.get_checksum(content))]
+        client._make_thread_connection = Mock(return_value=conn)
+        with client.stream_object(self.cont_name, self.obj_name,
+                chunk_size=30) as stream:
+            self.assertIsNone(stream.total_bytes)
+            self.assertEqual(stream.etag, utils.get_checksum(content))
+            self.assertEqual(stream.read(), content)
+            self.assertEqual(stream.read(), "")
+
+    def test_stream_object_closed_early(self):
+        client = self.client
+        content = "0123456789" * 10
+        conn = self._fake_stream_connection(content,
+                utils.get_checksum(content))
+        http_conn = conn.http_conn = (None, Mock())
+        client._make_thread_connection = Mock(return_value=conn)
+        stream = client.stream_object(self.cont_name, self.obj_name)
+        stream.read(5)
+        stream.close()
+        # The unread data means that the connection can't be re-used.
+        http_conn[1].close.assert_called_once_with()
+        self.assertIsNone(conn.http_conn)
+        self.assertTrue(conn in client._connection_pool._idle)
+
+    def test_stream_object_bad_etag(self):
+        client = self.client
+        content = "0123456789" * 10
+        conn = self._fake_stream_connection(content, "bogus")
+        client._make_thread_connection = Mock(return_value=conn)
+        stream = client.stream_object(self.cont_name, self.obj_name)
+        self.assertRaises(exc.DownloadFailed, stream.read)
+
+    def test_stream_object_not_found(self):
+        client = self.client
+        conn = Mock()
+        conn.storage_request.return_value = FakeStreamingResponse("", 404)
+        client._make_thread_connection = Mock(return_value=conn)
+        self.assertRaises(exc.NoSuchObject, client.stream_object,
+                self.cont_name, self.obj_name)
+        self.assertTrue(conn in client._connection_pool._idle)
+
+    def test_stream_object_save(self):
+        client = self.client
+        content = "0123456789" * 10
+        conn = self._fake_stream_connection(content,
+                utils.get_checksum(content))
+        client._make_thread_connection = Mock(return_value=conn)
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, "saved")
+            stream = client.stream_object(self.cont_name, self.obj_name,
+                    chunk_size=7)
+            stream.save(pth)
+            self.assertEqual(file(pth).read(), content)
+            self.assert_(stream.closed)
+
+    def test_download_object(self):
+        client = self.client
+        client._make_thread_connection = Mock(return_value=client.connection)
+        content = "0123456789" * 10
+        client.connection.head_object = Mock(return_value={
+                "content-length": str(len(content)),
+                "etag": utils.get_checksum(content)})
+        client.connection.storage_request = Mock(
+                side_effect=self._fake_ranged_get(content))
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, "downloaded")
+            client.download_object(self.cont_name, self.obj_name, pth,
+                    workers=3, part_size=7)
+            self.assertEqual(file(pth).read(), content)
+        # 100 bytes in 7-byte parts
+        self.assertEqual(client.connection.storage_request.call_count, 15)
+
+    def test_download_object_bad_etag(self):
+        client = self.client
+        client._make_thread_connection = Mock(return_value=client.connection)
+        content = "0123456789" * 10
+        client.connection.head_object = Mock(return_value={
+                "content-length": str(len(content)), "etag": "bogus"})
+        client.connection.storage_request = Mock(
+                side_effect=self._fake_ranged_get(content))
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, "downloaded")
+            self.assertRaises(exc.DownloadFailed, client.download_object,
+                    self.cont_name, self.obj_name, pth, part_size=30)
+            self.assertFalse(os.path.exists(pth))
+
+    def test_download_object_segments(self):
+        client = self.client
+        client._make_thread_connection = Mock(return_value=client.connection)
+        content = "0123456789" * 10
+        client.connection.head_object = Mock(return_value={
+                "content-length": str(len(content)), "etag": '"manifest"',
+                "x-object-manifest": "segs/obj."})
+        client.connection.storage_request = Mock(
+                side_effect=self._fake_ranged_get(content))
+        segs = [{"name": "obj.1", "bytes": 60,
+                "hash": utils.get_checksum(content[:60])},
+                {"name": "obj.2", "bytes": 40,
+                "hash": utils.get_checksum(content[60:])}]
+        client.connection.get_container = Mock(return_value=({}, segs))
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            pth = os.path.join(tmpdir, "downloaded")
+            client.download_object(self.cont_name, self.obj_name, pth,
+                    part_size=30)
+            self.assertEqual(file(pth).read(), content)
+        client.connection.get_container.assert_called_with("segs",
+                prefix="obj.", full_listing=True)
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_get_all_containers(self):
         client = self.client
@@ -538,6 +1584,213 @@ class CF_ClientTest(unittest.TestCase):
         self.assertEqual(cont.object_count, 3)
         self.assertEqual(cont.total_bytes, 1234)
 
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_get_all_containers_warms_cache(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        cont_list = [{"name": "cont%s" % idx, "count": "2", "bytes": "100"}
+                for idx in xrange(5)]
+        client.connection.get_container = Mock(return_value=({}, cont_list))
+        conts = client.get_all_containers()
+        for idx in xrange(5):
+            self.assertTrue(client.get_container("cont%s" % idx) is conts[idx])
+        self.assertEqual(client.connection.head_container.call_count, 0)
+        # Refreshing updates the counts of the cached containers.
+        cont_list[0]["count"] = "3"
+        self.assertTrue(client.get_all_containers()[0] is conts[0])
+        self.assertEqual(conts[0].object_count, 3)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_container_cache_per_client(self):
+        client = pyrax.connect_to_cloudfiles()
+        other = pyrax.connect_to_cloudfiles()
+        self.assertFalse(client._container_cache is other._container_cache)
+        client.connection.head_container = Mock(return_value={})
+        other.connection.head_container = Mock(return_value={})
+        cont = client.get_container("cont")
+        # The other client looks the container up for itself.
+        self.assertFalse(other.get_container("cont") is cont)
+        self.assertTrue(other.get_container("cont").client is other)
+        self.assertEqual(other.connection.head_container.call_count, 1)
+        self.assertTrue(client.get_container("cont") is cont)
+        self.assertEqual(client.connection.head_container.call_count, 1)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_container_cache_size(self):
+        with patch.object(pyrax.cf_wrapper.client.CFClient,
+                "container_cache_size", 2):
+            client = pyrax.connect_to_cloudfiles()
+        client.connection.head_container = Mock(return_value={})
+        c1 = client.get_container("c1")
+        client.get_container("c2")
+        # Using c1 makes c2 the least recently used, so it is discarded.
+        self.assertTrue(client.get_container("c1") is c1)
+        client.get_container("c3")
+        self.assertEqual(client.connection.head_container.call_count, 3)
+        self.assertTrue(client.get_container("c1") is c1)
+        client.get_container("c3")
+        self.assertEqual(client.connection.head_container.call_count, 3)
+        client.get_container("c2")
+        self.assertEqual(client.connection.head_container.call_count, 4)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_container_cache_expires(self):
+        client = self.client
+        self.assertEqual(client.container_cache_ttl, 60)
+        client.connection.head_container = Mock(return_value={
+                "x-container-object-count": 3, "x-container-bytes-used": 1234})
+        cont = client.get_container(self.cont_name)
+        self.assertTrue(client.get_container(self.cont_name) is cont)
+        self.assertEqual(client.connection.head_container.call_count, 1)
+        with patch("time.time", return_value=time.time() + 30):
+            self.assertTrue(client.get_container(self.cont_name) is cont)
+        self.assertEqual(client.connection.head_container.call_count, 1)
+        with patch("time.time", return_value=time.time() + 120):
+            self.assertFalse(client.get_container(self.cont_name) is cont)
+        self.assertEqual(client.connection.head_container.call_count, 2)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_upload_invalidates_counts(self):
+        client = self.client
+        client.connection.head_container = Mock(return_value={
+                "x-container-object-count": 3, "x-container-bytes-used": 1234})
+        client.connection.put_object = Mock()
+        cont = client.get_container(self.cont_name)
+        self.assertEqual(cont.object_count, 3)
+        client.connection.head_container.return_value = {
+                "x-container-object-count": 4, "x-container-bytes-used": 1238}
+        client.store_object(cont, "new", "test")
+        self.assertEqual(client.connection.head_container.call_count, 1)
+        self.assertEqual(cont.object_count, 4)
+        self.assertEqual(cont.total_bytes, 1238)
+        self.assertEqual(client.connection.head_container.call_count, 2)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_iter_container_objects(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        pages = [[{"name": "o1"}, {"name": "o2"}],
+                [{"name": "o3"}, {"subdir": "sub/"}], [{"name": "o4"}]]
+        client.connection.get_container = Mock(side_effect=[({}, page)
+                for page in pages])
+        objs = client.iter_container_objects(self.cont_name, page_size=2,
+                delimiter="/")
+        self.assertEqual([obj.name for obj in objs], ["o1", "o2", "o3", "o4"])
+        markers = [call[1]["marker"]
+                for call in client.connection.get_container.call_args_list]
+        self.assertEqual(markers, [None, "o2", "sub/"])
+        self.assertEqual(
+                client.connection.get_container.call_args[1]["limit"], 2)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_iter_container_objects_stop_early(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        page = [{"name": "o%s" % idx} for idx in xrange(5)]
+        client.connection.get_container = Mock(return_value=({}, page))
+        cont = client.get_container(self.cont_name)
+        threads = []
+        make_thread = threading.Thread
+
+        def start_thread(*args, **kwargs):
+            thread = make_thread(*args, **kwargs)
+            threads.append(thread)
+            return thread
+
+        objs = cont.iter_objects(page_size=5)
+        with patch("threading.Thread", side_effect=start_thread):
+            self.assertEqual(objs.next().name, "o0")
+        objs.close()
+        # The prefetching thread stops, having requested only the current
+        # page and the one being prefetched.
+        self.assertEqual(len(threads), 1)
+        threads[0].join(5)
+        self.assertFalse(threads[0].is_alive())
+        self.assert_(client.connection.get_container.call_count <= 3)
+
+    def _fake_listing(self, names):
+        names = sorted(names)
+
+        def listing(cname, marker=None, limit=None, prefix=None,
+                delimiter=None, end_marker=None):
+            objs = [nm for nm in names
+                    if (not marker or nm > marker)
+                    and (not end_marker or nm < end_marker)
+                    and nm.startswith(prefix or "")]
+            return [{"name": nm} for nm in objs[:limit]]
+        return listing
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_iter_container_objects_parallel(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        names = [u"%s%04d" % (ch, idx) for ch in "abcdef"
+                for idx in xrange(150)]
+        client._get_listing = Mock(side_effect=self._fake_listing(names))
+        objs = client.iter_container_objects_parallel(self.cont_name,
+                partitions=5, workers=3, page_size=40)
+        self.assertEqual([obj.name for obj in objs], sorted(names))
+        end_markers = set(call[1].get("end_marker")
+                for call in client._get_listing.call_args_list)
+        # Four ranges end with a boundary; the last one and the sampling
+        # requests have no end_marker.
+        self.assertEqual(len(end_markers), 5)
+        self.assert_(None in end_markers)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_iter_container_objects_parallel_unordered(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        names = [u"%s/%03d" % (ch, idx) for ch in "xyz" for idx in xrange(50)]
+        names.append(u"other")
+        client._get_listing = Mock(side_effect=self._fake_listing(names))
+        cont = client.get_container(self.cont_name)
+        objs = cont.iter_objects_parallel(prefixes=["x/", "y/", "z/"],
+                ordered=False, page_size=10)
+        self.assertEqual(sorted(obj.name for obj in objs), names[:-1])
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_iter_container_objects_parallel_small(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        names = [u"o%s" % idx for idx in xrange(10)]
+        client._get_listing = Mock(side_effect=self._fake_listing(names))
+        objs = client.iter_container_objects_parallel(self.cont_name)
+        self.assertEqual([obj.name for obj in objs], sorted(names))
+        # The sample held everything, so only one range was listed.
+        self.assertEqual(client._get_listing.call_count, 2)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_iter_container_objects_parallel_error(self):
+        client = self.client
+        client.connection.head_container = Mock()
+        client._make_thread_connection = Mock(return_value=client.connection)
+        client._get_listing = Mock(side_effect=exc.NoSuchContainer(""))
+        objs = client.iter_container_objects_parallel(self.cont_name,
+                prefixes=["a", "b"])
+        self.assertRaises(exc.NoSuchContainer, list, objs)
+
+    def test_get_listing_end_marker(self):
+        client = self.client
+        resp = FakeResponse()
+        resp.status = 200
+        resp.read = Mock(return_value=json.dumps([{"name": "o1"}]))
+        client.connection.storage_request = Mock(return_value=resp)
+        objs = client._get_listing("cont", marker="a b", end_marker=u"c\x00",
+                limit=5)
+        self.assertEqual(objs, [{"name": "o1"}])
+        client.connection.storage_request.assert_called_once_with("GET",
+                ["cont"], query="format=json&marker=a%20b&end_marker=c%00"
+                "&limit=5")
+        resp.status = 404
+        self.assertRaises(exc.NoSuchContainer, client._get_listing, "cont",
+                end_marker="c")
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_get_container_objects(self):
         client = self.client
@@ -609,6 +1862,48 @@ class CF_ClientTest(unittest.TestCase):
         self.assert_("count" in r0)
         self.assert_("bytes" in r0)
 
+    def test_load_cdn_data(self):
+        client = self.client
+        client.cdn_cache_ttl = 60
+        client.connection.head_container = Mock()
+        client.connection.cdn_request = Mock()
+        cont = Container(client, "pub")
+        other = Container(client, "private")
+        client._container_cache["pub"] = cont
+        client._container_cache["private"] = other
+        resp = FakeResponse()
+        resp.status = 200
+        resp.read = Mock(return_value=json.dumps([{"name": "pub",
+                "cdn_enabled": True, "ttl": 1200, "log_retention": True,
+                "cdn_uri": "http://cdn", "cdn_ssl_uri": "https://cdn",
+                "cdn_streaming_uri": "http://stream"}]))
+        client.connection.cdn_request.return_value = resp
+        info = client.load_cdn_data()
+        client.connection.cdn_request.assert_called_once_with("GET", [""],
+                query="format=json&limit=10000")
+        self.assertEqual(info.keys(), ["pub"])
+        self.assertEqual(cont.cdn_uri, "http://cdn")
+        self.assertEqual(cont.cdn_ttl, 1200)
+        self.assertEqual(cont.cdn_ssl_uri, "https://cdn")
+        self.assertEqual(cont.cdn_streaming_uri, "http://stream")
+        self.assertTrue(cont.cdn_log_retention)
+        self.assertFalse(other.cdn_enabled)
+        self.assertEqual(other.cdn_ttl, client.default_cdn_ttl)
+        # No HEAD requests were needed.
+        self.assertEqual(client.connection.cdn_request.call_count, 1)
+        # Once the data expires, it is fetched again.
+        cont._cdn_expires = time.time() - 1
+        resp.status = 404
+        self.assertIsNone(cont.cdn_uri)
+        client.connection.cdn_request.assert_called_with("HEAD", ["pub"])
+
+    def test_load_cdn_data_fail(self):
+        client = self.client
+        resp = FakeResponse()
+        resp.status = 500
+        client.connection.cdn_request = Mock(return_value=resp)
+        self.assertRaises(exc.CDNFailed, client.load_cdn_data)
+
     def test_list_public_containers(self):
         client = self.client
         client.connection.cdn_request = Mock()
@@ -709,6 +2004,47 @@ class CF_ClientTest(unittest.TestCase):
         hdrs = call_args[-1]
         self.assert_("pyrax" in hdrs["User-Agent"])
 
+    def test_storage_request(self):
+        client = self.client
+        conn = client.connection
+        fake_conn = Mock()
+        fake_conn.getresponse.return_value = FakeStreamingResponse("x", 200)
+        conn.http_conn = (None, fake_conn)
+        conn.storage_request("DELETE", path=["A", "B"], query="bulk-delete")
+        call_args = fake_conn.request.call_args_list[0][0]
+        self.assertEqual(call_args[0], "DELETE")
+        self.assert_(call_args[1].endswith("A/B?bulk-delete"))
+        hdrs = call_args[-1]
+        self.assert_("pyrax" in hdrs["User-Agent"])
+
+    def test_storage_request_retries_exhausted(self):
+        client = self.client
+        conn = client.connection
+        fake_conn = Mock()
+        fake_conn.getresponse.side_effect = socket.error("Connection reset")
+        conn.http_connection = Mock(return_value=(None, fake_conn))
+        conn.http_conn = None
+        self.assertRaises(socket.error, conn.storage_request, "GET",
+                path=["A", "B"])
+        self.assertEqual(fake_conn.request.call_count, 5)
+
+    def test_storage_request_chunked(self):
+        client = self.client
+        conn = client.connection
+        fake_conn = Mock()
+        fake_conn.getresponse.return_value = FakeStreamingResponse("x", 201)
+        conn.http_conn = (None, fake_conn)
+        conn.storage_request("PUT", path=["A"], query="extract-archive=tar",
+                chunks=lambda: iter(["abc", "", "0123456789abcdef"]))
+        fake_conn.putrequest.assert_called_with("PUT",
+                fake_conn.putrequest.call_args[0][1])
+        hdrs = dict(call[0] for call in fake_conn.putheader.call_args_list)
+        self.assertEqual(hdrs["Transfer-Encoding"], "chunked")
+        self.assert_("Content-Length" not in hdrs)
+        sent = "".join(call[0][0] for call in fake_conn.send.call_args_list)
+        self.assertEqual(sent, "3\r\nabc\r\n10\r\n0123456789abcdef\r\n"
+                "0\r\n\r\n")
+
     def test_handle_swiftclient_exception_container(self):
         client = self.client
         gc = client.get_container
@@ -2,13 +2,16 @@
 # -*- coding: utf-8 -*-
 
 import os
+import pickle
 import unittest
 
 from mock import patch
 from mock import MagicMock as Mock
+from swiftclient.client import ClientException
 
 import pyrax
 from pyrax.cf_wrapper.container import Container
+import pyrax.cf_wrapper.container as container_module
 import pyrax.utils as utils
 import pyrax.exceptions as exc
 from tests.unit.fakes import FakeContainer
@@ -47,7 +50,7 @@ class CF_ContainerTest(unittest.TestCase):
         self.obj_name = utils.random_name()
         self.fake_object = FakeStorageObject(self.client, self.cont_name,
                 self.obj_name)
-        self.client._container_cache = {}
+        self.client.clear_container_cache()
         self.container.object_cache = {}
 
     def tearDown(self):
@@ -92,6 +95,25 @@ class CF_ContainerTest(unittest.TestCase):
         cont = Container(self.client, "realcontainer", 0, 0)
         self.assertIsNone(cont.cdn_uri)
 
+    def test_slots(self):
+        cont = Container(self.client, "realcontainer", 0, 0)
+        self.assertFalse(hasattr(cont, "__dict__"))
+        # The object cache is only created when it's needed.
+        cont.remove_from_cache("o1")
+        self.assertIsNone(cont._objects)
+        self.assertEqual(len(cont._object_cache), 0)
+        self.assertIsNotNone(cont._objects)
+
+    def test_pickle(self):
+        cont = Container(None, "realcontainer", object_count=3)
+        cont.remove_from_cache("o1")
+        for protocol in (0, 1, 2):
+            copied = pickle.loads(pickle.dumps(cont, protocol))
+            self.assertEqual(copied.name, "realcontainer")
+            self.assertEqual(copied._object_count, 3)
+            self.assertIs(copied._total_bytes, container_module.FAULT)
+            self.assertIsNone(copied._objects)
+
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_get_object_names(self):
         cont = self.container
@@ -115,11 +137,43 @@ class CF_ContainerTest(unittest.TestCase):
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_get_object(self):
         cont = self.container
-        cont.client.connection.get_container = Mock()
-        cont.client.connection.get_container.return_value = ({}, [{"name": "o1"}, {"name": "o2"}])
+        def head_object(cname, oname):
+            if oname == "missing":
+                raise ClientException("HEAD failed", http_status=404)
+            return {"content-length": "42", "content-type": "text/plain",
+                    "etag": "0123456789abcdef",
+                    "last-modified": "Tue, 01 Jan 2013 12:34:56 GMT"}
+        cont.client.connection.head_object = Mock(side_effect=head_object)
         self.assertRaises(exc.NoSuchObject, cont.get_object, "missing")
         obj = cont.get_object("o2")
         self.assertEqual(obj.name, "o2")
+        self.assertEqual(obj.total_bytes, 42)
+        self.assertEqual(obj.content_type, "text/plain")
+        self.assertEqual(obj.etag, "0123456789abcdef")
+        self.assertEqual(obj.last_modified, "2013-01-01T12:34:56.000000")
+        cont.client.connection.head_object.assert_called_with(cont.name, "o2")
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_get_object_cached(self):
+        cont = self.container
+        cont.client.connection.head_object = Mock(side_effect=ClientException(
+                "HEAD failed", http_status=404))
+        self.assertRaises(exc.NoSuchObject, cont.get_object, "o1")
+        # The missing name is remembered.
+        self.assertRaises(exc.NoSuchObject, cont.get_object, "o1")
+        self.assertEqual(cont.client.connection.head_object.call_count, 1)
+        cont.client.connection.head_object = Mock(return_value={})
+        cont.remove_from_cache("o1")
+        obj = cont.get_object("o1")
+        self.assertTrue(obj is cont.get_object("o1"))
+        self.assertEqual(cont.client.connection.head_object.call_count, 1)
+
+    @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
+    def test_get_object_other_error(self):
+        cont = self.container
+        cont.client.connection.head_object = Mock(side_effect=ClientException(
+                "HEAD failed", http_status=500))
+        self.assertRaises(ClientException, cont.get_object, "o1")
 
     @patch('pyrax.cf_wrapper.client.Container', new=FakeContainer)
     def test_store_object(self):
@@ -166,11 +220,10 @@ class CF_ContainerTest(unittest.TestCase):
     def test_delete_all_objects(self):
         cont = self.container
         client = cont.client
-        cont.client.connection.head_container = Mock()
-        cont.client.connection.delete_object = Mock()
-        cont.client.get_container_object_names = Mock(return_value=[self.obj_name])
-        cont.delete_all_objects()
-        cont.client.connection.delete_object.assert_called_with(self.cont_name, self.obj_name)
+        cont.client.bulk_delete = Mock()
+        cont.delete_all_objects(prefix="abc")
+        cont.client.bulk_delete.assert_called_with(cont, prefix="abc",
+                workers=None)
 
     def test_delete(self):
         cont = self.container
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+import unittest
+
+from pyrax.cf_wrapper.content_cache import ContentCache
+import pyrax.utils as utils
+
+
+
+class CF_ContentCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = utils.SelfDeletingTempDirectory()
+        self.folder = self.tmpdir.__enter__()
+        self.cache = ContentCache(os.path.join(self.folder, "cache"),
+                max_size=100)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmpdir.__exit__(None, None, None)
+
+    def test_store_and_get(self):
+        self.assertIsNone(self.cache.lookup("cont", "obj"))
+        self.assertIsNone(self.cache.get("cont", "obj"))
+        self.cache.store("cont", "obj", "abc", {"etag": "abc"}, "contents")
+        self.assertEqual(self.cache.lookup("cont", "obj"), "abc")
+        self.assertEqual(self.cache.get("cont", "obj"),
+                ({"etag": "abc"}, "contents"))
+
+    def test_persistent(self):
+        self.cache.store("cont", u"obé", "abc", {}, "contents")
+        other = ContentCache(self.cache.path)
+        self.assertEqual(other.get("cont", u"obé"), ({}, "contents"))
+        other.close()
+
+    def test_non_ascii_names(self):
+        self.cache.store("caf\xc3\xa9", "obj\xc3\xa9", "abc", {}, "contents")
+        self.assertEqual(self.cache.lookup("caf\xc3\xa9", "obj\xc3\xa9"),
+                "abc")
+        # The unicode names refer to the same entry.
+        self.assertEqual(self.cache.get(u"caf\xe9", u"obj\xe9"),
+                ({}, "contents"))
+        # Names that aren't UTF-8 at all can be cached too.
+        self.cache.store("cont", "\xff\xfe", "def", {}, "other")
+        self.assertEqual(self.cache.lookup("cont", "\xff\xfe"), "def")
+        self.cache.remove(u"caf\xe9", "obj\xc3\xa9")
+        self.assertIsNone(self.cache.lookup("caf\xc3\xa9", "obj\xc3\xa9"))
+
+    def test_not_stored(self):
+        self.cache.store("cont", "big", "abc", {}, "x" * 101)
+        self.cache.store("cont", "noetag", None, {}, "x")
+        self.assertIsNone(self.cache.lookup("cont", "big"))
+        self.assertIsNone(self.cache.lookup("cont", "noetag"))
+
+    def test_evict_least_recently_used(self):
+        self.cache.store("cont", "o1", "e1", {}, "1" * 40)
+        self.cache.store("cont", "o2", "e2", {}, "2" * 40)
+        self.cache.get("cont", "o1")
+        self.cache.store("cont", "o3", "e3", {}, "3" * 40)
+        self.assertIsNone(self.cache.lookup("cont", "o2"))
+        self.assertEqual(self.cache.lookup("cont", "o1"), "e1")
+        self.assertEqual(self.cache.lookup("cont", "o3"), "e3")
+        files = [nm for nm in os.listdir(self.cache.path)
+                if nm != "index.db"]
+        self.assertEqual(len(files), 2)
+
+    def test_concurrent_stores(self):
+        def store(num):
+            for ii in xrange(20):
+                self.cache.store("cont", "obj", "e%s" % num,
+                        {"etag": "e%s" % num}, "%s" % num * 10)
+
+        threads = [threading.Thread(target=store, args=(num, ))
+                for num in xrange(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        headers, contents = self.cache.get("cont", "obj")
+        self.assertEqual(contents, headers["etag"][1:] * 10)
+        self.assertEqual(self.cache.lookup("cont", "obj"), headers["etag"])
+        self.assertEqual(len(os.listdir(self.cache.path)), 2)
+
+    def test_missing_file(self):
+        self.cache.store("cont", "obj", "abc", {}, "contents")
+        for nm in os.listdir(self.cache.path):
+            if nm != "index.db":
+                os.remove(os.path.join(self.cache.path, nm))
+        self.assertIsNone(self.cache.get("cont", "obj"))
+        self.assertIsNone(self.cache.lookup("cont", "obj"))
+
+    def test_remove_and_clear(self):
+        self.cache.store("cont", "obj", "abc", {}, "contents")
+        self.cache.remove("cont", "obj")
+        self.assertIsNone(self.cache.lookup("cont", "obj"))
+        self.cache.store("cont", "obj", "abc", {}, "contents")
+        self.cache.clear()
+        self.assertIsNone(self.cache.lookup("cont", "obj"))
+        self.assertEqual(os.listdir(self.cache.path), ["index.db"])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
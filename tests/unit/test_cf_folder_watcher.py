@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import struct
+import unittest
+
+from mock import patch
+
+import pyrax.cf_wrapper.folder_watcher as folder_watcher
+from pyrax.cf_wrapper.folder_watcher import InotifyWatcher
+from pyrax.cf_wrapper.folder_watcher import PollingWatcher
+import pyrax.utils as utils
+
+
+try:
+    folder_watcher._load_libc()
+    HAS_INOTIFY = True
+except OSError:
+    HAS_INOTIFY = False
+
+
+
+class CF_FolderWatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = utils.SelfDeletingTempDirectory()
+        self.folder = self.tmpdir.__enter__()
+        os.mkdir(os.path.join(self.folder, "sub"))
+
+    def tearDown(self):
+        self.tmpdir.__exit__(None, None, None)
+
+    def _write(self, relpath, content="data"):
+        with open(os.path.join(self.folder, relpath), "w") as ff:
+            ff.write(content)
+
+    @unittest.skipUnless(HAS_INOTIFY, "inotify is not available")
+    def test_inotify_changes(self):
+        watcher = InotifyWatcher(self.folder, ignore=".*")
+        self._write("sub/one")
+        self._write(".hidden")
+        self.assertEqual(watcher.read(1), set(["sub/one"]))
+        # The contents of new folders are reported, and the folders watched.
+        os.makedirs(os.path.join(self.folder, "new", "deep"))
+        self._write("new/deep/two")
+        changed = set()
+        while True:
+            found = watcher.read(0.2)
+            if not found:
+                break
+            changed.update(found)
+        self.assertTrue("new/deep/two" in changed)
+        self._write("new/deep/two", "more")
+        self.assertEqual(watcher.read(1), set(["new/deep/two"]))
+        self.assertEqual(watcher.read(0), set())
+        watcher.close()
+
+    @unittest.skipUnless(HAS_INOTIFY, "inotify is not available")
+    def test_inotify_moved_folder(self):
+        self._write("sub/one")
+        watcher = InotifyWatcher(self.folder)
+        os.rename(os.path.join(self.folder, "sub"),
+                os.path.join(self.folder, "moved"))
+        self.assertEqual(watcher.read(1), set(["sub", "moved", "moved/one"]))
+        self.assertEqual(sorted(watcher._folders.values()), ["", "moved"])
+        shutil.rmtree(os.path.join(self.folder, "moved"))
+        self.assertEqual(watcher.read(1), set(["moved", "moved/one"]))
+        watcher.close()
+
+    @unittest.skipUnless(HAS_INOTIFY, "inotify is not available")
+    def test_inotify_overflow(self):
+        watcher = InotifyWatcher(self.folder)
+        data = struct.pack("iIII", -1, folder_watcher.IN_Q_OVERFLOW, 0, 0)
+        self.assertIsNone(watcher._parse(data))
+        watcher.close()
+
+    def test_polling(self):
+        self._write("sub/one")
+        watcher = PollingWatcher(self.folder, ignore=".*", interval=0)
+        self.assertEqual(watcher.read(1), set())
+        self._write("sub/one", "changed")
+        self._write("two")
+        self._write(".hidden")
+        self.assertEqual(watcher.read(1), set(["sub/one", "two"]))
+        os.remove(os.path.join(self.folder, "two"))
+        self.assertEqual(watcher.read(1), set(["two"]))
+
+    def test_polling_interval(self):
+        watcher = PollingWatcher(self.folder, interval=60)
+        self._write("two")
+        self.assertEqual(watcher.read(0), set())
+
+    def test_get_watcher_fallback(self):
+        with patch.object(folder_watcher, "_load_libc", side_effect=OSError):
+            watcher = folder_watcher.get_watcher(self.folder, poll_interval=5)
+        self.assertTrue(isinstance(watcher, PollingWatcher))
+        self.assertEqual(watcher.interval, 5)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
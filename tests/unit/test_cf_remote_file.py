@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import hashlib
+import os
+import StringIO
+import unittest
+import zipfile
+
+from mock import MagicMock as Mock
+
+from pyrax.cf_wrapper.remote_file import RemoteFile
+import pyrax.exceptions as exc
+import pyrax.utils as utils
+from tests.unit.fakes import FakeStreamingResponse
+
+
+
+class CF_RemoteFileTest(unittest.TestCase):
+    def setUp(self):
+        self.content = "".join([str(num % 10) for num in xrange(1000)])
+        self.client = Mock()
+        self.client._resolve_name = lambda val: val
+        self.client.connection.head_object.return_value = {
+                "content-length": str(len(self.content)),
+                "etag": utils.get_checksum(self.content)}
+
+        def fake_get(method, path, hdrs=None):
+            start, end = hdrs["Range"].split("=")[1].split("-")
+            return FakeStreamingResponse(
+                    self.content[int(start):int(end) + 1], status=206)
+
+        self.client.connection.storage_request.side_effect = fake_get
+        self.rfile = RemoteFile(self.client, "cont", "obj", block_size=100,
+                cache_blocks=4, max_readahead=4)
+
+    def tearDown(self):
+        self.rfile = None
+
+    def test_read(self):
+        rf = self.rfile
+        self.assertEqual(rf.size, 1000)
+        self.assertEqual(rf.read(10), self.content[:10])
+        self.assertEqual(rf.tell(), 10)
+        self.assertEqual(rf.read(), self.content[10:])
+        self.assertEqual(rf.read(), "")
+
+    def test_seek(self):
+        rf = self.rfile
+        rf.seek(950)
+        self.assertEqual(rf.read(10), self.content[950:960])
+        rf.seek(-20, os.SEEK_END)
+        self.assertEqual(rf.read(), self.content[980:])
+        rf.seek(0)
+        rf.seek(5, os.SEEK_CUR)
+        self.assertEqual(rf.tell(), 5)
+        self.assertRaises(IOError, rf.seek, -1)
+
+    def test_block_cache(self):
+        rf = self.rfile
+        conn = self.client.connection
+        rf.seek(500)
+        rf.read(10)
+        rf.seek(510)
+        rf.read(10)
+        self.assertEqual(conn.storage_request.call_count, 1)
+        hdrs = conn.storage_request.call_args[1]["hdrs"]
+        self.assertEqual(hdrs["Range"], "bytes=500-599")
+        self.assertEqual(hdrs["If-Match"], utils.get_checksum(self.content))
+
+    def test_readahead(self):
+        rf = self.rfile
+        conn = self.client.connection
+        rf.read()
+        # Blocks are read in runs of 1, 2, 4, then the remaining 3.
+        self.assertEqual(conn.storage_request.call_count, 4)
+
+    def test_bad_response(self):
+        conn = self.client.connection
+        conn.storage_request.side_effect = None
+        conn.storage_request.return_value = FakeStreamingResponse("", 412)
+        self.assertRaises(exc.DownloadFailed, self.rfile.read, 10)
+
+    def test_closed(self):
+        rf = self.rfile
+        rf.close()
+        self.assertRaises(ValueError, rf.read)
+        self.assertRaises(ValueError, rf.tell)
+
+    def test_zipfile(self):
+        buf = StringIO.StringIO()
+        zf = zipfile.ZipFile(buf, "w")
+        zf.writestr("first.txt", "x" * 5000)
+        zf.writestr("second.txt", "second file")
+        zf.close()
+        self.content = buf.getvalue()
+        self.client.connection.head_object.return_value = {
+                "content-length": str(len(self.content)),
+                "etag": hashlib.md5(self.content).hexdigest()}
+        rf = RemoteFile(self.client, "cont", "obj", block_size=512)
+        zf = zipfile.ZipFile(rf)
+        self.assertEqual(zf.read("second.txt"), "second file")
+
+
+
+if __name__ == "__main__":
+    unittest.main()
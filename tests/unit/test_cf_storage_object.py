@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import pickle
 import unittest
 
 from mock import patch
@@ -50,10 +51,12 @@ class CF_StorageObjectTest(unittest.TestCase):
         self.client.connection.head_object = Mock()
         objs = [{"name": self.obj_name, "content_type": "test/test",
                 "bytes": 444, "hash": "abcdef0123456789"}]
-        self.client.connection.head_object.return_value = ({}, objs)
+        self.client.connection.head_object.return_value = {
+                "content-type": "test/test", "content-length": "444",
+                "etag": "abcdef0123456789"}
         self.client.connection.get_container.return_value = ({}, objs)
         self.storage_object = self.client.get_object(self.container, "testobj")
-        self.client._container_cache = {}
+        self.client.clear_container_cache()
         self.container.object_cache = {}
 
     def tearDown(self):
@@ -66,6 +69,31 @@ class CF_StorageObjectTest(unittest.TestCase):
         pyrax.connect_to_cloud_databases = self.orig_connect_to_cloud_databases
         pyrax.connect_to_cloud_blockstorage = self.orig_connect_to_cloud_blockstorage
 
+    def test_lazy_container(self):
+        self.client.get_container.reset_mock()
+        obj = StorageObject(self.client, self.container_name, name="o1")
+        self.assertEqual(obj.container_name, self.container_name)
+        self.assertFalse(self.client.get_container.called)
+        self.assertEqual(obj.container, self.container)
+        self.client.get_container.assert_called_once_with(self.container_name)
+        obj.container
+        self.assertEqual(self.client.get_container.call_count, 1)
+
+    def test_slots(self):
+        obj = StorageObject(self.client, self.container, name="o1")
+        self.assertFalse(hasattr(obj, "__dict__"))
+        self.assertEqual(obj.container_name, self.container_name)
+
+    def test_pickle(self):
+        obj = StorageObject(None, "cont", name="o1", total_bytes=42,
+                etag="abc")
+        for protocol in (0, 1, 2):
+            copied = pickle.loads(pickle.dumps(obj, protocol))
+            self.assertEqual(copied.container_name, "cont")
+            self.assertEqual(copied.name, "o1")
+            self.assertEqual(copied.total_bytes, 42)
+            self.assertEqual(copied.etag, "abc")
+
     def test_read_attdict(self):
         tname = "something"
         ttype = "foo/bar"
@@ -114,7 +142,8 @@ class CF_StorageObjectTest(unittest.TestCase):
         cont.cdn_uri = "http://example.com"
         obj.client.connection.cdn_request = Mock()
         obj.purge()
-        obj.client.connection.cdn_request.assert_called_with("DELETE", cont.name, obj.name, hdrs={})
+        obj.client.connection.cdn_request.assert_called_with("DELETE",
+                [cont.name, obj.name], hdrs={})
 
     def test_get_metadata(self):
         obj = self.storage_object
@@ -6,6 +6,7 @@ import hashlib
 import os
 import StringIO
 import sys
+import time
 import unittest
 
 from mock import patch
@@ -81,6 +82,89 @@ class UtilsTest(unittest.TestCase):
                 received = utils.get_checksum(testfile)
         self.assertEqual(expected, received)
 
+    def test_get_file_checksum(self):
+        test = "some random text"
+        with utils.SelfDeletingTempfile() as tmp:
+            with file(tmp, "w") as testfile:
+                testfile.write(test)
+            received = utils.get_file_checksum(tmp, chunk_size=3)
+            self.assertEqual(received, utils.get_checksum(test))
+            received = utils.get_file_checksum(tmp, offset=5, length=6,
+                    chunk_size=4)
+            self.assertEqual(received, utils.get_checksum(test[5:11]))
+
+    def test_lru_cache(self):
+        cache = utils.LRUCache(max_size=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(cache.get("a"), 1)
+        # "b" is now the least recently used item.
+        cache["c"] = 3
+        self.assertEqual(len(cache), 2)
+        self.assert_("b" not in cache)
+        self.assertEqual(cache["a"], 1)
+        self.assertRaises(KeyError, cache.__getitem__, "b")
+        self.assertEqual(cache.pop("c"), 3)
+        self.assertIsNone(cache.get("c"))
+
+    def test_lru_cache_ttl(self):
+        cache = utils.LRUCache(max_size=10, ttl=60)
+        cache["a"] = 1
+        cache.set("b", 2, ttl=-1)
+        self.assertEqual(cache.get("a"), 1)
+        # "b" has already expired.
+        self.assertIsNone(cache.get("b"))
+        self.assert_("b" not in cache)
+        with patch("time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get("a"))
+
+    def test_worker_pool(self):
+        def double(val):
+            if val == 3:
+                raise ValueError("bad")
+            return val * 2
+        pool = utils.WorkerPool(double, workers=3)
+        results = pool.map(xrange(10))
+        self.assertEqual(len(results), 10)
+        good = dict((item, res) for item, res, err in results if not err)
+        self.assertEqual(good[4], 8)
+        errs = [item for item, res, err in results if err]
+        self.assertEqual(errs, [3])
+
+    def test_worker_pool_pop_results(self):
+        pool = utils.WorkerPool(lambda val: val * 2, workers=1)
+        pool.map(xrange(3))
+        self.assertEqual(len(pool.pop_results()), 3)
+        self.assertEqual(pool.pop_results(), [])
+        pool = utils.WorkerPool(lambda val: val * 2, workers=2)
+        for ii in xrange(10):
+            pool.put(ii)
+        popped = pool.pop_results()
+        rest = pool.join()
+        self.assertEqual(sorted(res for item, res, err in popped + rest),
+                range(0, 20, 2))
+
+    def test_rate_limiter(self):
+        limiter = utils.RateLimiter(50)
+        start = time.time()
+        for ii in xrange(6):
+            limiter.wait()
+        self.assert_(time.time() - start >= 0.09)
+        limiter = utils.RateLimiter()
+        start = time.time()
+        for ii in xrange(100):
+            limiter.wait()
+        self.assert_(time.time() - start < 0.05)
+
+    def test_prefetch(self):
+        self.assertEqual(list(utils.prefetch(xrange(10), depth=2)), range(10))
+        def failing():
+            yield 1
+            raise ValueError("bad")
+        items = utils.prefetch(failing())
+        self.assertEqual(items.next(), 1)
+        self.assertRaises(ValueError, items.next)
+
     def test_random_name(self):
         nm = utils.random_name(33)
         self.assertEqual(len(nm), 33)
@@ -126,6 +210,54 @@ class UtilsTest(unittest.TestCase):
             fsize = utils.folder_size(tmpdir, ignore=ignore)
         self.assertEqual(fsize, 500)
 
+    def test_folder_size_ignore_folder(self):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            os.mkdir(os.path.join(tmpdir, "skip"))
+            os.mkdir(os.path.join(tmpdir, "keep"))
+            for sub in ("skip", "keep"):
+                pth = os.path.join(tmpdir, sub, "test")
+                with file(pth, "w") as ff:
+                    ff.write("x" * 100)
+            fsize = utils.folder_size(tmpdir, ignore="sk*")
+        self.assertEqual(fsize, 100)
+
+    def test_compile_patterns(self):
+        self.assertIsNone(utils.compile_patterns(None))
+        regex = utils.compile_patterns(["*.pyc", ".*", "tmp?"])
+        self.assert_(regex.match("some.pyc"))
+        self.assert_(regex.match(".hidden"))
+        self.assert_(regex.match("tmp1"))
+        self.assertFalse(regex.match("some.py"))
+        self.assertFalse(regex.match("tmp12"))
+
+    def test_walk_files(self):
+        with utils.SelfDeletingTempDirectory() as tmpdir:
+            os.makedirs(os.path.join(tmpdir, "sub", "deeper"))
+            names = ["a", os.path.join("sub", "b"),
+                    os.path.join("sub", "deeper", "c"),
+                    os.path.join("sub", "ignored.bad")]
+            for idx, nm in enumerate(names):
+                with file(os.path.join(tmpdir, nm), "w") as ff:
+                    ff.write("x" * idx)
+            os.symlink(os.path.join(tmpdir, "sub"),
+                    os.path.join(tmpdir, "link"))
+            os.symlink(os.path.join(tmpdir, "missing"),
+                    os.path.join(tmpdir, "broken"))
+            # A link back up the tree is not followed forever.
+            os.symlink(tmpdir, os.path.join(tmpdir, "sub", "loop"))
+            mtime = os.stat(os.path.join(tmpdir, "a")).st_mtime
+            expected = dict((nm, idx) for idx, nm in enumerate(names[:3]))
+            # The linked folder's files are found under the link too.
+            expected[os.path.join("link", "b")] = 1
+            expected[os.path.join("link", "deeper", "c")] = 2
+            # The results are the same whether or not scandir() is available.
+            for impl in (utils._scandir, None):
+                with patch.object(utils, "_scandir", impl):
+                    results = list(utils.walk_files(tmpdir, ignore="*.bad"))
+                found = dict((relpath, size) for relpath, size, mt in results)
+                self.assertEqual(found, expected)
+                self.assert_(("a", 0, mtime) in results)
+
     def test_add_method(self):
         def fake_method(self):
             pass